@@ -0,0 +1,179 @@
+import importlib
+import os
+import time
+from typing import List
+import numpy as np
+from config import (
+    MODEL_PATH, MODEL_IMGSZ, INFERENCE_BACKEND, MODEL_WARMUP_RUNS, CLASS_NAMES,
+    STUB_MODEL_BOXES, STUB_MODEL_LATENCY_MS
+)
+
+# Ultralytics export format for each inference backend, None for the .pt model
+# itself and for the stub model
+BACKEND_FORMATS = {
+    'torch': None,
+    'torchscript': 'torchscript',
+    'onnxruntime': 'onnx',
+    'openvino': 'openvino',
+    'stub': None
+}
+
+# Dynamic input shapes let batches of any size through the exported graph
+EXPORT_OPTIONS = {
+    'torchscript': {},
+    'onnx': {'dynamic': True, 'simplify': True},
+    'openvino': {'dynamic': True}
+}
+
+# Libraries each backend needs at inference time, see preload_backend
+BACKEND_MODULES = {
+    'torch': ('ultralytics',),
+    'torchscript': ('ultralytics',),
+    'onnxruntime': ('ultralytics', 'onnxruntime'),
+    'openvino': ('ultralytics', 'openvino.runtime'),
+    'stub': ()
+}
+
+
+def backend_model_path(backend: str = INFERENCE_BACKEND, model_path: str = MODEL_PATH) -> str:
+    """Return where the model for a backend lives, following Ultralytics export naming"""
+    if backend not in BACKEND_FORMATS:
+        raise ValueError(f"Unknown inference backend: {backend}. Choose from {', '.join(BACKEND_FORMATS)}")
+
+    if backend == 'stub':
+        return 'stub'
+    stem = os.path.splitext(model_path)[0]
+    if backend == 'torchscript':
+        return f"{stem}.torchscript"
+    if backend == 'onnxruntime':
+        return f"{stem}.onnx"
+    if backend == 'openvino':
+        return f"{stem}_openvino_model"
+    return model_path
+
+class _StubArray:
+    """Stands in for a torch tensor, enough for extract_boxes"""
+
+    def __init__(self, data: np.ndarray):
+        self.data = data
+
+    def cpu(self) -> '_StubArray':
+        return self
+
+    def numpy(self) -> np.ndarray:
+        return self.data
+
+
+class _StubBoxes:
+    def __init__(self, data: np.ndarray):
+        self.data = _StubArray(data)
+
+
+class _StubResult:
+    def __init__(self, data: np.ndarray):
+        self.boxes = _StubBoxes(data)
+
+
+class StubModel:
+    """Fake YOLO model for benchmarks and for running without best.pt
+
+    Returns boxes placed pseudo-randomly but deterministically from the image
+    contents, so the same image always gets the same detections. Sleeps
+    latency_ms per image to stand in for model time.
+    """
+
+    def __init__(self, boxes: int = STUB_MODEL_BOXES, latency_ms: float = STUB_MODEL_LATENCY_MS):
+        self.boxes = boxes
+        self.latency_ms = latency_ms
+
+    def predict_boxes(self, image: np.ndarray) -> np.ndarray:
+        """Return (boxes, 6) rows of x1, y1, x2, y2, confidence, class"""
+        height, width = image.shape[:2]
+        rng = np.random.default_rng(int(image[::32, ::32].sum()))
+        corners = rng.random((self.boxes, 4)) * [width, height, width, height]
+        data = np.empty((self.boxes, 6), dtype=np.float32)
+        data[:, 0:2] = np.minimum(corners[:, 0:2], corners[:, 2:4])
+        data[:, 2:4] = np.maximum(corners[:, 0:2], corners[:, 2:4])
+        data[:, 4] = rng.uniform(0.3, 0.95, self.boxes)
+        data[:, 5] = rng.integers(0, len(CLASS_NAMES), self.boxes)
+        return data
+
+    def __call__(self, images, imgsz: int = MODEL_IMGSZ, verbose: bool = False):
+        if isinstance(images, np.ndarray):
+            images = [images]
+        if self.latency_ms:
+            time.sleep(self.latency_ms * len(images) / 1000)
+        return [_StubResult(self.predict_boxes(image)) for image in images]
+
+
+def model_version(backend: str = INFERENCE_BACKEND, model_path: str = MODEL_PATH) -> str:
+    """Identify the loaded model by backend, file and modification time"""
+    path = backend_model_path(backend, model_path)
+    try:
+        modified = int(os.path.getmtime(path))
+    except OSError:
+        modified = 0
+    return f"{backend}:{os.path.basename(path)}:{modified}"
+
+def load_model(backend: str = INFERENCE_BACKEND, model_path: str = MODEL_PATH):
+    """Load the YOLO model for a backend
+
+    Raises FileNotFoundError when the exported model is missing, since
+    exporting is slow and is done once with export_model.py.
+    """
+    if backend == 'stub':
+        return StubModel()
+
+    from ultralytics import YOLO
+
+    path = backend_model_path(backend, model_path)
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"Model for the {backend} backend not found at {path}. "
+            f"Run: python export_model.py {backend}"
+        )
+    return YOLO(path, task='detect')
+
+def preload_backend(backend: str = INFERENCE_BACKEND) -> List[str]:
+    """Import the libraries a backend needs without loading a model, returning the modules imported
+
+    Meant for a server's master process before it forks workers, so they
+    share the imported code copy-on-write. Models, runtime sessions and
+    thread pools aren't safe to carry across a fork and are still created
+    in each worker.
+    """
+    loaded = []
+    for module in BACKEND_MODULES.get(backend, ()):
+        try:
+            importlib.import_module(module)
+            loaded.append(module)
+        except ImportError as e:
+            print(f"Could not preload {module}: {e}")
+    return loaded
+
+def export_model(backend: str, model_path: str = MODEL_PATH, imgsz: int = MODEL_IMGSZ) -> str:
+    """Export the .pt model for a backend, returning the exported path"""
+    from ultralytics import YOLO
+
+    export_format = BACKEND_FORMATS.get(backend)
+    if export_format is None:
+        raise ValueError(f"Backend {backend} can't be exported, choose from "
+                         f"{', '.join(name for name, fmt in BACKEND_FORMATS.items() if fmt)}")
+    return str(YOLO(model_path).export(format=export_format, imgsz=imgsz, **EXPORT_OPTIONS[export_format]))
+
+def measure_latency(model, batch_size: int = 1, imgsz: int = MODEL_IMGSZ) -> float:
+    """Time one inference over a batch of blank 4:3 frames, returning milliseconds per image"""
+    frame = np.zeros((imgsz * 3 // 4, imgsz, 3), dtype=np.uint8)
+    started = time.perf_counter()
+    model([frame] * batch_size, imgsz=imgsz, verbose=False)
+    return (time.perf_counter() - started) * 1000 / batch_size
+
+def warmup(model, runs: int = MODEL_WARMUP_RUNS) -> float:
+    """Run throwaway inferences so lazy initialization happens before real requests
+
+    Returns the per-image latency of the last run in milliseconds.
+    """
+    latency_ms = 0.0
+    for _ in range(max(1, runs)):
+        latency_ms = measure_latency(model)
+    return latency_ms
@@ -0,0 +1,217 @@
+import json
+import os
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
+import cv2
+from config import (
+    INFERENCE_TIMEOUT, BATCH_JOB_CONCURRENCY, BATCH_ROOT, BATCH_MAX_UNPACKED_BYTES, MAX_UPLOAD_BYTES
+)
+from detection import evaluate_compliance
+from ingest import decode_upload, restore_original_size
+from inference import InferenceQueueFull, ModelNotReady
+from metrics import STAGE_SECONDS
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+# Scheduler source for batch jobs, so live cameras and uploads take turns with them
+BATCH_SOURCE = 'batch-job'
+
+# Uncompressed to compressed size above which a zip member is taken for a zip bomb.
+# Photos barely compress; even flat BMPs stay well below this
+MAX_ZIP_RATIO = 100
+
+
+def _is_image(name: str) -> bool:
+    return name.lower().endswith(IMAGE_EXTENSIONS)
+
+def safe_join(root: str, name: str) -> str:
+    """Join a relative name onto root, refusing names that escape it"""
+    root = os.path.realpath(root)
+    path = os.path.realpath(os.path.join(root, name))
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError(f"Path {name} is outside {root}")
+    return path
+
+def resolve_batch_path(path: str) -> str:
+    """Resolve a path sent to the batch endpoint, which may only touch BATCH_ROOT"""
+    return safe_join(BATCH_ROOT, path)
+
+def _read_file(path: str) -> bytes:
+    with open(path, 'rb') as image_file:
+        return image_file.read()
+
+def iter_directory_images(directory: str) -> Iterator[Tuple[str, Callable[[], bytes]]]:
+    """Yield (relative name, loader) for every image under a directory, in a stable order"""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for filename in sorted(files):
+            if not _is_image(filename):
+                continue
+            path = os.path.join(root, filename)
+            name = os.path.relpath(path, directory).replace(os.sep, '/')
+            yield name, lambda path=path: _read_file(path)
+
+def _zip_images(archive: zipfile.ZipFile) -> List[zipfile.ZipInfo]:
+    return [member for member in archive.infolist() if not member.is_dir() and _is_image(member.filename)]
+
+def check_zip_archive(archive: zipfile.ZipFile, max_bytes: int = BATCH_MAX_UNPACKED_BYTES):
+    """Raise ValueError if the archive's images would unpack to more than max_bytes in total"""
+    total = sum(member.file_size for member in _zip_images(archive))
+    if total > max_bytes:
+        raise ValueError(f"Archive unpacks to {total // (1024 * 1024)} MB, "
+                         f"over the {max_bytes // (1024 * 1024)} MB limit")
+
+def _read_member(archive: zipfile.ZipFile, member: zipfile.ZipInfo, max_bytes: int) -> bytes:
+    """Decompress one member, refusing oversized or implausibly compressed ones before inflating them"""
+    if member.file_size > max_bytes:
+        raise ValueError(f"Image unpacks to {member.file_size} bytes, over the {max_bytes} byte limit")
+    if member.file_size > MAX_ZIP_RATIO * max(member.compress_size, 1):
+        raise ValueError(f"Image compression ratio over {MAX_ZIP_RATIO}:1, refusing a likely zip bomb")
+    # The header sizes are only claims, so never read past the limit either way
+    with archive.open(member) as member_file:
+        data = member_file.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise ValueError(f"Image unpacks to more than the {max_bytes} byte limit")
+    return data
+
+def iter_zip_images(archive: zipfile.ZipFile,
+                    max_bytes: int = MAX_UPLOAD_BYTES) -> Iterator[Tuple[str, Callable[[], bytes]]]:
+    """Yield (member name, loader) for every image in a zip archive
+
+    A loader raises ValueError for a member that would unpack to more than
+    max_bytes, the limit for a single /detect upload, or whose compression
+    ratio is above MAX_ZIP_RATIO.
+    """
+    for member in _zip_images(archive):
+        yield member.filename, lambda member=member: _read_member(archive, member, max_bytes)
+
+def read_checkpoint(checkpoint_path: Optional[str]) -> Set[str]:
+    """Return the names already scored in an earlier run of the same job"""
+    done = set()
+    if not checkpoint_path or not os.path.exists(checkpoint_path):
+        return done
+    with open(checkpoint_path, 'r', encoding='utf-8') as checkpoint_file:
+        for line in checkpoint_file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by a crash, score that image again
+                continue
+            if record.get('type') == 'result':
+                done.add(record['name'])
+    return done
+
+def _open_checkpoint(checkpoint_path: str) -> TextIO:
+    """Open a checkpoint for appending, on a fresh line if a crash cut the last one short"""
+    cut = False
+    if os.path.exists(checkpoint_path) and os.path.getsize(checkpoint_path):
+        with open(checkpoint_path, 'rb') as checkpoint_file:
+            checkpoint_file.seek(-1, os.SEEK_END)
+            cut = checkpoint_file.read(1) != b'\n'
+    checkpoint_file = open(checkpoint_path, 'a', encoding='utf-8')
+    if cut:
+        checkpoint_file.write('\n')
+    return checkpoint_file
+
+
+def _score_one(scheduler, name: str, load: Callable[[], bytes], annotated_dir: Optional[str]) -> Dict:
+    """Read, decode and score one image on a job thread, waiting for a free scheduler slot"""
+    try:
+        contents = load()
+        decode_start = time.perf_counter()
+        image, original_size = decode_upload(contents)
+        decode_s = time.perf_counter() - decode_start
+        STAGE_SECONDS.observe(decode_s, pipeline='batch', stage='decode')
+        del contents
+        output = 'array' if annotated_dir else 'none'
+        while True:
+            try:
+                future = scheduler.submit(image, output=output, source=BATCH_SOURCE)
+                break
+            except InferenceQueueFull as e:
+                if isinstance(e, ModelNotReady) and e.error:
+                    raise
+                # Leave room for live traffic, or let the model finish loading, and try again shortly
+                time.sleep(0.05)
+        analysis, timing = future.result(timeout=INFERENCE_TIMEOUT)
+        timing = {'decode_ms': round(decode_s * 1000, 2), **timing}
+        annotated_image = analysis.pop('annotated_image', None)
+        analysis = restore_original_size(analysis, original_size)
+
+        record = {
+            'type': 'result',
+            'name': name,
+            'compliance': evaluate_compliance(analysis),
+            'detections': analysis['detections'],
+            'width': analysis['width'],
+            'height': analysis['height'],
+            'timing': timing
+        }
+        if annotated_dir:
+            path = safe_join(annotated_dir, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            cv2.imwrite(path, annotated_image)
+            record['annotated'] = path
+        return record
+    except Exception as e:
+        return {'type': 'error', 'name': name, 'error': str(e)}
+
+def score_images(scheduler, images: Iterable[Tuple[str, Callable[[], bytes]]],
+                 annotated_dir: Optional[str] = None, checkpoint_path: Optional[str] = None,
+                 concurrency: int = BATCH_JOB_CONCURRENCY) -> Iterator[Dict]:
+    """Score many images through the batch scheduler, yielding records as they finish
+
+    Up to `concurrency` images are read, decoded and waiting for inference at
+    once, which lets the scheduler fill whole batches. Every record is also
+    appended to checkpoint_path, and images already scored there are skipped,
+    so an interrupted job picks up where it stopped. The last record is a
+    summary of the run.
+    """
+    done = read_checkpoint(checkpoint_path)
+    counts = {'scored': 0, 'failed': 0, 'skipped': 0, 'compliant': 0, 'violations': 0}
+    started = time.time()
+    checkpoint_file = _open_checkpoint(checkpoint_path) if checkpoint_path else None
+
+    def finished(futures):
+        for future in futures:
+            record = future.result()
+            if record['type'] == 'result':
+                counts['scored'] += 1
+                counts['compliant' if record['compliance']['is_compliant'] else 'violations'] += 1
+            else:
+                counts['failed'] += 1
+            if checkpoint_file is not None:
+                checkpoint_file.write(json.dumps(record) + '\n')
+                checkpoint_file.flush()
+            yield record
+
+    pool = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='batch-job')
+    try:
+        pending = set()
+        for name, load in images:
+            if name in done:
+                counts['skipped'] += 1
+                continue
+            pending.add(pool.submit(_score_one, scheduler, name, load, annotated_dir))
+            # Keep reading ahead bounded so huge archives don't pile up in memory
+            if len(pending) >= 2 * concurrency:
+                completed, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from finished(completed)
+        while pending:
+            completed, pending = wait(pending, return_when=FIRST_COMPLETED)
+            yield from finished(completed)
+    finally:
+        # Drop queued images if the consumer went away, e.g. the client disconnected
+        pool.shutdown(wait=True, cancel_futures=True)
+        if checkpoint_file is not None:
+            checkpoint_file.close()
+
+    elapsed = time.time() - started
+    yield {
+        'type': 'summary',
+        **counts,
+        'elapsed_s': round(elapsed, 2),
+        'images_per_s': round(counts['scored'] / elapsed, 2) if elapsed else 0
+    }
@@ -0,0 +1,69 @@
+"""Score a folder or zip archive of images without going through the web server
+
+Usage:
+    python batch_score.py photos/ --output results.ndjson
+    python batch_score.py gate_photos.zip --output results.ndjson --annotated-dir annotated/
+    python batch_score.py photos/ --output results.ndjson --resume
+
+Results are written as NDJSON, one record per image and a summary at the end.
+With --resume, images already scored in the output file are skipped.
+"""
+import argparse
+import json
+import os
+import sys
+import zipfile
+from config import BATCH_JOB_CONCURRENCY
+from batch_jobs import iter_directory_images, iter_zip_images, score_images
+from batching import BatchScheduler
+from inference import InferenceExecutor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a folder or zip archive of images for dress code compliance")
+    parser.add_argument('source', help="Directory or .zip archive of images")
+    parser.add_argument('--output', help="NDJSON results file, also used as the checkpoint (default: stdout)")
+    parser.add_argument('--resume', action='store_true', help="Skip images already scored in --output")
+    parser.add_argument('--annotated-dir', help="Write annotated copies of the images here")
+    parser.add_argument('--concurrency', type=int, default=BATCH_JOB_CONCURRENCY,
+                        help="Images decoded and in flight at once")
+    args = parser.parse_args()
+
+    if args.resume and not args.output:
+        parser.error("--resume needs --output")
+    if args.output and not args.resume and os.path.exists(args.output):
+        # A fresh run starts a fresh checkpoint
+        open(args.output, 'w').close()
+
+    executor = InferenceExecutor()
+    scheduler = BatchScheduler(executor)
+    scheduler.start()
+    executor.warmup()
+
+    archive = None
+    try:
+        if zipfile.is_zipfile(args.source):
+            archive = zipfile.ZipFile(args.source)
+            images = iter_zip_images(archive)
+        elif os.path.isdir(args.source):
+            images = iter_directory_images(args.source)
+        else:
+            parser.error(f"{args.source} is neither a directory nor a zip archive")
+
+        for record in score_images(scheduler, images, annotated_dir=args.annotated_dir,
+                                   checkpoint_path=args.output, concurrency=args.concurrency):
+            if record['type'] == 'summary':
+                print(json.dumps(record), file=sys.stderr)
+            elif args.output:
+                # Results go to the checkpoint file, keep the terminal to a progress line
+                print(f"{record['type']}: {record['name']}", file=sys.stderr)
+            else:
+                print(json.dumps(record), flush=True)
+    finally:
+        if archive is not None:
+            archive.close()
+        scheduler.shutdown()
+
+
+if __name__ == "__main__":
+    main()
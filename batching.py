@@ -0,0 +1,315 @@
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, InvalidStateError
+from typing import Dict, List, Optional
+import numpy as np
+from config import BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS, BATCH_BUCKETING, INFERENCE_QUEUE_SIZE, ROI_DETECT_IMGSZ
+from detection import analyze_batch, letterbox_shape
+from inference import InferenceExecutor, InferenceQueueFull
+from metrics import BATCH_SIZE, MODEL_PIXELS, observe_stages, pipeline_for_source
+from roi import analyze_roi_batch
+
+
+def _resolve(future: Future, result=None, error: Optional[BaseException] = None):
+    """Complete a caller's future unless the caller already cancelled it"""
+    if future.cancelled():
+        return
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+class _Bucket:
+    """Images sharing a letterbox size, queued per source for round-robin batching"""
+
+    def __init__(self):
+        self.queues = OrderedDict()
+        self.size = 0
+
+    def append(self, source, item: '_PendingImage'):
+        self.queues.setdefault(source, deque()).append(item)
+        self.size += 1
+
+    def oldest(self) -> float:
+        return min(queue[0].enqueued_at for queue in self.queues.values())
+
+    def take(self, count: int) -> List['_PendingImage']:
+        """Pop up to count images, one source at a time in rotation"""
+        batch = []
+        while len(batch) < count and self.queues:
+            source, queue = next(iter(self.queues.items()))
+            batch.append(queue.popleft())
+            if queue:
+                # Send this source to the back so the next image comes from another one
+                self.queues.move_to_end(source)
+            else:
+                del self.queues[source]
+        self.size -= len(batch)
+        return batch
+
+    def items(self):
+        for queue in self.queues.values():
+            yield from queue
+
+
+class _PendingImage:
+    """An image waiting to be put into a batch"""
+    __slots__ = ('image', 'output', 'source', 'roi', 'future', 'enqueued_at')
+
+    def __init__(self, image: np.ndarray, output: str, source: str, roi=None):
+        self.image = image
+        self.output = output
+        self.source = source
+        self.roi = roi
+        self.future = Future()
+        self.enqueued_at = time.time()
+
+
+class BatchScheduler:
+    """Collects images into batches and runs each batch as one model call
+
+    A batch is dispatched to the inference pool once it holds max_batch_size
+    images or its oldest image has waited max_wait_ms. Batches are only
+    dispatched while a worker is free, so under load images keep collecting
+    and batches grow up to max_batch_size. With bucketing enabled, images are
+    grouped by their letterbox size so a batch never pads frames of different
+    aspect ratios to a common square. Within a bucket, images are taken
+    round-robin by source (camera or upload) so one busy source can't starve
+    the others. Images submitted with an roi are batched apart from the rest
+    and go through the two-stage analyze_roi_batch.
+    """
+
+    def __init__(self, executor: InferenceExecutor, max_batch_size: int = BATCH_MAX_SIZE,
+                 max_wait_ms: float = BATCH_MAX_WAIT_MS, bucketing: bool = BATCH_BUCKETING,
+                 max_pending: int = INFERENCE_QUEUE_SIZE):
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_s = max(0.0, max_wait_ms) / 1000
+        self.bucketing = bucketing
+        self.max_pending = max(1, max_pending)
+        self._buckets = OrderedDict()
+        self._pending = 0
+        self._busy = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        self.batches = 0
+        self.images = 0
+        self.rejected = 0
+        self._avg_image_ms = None
+
+    def start(self):
+        """Start the inference pool and the batch collector thread"""
+        self.executor.start()
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._collect, name='batch-scheduler', daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        """Stop collecting batches, failing any images still waiting"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        with self._cond:
+            for bucket in self._buckets.values():
+                for item in bucket.items():
+                    _resolve(item.future, error=RuntimeError("Batch scheduler stopped"))
+            self._buckets.clear()
+            self._pending = 0
+        self.executor.shutdown()
+
+    def _bucket_key(self, image: np.ndarray, roi=None):
+        if roi is not None:
+            # Two-stage images are bucketed by the size of their downscaled search
+            if not self.bucketing:
+                return 'roi'
+            height, width = image.shape[:2]
+            return ('roi', letterbox_shape(height, width, ROI_DETECT_IMGSZ))
+        if not self.bucketing:
+            return None
+        height, width = image.shape[:2]
+        return letterbox_shape(height, width)
+
+    def retry_after(self) -> int:
+        """Estimate in seconds how long until the pending images are served"""
+        with self._cond:
+            batches_ahead = math.ceil(self._pending / self.max_batch_size) + 1
+        service_s = self.executor.average_service_s
+        return max(1, math.ceil(service_s * batches_ahead / self.executor.workers))
+
+    def submit(self, image: np.ndarray, output: str = 'array', source: str = 'upload', roi=None) -> Future:
+        """Queue an image for batched inference, returning a future of (analysis, timing)
+
+        output is 'array', 'base64' or 'none', see analyze_batch. roi asks for
+        two-stage inference, see analyze_roi_batch. Raises InferenceQueueFull
+        when max_pending images are already waiting, and ModelNotReady while
+        the model is loading.
+        """
+        if not self._running:
+            self.start()
+        self.executor.check_ready()
+
+        item = _PendingImage(image, output, source, roi)
+        key = self._bucket_key(image, roi)
+        with self._cond:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                full = True
+            else:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = self._buckets[key] = _Bucket()
+                bucket.append(source, item)
+                self._pending += 1
+                full = False
+                self._cond.notify()
+        if full:
+            raise InferenceQueueFull(self.retry_after())
+        return item.future
+
+    async def run(self, image: np.ndarray, output: str = 'array', source: str = 'upload',
+                  timeout: Optional[float] = None):
+        """Run batched inference on an image, returning (analysis, timing)"""
+        future = self.submit(image, output, source)
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+
+    def _next_batch(self):
+        """Pop the next ready batch, or return how long to wait for one"""
+        if self._busy >= self.executor.workers or not self._pending:
+            return None, None
+
+        now = time.time()
+        ready_key = None
+        ready_since = None
+        next_deadline = None
+        for key, bucket in self._buckets.items():
+            oldest = bucket.oldest()
+            if bucket.size >= self.max_batch_size or now - oldest >= self.max_wait_s:
+                # Serve the bucket whose head has waited longest first
+                if ready_since is None or oldest < ready_since:
+                    ready_key, ready_since = key, oldest
+            else:
+                deadline = oldest + self.max_wait_s
+                if next_deadline is None or deadline < next_deadline:
+                    next_deadline = deadline
+
+        if ready_key is None:
+            return None, max(0.0, next_deadline - now)
+
+        bucket = self._buckets[ready_key]
+        batch = bucket.take(self.max_batch_size)
+        if not bucket.size:
+            del self._buckets[ready_key]
+        self._pending -= len(batch)
+        return batch, None
+
+    def _collect(self):
+        """Collector loop that forms batches and hands them to the pool"""
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                batch, wait_s = self._next_batch()
+                if batch is None:
+                    self._cond.wait(wait_s)
+                    continue
+                self._busy += 1
+
+            self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        # Callers that already gave up don't need a slot in the model call
+        batch = [item for item in batch if not item.future.cancelled()]
+        if not batch:
+            self._finish_batch(0)
+            return
+
+        dispatched_at = time.time()
+        try:
+            if batch[0].roi is None:
+                future = self.executor.submit(analyze_batch, [(item.image, item.output) for item in batch])
+            else:
+                future = self.executor.submit(analyze_roi_batch, [(item.image, item.output, item.roi) for item in batch])
+        except Exception as e:
+            self._finish_batch(0)
+            for item in batch:
+                _resolve(item.future, error=e)
+            return
+
+        def deliver(done):
+            self._finish_batch(len(batch))
+            if done.cancelled() or done.exception() is not None:
+                error = done.exception() if not done.cancelled() else RuntimeError("Batch cancelled")
+                for item in batch:
+                    _resolve(item.future, error=error)
+                return
+
+            analyses, batch_timing = done.result()
+            if analyses:
+                self._record_latency(analyses[0]['inference_ms'] / len(analyses))
+                BATCH_SIZE.observe(len(analyses))
+            for item, analysis in zip(batch, analyses):
+                timing = {
+                    'queue_wait_ms': round((dispatched_at - item.enqueued_at) * 1000 + batch_timing['queue_wait_ms'], 2),
+                    'processing_ms': batch_timing['processing_ms'],
+                    'inference_ms': round(analysis.pop('inference_ms'), 2)
+                }
+                for stage in ('postprocess_ms', 'draw_ms', 'encode_ms'):
+                    if stage in analysis:
+                        timing[stage] = round(analysis.pop(stage), 2)
+                timing['batch_size'] = analysis.pop('batch_size')
+                pipeline = pipeline_for_source(item.source)
+                observe_stages(pipeline, timing)
+                MODEL_PIXELS.inc(analysis.pop('model_pixels', 0), pipeline=pipeline,
+                                 mode='full' if item.roi is None else 'two_stage')
+                _resolve(item.future, result=(analysis, timing))
+
+        future.add_done_callback(deliver)
+
+    def _record_latency(self, image_ms: float):
+        with self._cond:
+            # Exponential moving average of model time per image
+            if self._avg_image_ms is None:
+                self._avg_image_ms = image_ms
+            else:
+                self._avg_image_ms = 0.8 * self._avg_image_ms + 0.2 * image_ms
+
+    def _finish_batch(self, size: int):
+        with self._cond:
+            self._busy -= 1
+            if size:
+                self.batches += 1
+                self.images += size
+            self._cond.notify()
+
+    def stats(self) -> Dict:
+        """Return batching counters along with the pool's stats"""
+        with self._cond:
+            stats = {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait_s * 1000,
+                'bucketing': self.bucketing,
+                'pending': self._pending,
+                'batches_in_flight': self._busy,
+                'batches': self.batches,
+                'images': self.images,
+                'rejected': self.rejected,
+                'avg_batch_size': round(self.images / self.batches, 2) if self.batches else 0,
+                'avg_image_ms': round(self._avg_image_ms, 2) if self._avg_image_ms is not None else None
+            }
+        stats['pool'] = self.executor.stats()
+        return stats
@@ -0,0 +1,417 @@
+"""Benchmark the detection pipeline and write the results as JSON
+
+Usage:
+    python benchmark.py --output bench.json
+    python benchmark.py micro
+    python benchmark.py detect --concurrency 1 4 16 --requests 200
+    python benchmark.py detect --url http://localhost:8000
+    python benchmark.py camera --video hallway.mp4 --clients 1 4 8 --duration 15
+    python benchmark.py all --stub-model --stub-latency-ms 40
+
+Suites:
+    micro   Compliance, gender, post-processing, drawing and encoding helpers
+            at realistic box counts
+    detect  POST /detect load test at rising concurrency
+    camera  Several /ws/camera clients on one CameraManager camera fed by a
+            video file (a synthetic clip when --video is not given)
+
+Everything runs in-process on CPU by default. The stub model is used with
+--stub-model or when best.pt is missing, so the harness works offline; the
+model time can be simulated with --stub-latency-ms. Run with different
+INFERENCE_BACKEND settings or commits and diff the JSON to compare.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+import cv2
+import numpy as np
+import config
+
+SUITES = ('micro', 'detect', 'camera')
+MICRO_BOX_COUNTS = (1, 5, 20, 50)
+MICRO_RESOLUTIONS = ((640, 480), (1280, 720))
+
+
+def _configure(**overrides):
+    """Override config before the pipeline modules import it, and for spawned workers"""
+    for name, value in overrides.items():
+        setattr(config, name, value)
+        os.environ[name] = str(value).lower() if isinstance(value, bool) else str(value)
+
+def _log(message: str):
+    print(message, file=sys.stderr, flush=True)
+
+def summarize(samples_ms: List[float]) -> Dict:
+    """Latency distribution of a list of millisecond samples"""
+    if not samples_ms:
+        return {'n': 0}
+    values = np.asarray(samples_ms, dtype=np.float64)
+    return {
+        'n': len(values),
+        'mean_ms': round(float(values.mean()), 4),
+        'p50_ms': round(float(np.percentile(values, 50)), 4),
+        'p95_ms': round(float(np.percentile(values, 95)), 4),
+        'p99_ms': round(float(np.percentile(values, 99)), 4),
+        'min_ms': round(float(values.min()), 4),
+        'max_ms': round(float(values.max()), 4)
+    }
+
+def time_call(func: Callable, repeat: int, warmup: int = 3) -> List[float]:
+    """Call func repeatedly, returning each call's duration in milliseconds"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+def synthetic_frame(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """A camera-like frame: smooth gradients with a few solid shapes, so JPEG sizes are realistic"""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 1, width, dtype=np.float32)
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    for channel in range(3):
+        phase = rng.random() * np.pi
+        frame[:, :, channel] = (127 + 100 * np.sin(3 * x + phase) * np.cos(2 * y + phase)).astype(np.uint8)
+    for _ in range(6):
+        x1, y1 = int(rng.integers(0, width - 40)), int(rng.integers(0, height - 40))
+        x2, y2 = x1 + int(rng.integers(20, width // 3)), y1 + int(rng.integers(20, height // 2))
+        color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, -1)
+    noise = rng.integers(-6, 7, frame.shape, dtype=np.int16)
+    return np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+def write_synthetic_video(path: str, seconds: float = 20, fps: int = 30, width: int = 640, height: int = 480):
+    """Write a clip of a shape moving across a static background"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+    background = synthetic_frame(width, height, seed=1)
+    for index in range(int(seconds * fps)):
+        frame = background.copy()
+        x = int((index * 7) % (width - 120))
+        cv2.rectangle(frame, (x, height // 4), (x + 120, height - 40), (40, 90, 200), -1)
+        writer.write(frame)
+    writer.release()
+
+def encode_upload(frame: np.ndarray, unique: Optional[int] = None) -> bytes:
+    """JPEG bytes for an upload, with a trailer after the image so each request misses the result cache"""
+    data = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+    if unique is not None:
+        data += unique.to_bytes(8, 'big')
+    return data
+
+
+def bench_micro(repeat: int) -> List[Dict]:
+    """Time the per-image helpers that run after inference"""
+    from backends import StubModel
+    from detection import detect_gender_from_items, check_dress_code_compliance, image_to_base64
+    from postprocess import extract_boxes, build_detections, draw_boxes
+
+    records = []
+    for width, height in MICRO_RESOLUTIONS:
+        frame = synthetic_frame(width, height)
+        for count in MICRO_BOX_COUNTS:
+            result = StubModel(boxes=count)([frame])[0]
+            boxes = extract_boxes(result, threshold=0)
+            labels, _ = build_detections(boxes)
+            gender = detect_gender_from_items(labels)
+            annotated = draw_boxes(frame, boxes)
+
+            cases = {
+                'draw_boxes': lambda: draw_boxes(frame, boxes),
+                'image_to_base64': lambda: image_to_base64(annotated)
+            }
+            if (width, height) == MICRO_RESOLUTIONS[0]:
+                # These don't depend on the frame size, time them once
+                cases.update({
+                    'extract_boxes': lambda: extract_boxes(result, threshold=0),
+                    'build_detections': lambda: build_detections(boxes),
+                    'detect_gender_from_items': lambda: detect_gender_from_items(labels),
+                    'check_dress_code_compliance': lambda: check_dress_code_compliance(labels, gender)
+                })
+            for name, func in cases.items():
+                records.append({
+                    'name': name,
+                    'boxes': count,
+                    'resolution': f"{width}x{height}",
+                    **summarize(time_call(func, repeat))
+                })
+            _log(f"micro: {width}x{height}, {count} boxes done")
+    return records
+
+
+def _detect_client(url: Optional[str]):
+    """An HTTP client for a running server, or one for the app in this process"""
+    if url:
+        import httpx
+        return httpx.Client(base_url=url, timeout=config.INFERENCE_TIMEOUT + 30)
+    from fastapi.testclient import TestClient
+    import main
+    return TestClient(main.app)
+
+def bench_detect(url: Optional[str], concurrency_levels: List[int], requests: int, render: str,
+                 use_cache: bool) -> List[Dict]:
+    """Load test POST /detect with a fixed number of requests per concurrency level"""
+    frames = [synthetic_frame(640, 480, seed) for seed in range(8)]
+    records = []
+    with _detect_client(url) as client:
+        def post(index: int):
+            body = encode_upload(frames[index % len(frames)], None if use_cache else index)
+            started = time.perf_counter()
+            response = client.post(f'/detect?render={render}', files={'file': ('bench.jpg', body, 'image/jpeg')})
+            latency_ms = (time.perf_counter() - started) * 1000
+            timing = response.json().get('timing', {}) if response.status_code == 200 else {}
+            return response.status_code, latency_ms, timing
+
+        # Warm up connections, workers and lazy imports
+        for index in range(4):
+            post(10 ** 9 + index)
+
+        offset = 0
+        for concurrency in concurrency_levels:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(concurrency) as pool:
+                outcomes = list(pool.map(post, range(offset, offset + requests)))
+            wall_s = time.perf_counter() - started
+            offset += requests
+
+            statuses = {}
+            for status, _, _ in outcomes:
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+            ok = [(latency_ms, timing) for status, latency_ms, timing in outcomes if status == 200]
+            server_timing = {}
+            for key in ('decode_ms', 'queue_wait_ms', 'inference_ms', 'postprocess_ms', 'draw_ms',
+                        'encode_ms', 'batch_size'):
+                values = [timing[key] for _, timing in ok if key in timing]
+                if values:
+                    server_timing[key] = round(float(np.mean(values)), 3)
+            records.append({
+                'concurrency': concurrency,
+                'requests': requests,
+                'render': render,
+                'wall_s': round(wall_s, 3),
+                'throughput_rps': round(len(ok) / wall_s, 2),
+                'statuses': statuses,
+                'latency': summarize([latency_ms for latency_ms, _ in ok]),
+                'server_timing_mean': server_timing
+            })
+            _log(f"detect: concurrency {concurrency}: {records[-1]['throughput_rps']} req/s, "
+                 f"p95 {records[-1]['latency'].get('p95_ms')} ms")
+    return records
+
+
+class _PacedCapture:
+    """Wraps a file VideoCapture to deliver frames at the video's frame rate, looping at the end
+
+    OpenCV reads files as fast as it can decode them, which would make the
+    camera pipeline see a burst of frames and then nothing.
+    """
+
+    def __init__(self, capture):
+        self._capture = capture
+        self._interval = 1 / (capture.get(cv2.CAP_PROP_FPS) or 30)
+        self._next_at = time.time()
+
+    def read(self):
+        delay = self._next_at - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        self._next_at = max(self._next_at + self._interval, time.time() - self._interval)
+        ret, frame = self._capture.read()
+        if not ret:
+            self._capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self._capture.read()
+        return ret, frame
+
+    def __getattr__(self, name):
+        return getattr(self._capture, name)
+
+
+def _watch_camera(ws_client, camera_id: str, render: str, binary: bool, stats: Dict):
+    """Receive frames until the server closes the socket, recording arrival times and frame age"""
+    subprotocols = ['dress.binary.v1'] if binary else None
+    try:
+        with ws_client.websocket_connect(f'/ws/camera?camera_id={camera_id}&render={render}',
+                                         subprotocols=subprotocols) as websocket:
+            while True:
+                message = websocket.receive_json()
+                size = len(websocket.receive_bytes()) if binary else len(message.get('image', ''))
+                received = time.time()
+                stats['arrivals'].append(received)
+                stats['bytes'] += size
+                stats['age_ms'].append((received - datetime.fromisoformat(message['timestamp']).timestamp()) * 1000)
+    except Exception:
+        # The server closes every socket when the camera is removed
+        pass
+
+def bench_camera(video: Optional[str], client_counts: List[int], duration: float, render: str,
+                 binary: bool) -> List[Dict]:
+    """Run several WebSocket viewers against one camera fed from a video file
+
+    The file is played back at its own frame rate and looped, like a live
+    camera. A run ends after duration seconds, or early if the pipeline
+    stops producing frames.
+    """
+    from fastapi.testclient import TestClient
+    import main
+
+    temp_dir = None
+    if not video:
+        temp_dir = tempfile.TemporaryDirectory()
+        video = os.path.join(temp_dir.name, 'synthetic.avi')
+        write_synthetic_video(video)
+
+    records = []
+    try:
+        with TestClient(main.app) as client:
+            for clients in client_counts:
+                camera_id = f'bench-{clients}'
+                camera = main.camera_manager.add_camera(video, camera_id=camera_id)
+                camera.camera = _PacedCapture(camera.camera)
+                viewers = [{'arrivals': [], 'bytes': 0, 'age_ms': []} for _ in range(clients)]
+                threads = [
+                    threading.Thread(target=_watch_camera, args=(client, camera_id, render, binary, stats), daemon=True)
+                    for stats in viewers
+                ]
+                for thread in threads:
+                    thread.start()
+
+                started = time.time()
+                last_processed, last_progress = 0, started
+                while time.time() - started < duration:
+                    time.sleep(0.25)
+                    if camera.frames_processed != last_processed:
+                        last_processed, last_progress = camera.frames_processed, time.time()
+                    elif time.time() - last_progress > 2:
+                        break
+                elapsed = time.time() - started
+                status = camera.status()
+                main.camera_manager.remove_camera(camera_id)
+                for thread in threads:
+                    thread.join(timeout=5)
+
+                per_client = []
+                for stats in viewers:
+                    arrivals = stats['arrivals']
+                    gaps = np.diff(arrivals) * 1000 if len(arrivals) > 1 else []
+                    per_client.append({
+                        'frames': len(arrivals),
+                        'fps': round(len(arrivals) / elapsed, 2),
+                        'kbytes_per_s': round(stats['bytes'] / elapsed / 1024, 1),
+                        'frame_age': summarize(stats['age_ms']),
+                        'frame_gap': summarize(list(gaps))
+                    })
+                records.append({
+                    'clients': clients,
+                    'render': render,
+                    'binary': binary,
+                    'elapsed_s': round(elapsed, 2),
+                    'frames': {**status['frames'], 'processing_fps': round(status['frames']['processed'] / elapsed, 2)},
+                    'viewer_dropped': status['viewers']['dropped'],
+                    'mean_client_fps': round(float(np.mean([c['fps'] for c in per_client])), 2),
+                    'clients_detail': per_client
+                })
+                _log(f"camera: {clients} client(s): {records[-1]['frames']['processing_fps']} fps processed, "
+                     f"{records[-1]['mean_client_fps']} fps per client")
+    finally:
+        if temp_dir is not None:
+            temp_dir.cleanup()
+    return records
+
+
+def run_metadata(use_stub: bool) -> Dict:
+    """Everything needed to tell two result files apart"""
+    from backends import model_version
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                    capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'commit': commit,
+        'dirty': dirty,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'backend': config.INFERENCE_BACKEND,
+        'stub_model': use_stub,
+        'model_version': model_version(),
+        'config': {
+            name: getattr(config, name) for name in (
+                'MODEL_IMGSZ', 'INFERENCE_WORKERS', 'INFERENCE_WORKER_MODE', 'BATCH_MAX_SIZE',
+                'BATCH_MAX_WAIT_MS', 'CAMERA_MAX_FPS', 'STUB_MODEL_BOXES', 'STUB_MODEL_LATENCY_MS'
+            )
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dress code detection pipeline")
+    parser.add_argument('suites', nargs='*', choices=SUITES + ('all',), default='all', help="Suites to run (default: all)")
+    parser.add_argument('--output', help="Write the JSON results here (default: stdout)")
+    parser.add_argument('--stub-model', action='store_true', help="Use the stub model even if best.pt exists")
+    parser.add_argument('--stub-latency-ms', type=float, default=config.STUB_MODEL_LATENCY_MS,
+                        help="Simulated model time per image for the stub model")
+    parser.add_argument('--repeat', type=int, default=200, help="Calls per micro-benchmark")
+    parser.add_argument('--url', help="Load test this running server instead of the app in-process")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8],
+                        help="Concurrent /detect clients, one run per level")
+    parser.add_argument('--requests', type=int, default=50, help="Requests per concurrency level")
+    parser.add_argument('--render', choices=('server', 'client'), default='server',
+                        help="render mode for /detect and the camera viewers")
+    parser.add_argument('--cache', action='store_true', help="Repeat identical uploads so the result cache can hit")
+    parser.add_argument('--video', help="Video file for the camera suite (default: a synthetic clip)")
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4], help="WebSocket viewers, one run per count")
+    parser.add_argument('--duration', type=float, default=10, help="Seconds per camera run")
+    parser.add_argument('--json-ws', action='store_true', help="Use base64 JSON frames instead of the binary subprotocol")
+    args = parser.parse_args()
+
+    suites = SUITES if 'all' in args.suites else tuple(dict.fromkeys(args.suites))
+    use_stub = args.stub_model or config.INFERENCE_BACKEND == 'stub' or (
+        config.INFERENCE_BACKEND == 'torch' and not os.path.exists(config.MODEL_PATH)
+    )
+    if use_stub:
+        if not args.stub_model and config.INFERENCE_BACKEND != 'stub':
+            _log(f"{config.MODEL_PATH} not found, using the stub model")
+        _configure(INFERENCE_BACKEND='stub', STUB_MODEL_LATENCY_MS=args.stub_latency_ms)
+    # Keep benchmark violations out of the real spill file
+    spill_dir = tempfile.TemporaryDirectory()
+    _configure(VIOLATION_SPILL_PATH=os.path.join(spill_dir.name, 'violations_spill.ndjson'))
+
+    results = {'meta': run_metadata(use_stub)}
+    if 'micro' in suites:
+        results['micro'] = bench_micro(args.repeat)
+    if 'detect' in suites:
+        results['detect'] = bench_detect(args.url, args.concurrency, args.requests, args.render, args.cache)
+    if 'camera' in suites:
+        results['camera'] = bench_camera(args.video, args.clients, args.duration, args.render, not args.json_ws)
+    spill_dir.cleanup()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+        _log(f"Results written to {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,678 @@
+import asyncio
+import base64
+import threading
+import time
+from collections import deque
+from datetime import datetime
+import uuid
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Union
+import cv2
+from config import (
+    INFERENCE_TIMEOUT, CAMERA_MAX_FPS, CAMERA_JPEG_QUALITY,
+    CAMERA_DEFAULT_LOCATION, CAMERA_WIDTH, CAMERA_HEIGHT, CAMERA_FPS,
+    CAMERA_PEAK_FPS, CAMERA_SHARED_MEMORY, FRAME_RING_SLOTS, MOTION_GATING, MOTION_IDLE_FPS,
+    ROSTER_SCAN_TTL
+)
+from detection import evaluate_compliance
+from encoder import image_encoder
+from frame_ring import FrameRing
+from inference import ModelNotReady
+from motion import MotionGate
+from roi import validate_roi
+from tracking import ComplianceTracker
+
+# Seconds of processed frame timestamps used to report a camera's frame rate
+FPS_WINDOW_S = 5
+# Weight of the newest frame in the smoothed pipeline load
+LOAD_SMOOTHING = 0.2
+
+
+def parse_camera_source(source: Union[int, str]) -> Union[int, str]:
+    """Turn a numeric source like "0" into a device index, leaving URLs and paths alone"""
+    if isinstance(source, str) and source.strip().isdigit():
+        return int(source)
+    return source
+
+
+class PublishedFrame:
+    """One processed camera frame, encoded once per variant and shared by every viewer
+
+    Variants are keyed by (format, annotated, quality, scale). The first
+    viewer to ask for one starts its encode on the shared image_encoder, and
+    any viewer asking while it runs waits on the same encode. annotated_frame
+    is None when no viewer wanted server-drawn boxes, in which case only
+    client-rendering viewers are handed this frame.
+    """
+    __slots__ = ('seq', 'frame', 'annotated_frame', 'detections', 'compliance', 'timestamp',
+                 '_encoded', '_pending', '_data_uris', '_lock')
+
+    def __init__(self, seq: int, frame, annotated_frame, detections: List[Dict],
+                 compliance: Dict, timestamp: str):
+        self.seq = seq
+        self.frame = frame
+        self.annotated_frame = annotated_frame
+        self.detections = detections
+        self.compliance = compliance
+        self.timestamp = timestamp
+        self._encoded = {}
+        self._pending = {}
+        self._data_uris = {}
+        self._lock = threading.Lock()
+
+    @property
+    def width(self) -> int:
+        return self.frame.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.frame.shape[0]
+
+    @property
+    def jpeg(self) -> Optional[bytes]:
+        """The annotated frame as JPEG"""
+        return self._encoded.get(('jpeg', True, CAMERA_JPEG_QUALITY, 1.0))
+
+    def has_render(self, render: str) -> bool:
+        """Whether this frame can be shown to a viewer using the given render mode"""
+        return render == 'client' or self.annotated_frame is not None
+
+    def cached(self, image_format: str = 'jpeg', annotated: bool = True,
+               quality: int = CAMERA_JPEG_QUALITY, scale: float = 1.0) -> Optional[bytes]:
+        """Return an already encoded variant without encoding"""
+        return self._encoded.get((image_format, annotated, quality, scale))
+
+    def submit(self, image_format: str = 'jpeg', annotated: bool = True,
+               quality: int = CAMERA_JPEG_QUALITY, scale: float = 1.0) -> Future:
+        """A future for the annotated or raw frame in 'jpeg' or 'webp', starting its encode unless it has one"""
+        key = (image_format, annotated, quality, scale)
+        with self._lock:
+            future = self._pending.get(key)
+            data = self._encoded.get(key)
+            started = future is None and data is None
+            if started:
+                image = self.annotated_frame if annotated else self.frame
+                future = self._pending[key] = image_encoder.submit(image, image_format, quality, scale)
+        if started:
+            # Outside the lock: the callback runs right here if the encode already finished
+            future.add_done_callback(lambda done: self._store(key, done))
+            return future
+        image_encoder.record_reuse()
+        if future is None:
+            future = Future()
+            future.set_result(data)
+        return future
+
+    def _store(self, key, future: Future):
+        with self._lock:
+            del self._pending[key]
+            if future.exception() is None:
+                self._encoded[key] = future.result()
+
+    def encoded(self, image_format: str = 'jpeg', annotated: bool = True,
+                quality: int = CAMERA_JPEG_QUALITY, scale: float = 1.0) -> bytes:
+        """The encoded variant, waiting for it on the calling thread"""
+        data = self.cached(image_format, annotated, quality, scale)
+        if data is not None:
+            image_encoder.record_reuse()
+            return data
+        return self.submit(image_format, annotated, quality, scale).result()
+
+    async def encoded_async(self, image_format: str = 'jpeg', annotated: bool = True,
+                            quality: int = CAMERA_JPEG_QUALITY, scale: float = 1.0) -> bytes:
+        """The encoded variant, awaited without blocking the event loop"""
+        data = self.cached(image_format, annotated, quality, scale)
+        if data is not None:
+            image_encoder.record_reuse()
+            return data
+        return await asyncio.wrap_future(self.submit(image_format, annotated, quality, scale))
+
+    async def data_uri(self, annotated: bool = True, quality: int = CAMERA_JPEG_QUALITY, scale: float = 1.0) -> str:
+        """The JPEG as a base64 data URI, built on first use"""
+        key = (annotated, quality, scale)
+        data_uri = self._data_uris.get(key)
+        if data_uri is None:
+            img_base64 = base64.b64encode(await self.encoded_async('jpeg', annotated, quality, scale)).decode('utf-8')
+            data_uri = self._data_uris[key] = f"data:image/jpeg;base64,{img_base64}"
+        return data_uri
+
+
+class Subscription:
+    """A viewer's handle on a FrameBroadcaster
+
+    Only the newest frame is kept, so a slow viewer skips the frames it
+    missed instead of building up a backlog. render is 'server' for viewers
+    that show annotated frames and 'client' for viewers that draw the boxes
+    themselves on the raw frame. max_fps is the rate the viewer can take,
+    which lets the camera process faster than CAMERA_MAX_FPS for it.
+    """
+
+    def __init__(self, broadcaster: 'FrameBroadcaster', loop: asyncio.AbstractEventLoop,
+                 render: str = 'server'):
+        self._broadcaster = broadcaster
+        self._loop = loop
+        self.render = render
+        self._event = asyncio.Event()
+        self.last_seq = 0
+        self.dropped = 0
+        self.max_fps = None
+
+    def _notify(self):
+        self._loop.call_soon_threadsafe(self._event.set)
+
+    async def next(self, timeout: Optional[float] = None) -> Optional[PublishedFrame]:
+        """Wait for a frame newer than the last one returned
+
+        Returns None on timeout or once the broadcaster is closed.
+        """
+        while True:
+            # Clear before checking so a publish in between still wakes us
+            self._event.clear()
+            if self._broadcaster.closed:
+                return None
+
+            frame = self._broadcaster.latest
+            if frame is not None and frame.seq > self.last_seq and frame.has_render(self.render):
+                if self.last_seq:
+                    self.dropped += frame.seq - self.last_seq - 1
+                self.last_seq = frame.seq
+                return frame
+
+            try:
+                await asyncio.wait_for(self._event.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+
+    @property
+    def closed(self) -> bool:
+        """Whether the feed this subscription belongs to has ended"""
+        return self._broadcaster.closed
+
+    def close(self):
+        """Stop receiving frames"""
+        self._broadcaster.unsubscribe(self)
+
+
+class FrameBroadcaster:
+    """Fans each published frame out to all subscribers"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self.latest = None
+        self.closed = False
+        self.published = 0
+
+    def subscribe(self, render: str = 'server') -> Subscription:
+        """Register a viewer running on the current event loop"""
+        subscription = Subscription(self, asyncio.get_running_loop(), render)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def render_modes(self) -> set:
+        """Render modes wanted by the current subscribers"""
+        with self._lock:
+            return {subscription.render for subscription in self._subscribers}
+
+    def wanted_fps(self) -> Optional[float]:
+        """Fastest rate any subscriber asked for, None when none did"""
+        with self._lock:
+            rates = [s.max_fps for s in self._subscribers if s.max_fps is not None]
+        return max(rates) if rates else None
+
+    def publish(self, frame: PublishedFrame):
+        """Make frame the latest one and wake every subscriber"""
+        with self._lock:
+            self.latest = frame
+            self.published += 1
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription._notify()
+
+    def close(self):
+        """Wake every subscriber so it can notice the feed has ended"""
+        with self._lock:
+            self.closed = True
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription._notify()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'published': self.published,
+                'dropped': sum(s.dropped for s in self._subscribers),
+                'wanted_fps': max((s.max_fps for s in self._subscribers if s.max_fps is not None), default=None)
+            }
+
+
+class Camera:
+    """One camera with its own capture -> infer -> annotate -> encode pipeline
+
+    A capture thread keeps only the newest frame from the device. A pipeline
+    thread runs each new frame through the shared inference scheduler once
+    and publishes the encoded result to a FrameBroadcaster, so the inference
+    cost does not depend on how many viewers are connected. With
+    shared_memory the capture thread reads frames straight into a FrameRing,
+    so inference processes get them without a copy. roi switches the
+    camera to two-stage inference: 'people' to find people on a downscaled
+    frame first, or a list of polygons to only look inside fixed regions
+    (see analyze_roi_batch).
+    """
+
+    def __init__(self, camera_id: str, source: Union[int, str], scheduler, log_violation: Callable,
+                 location: str = CAMERA_DEFAULT_LOCATION, width: int = CAMERA_WIDTH,
+                 height: int = CAMERA_HEIGHT, fps: int = CAMERA_FPS, roi=None,
+                 shared_memory: bool = CAMERA_SHARED_MEMORY):
+        self.camera_id = camera_id
+        self.source = parse_camera_source(source)
+        self.location = location
+        self.roi = validate_roi(roi)
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.scheduler = scheduler
+        self.log_violation = log_violation
+        self.camera = None
+        self.is_active = False
+        self.last_detection = None
+        self.violation_count = 0
+        self.tracker = ComplianceTracker(location=location)
+        self.motion_gate = MotionGate() if MOTION_GATING else None
+        self.student_id = None
+        self.pending_scan = None
+        self.broadcaster = FrameBroadcaster()
+        self.shared_memory = shared_memory
+        self.frame_ring = None
+        self._frame = None
+        self._frame_seq = 0
+        self._frame_cond = threading.Condition()
+        self._threads = []
+        self.frames_processed = 0
+        self.frames_skipped = 0
+        self._processed_at = deque()
+        self.load = 0.0
+
+    def start(self):
+        """Start camera capture"""
+        if self.is_active:
+            return True
+
+        try:
+            self.camera = cv2.VideoCapture(self.source)
+            if not self.camera.isOpened():
+                print(f"Error starting camera {self.camera_id}: could not open {self.source}")
+                self.camera.release()
+                self.camera = None
+                return False
+
+            self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+            self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+            self.camera.set(cv2.CAP_PROP_FPS, self.fps)
+            self.is_active = True
+        except Exception as e:
+            print(f"Error starting camera {self.camera_id}: {e}")
+            return False
+
+        self.broadcaster = FrameBroadcaster()
+        self.tracker.reset()
+        if self.motion_gate is not None:
+            self.motion_gate.reset()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name=f'capture-{self.camera_id}', daemon=True),
+            threading.Thread(target=self._pipeline_loop, name=f'pipeline-{self.camera_id}', daemon=True)
+        ]
+        for thread in self._threads:
+            thread.start()
+        return True
+
+    def stop(self):
+        """Stop camera capture"""
+        self.is_active = False
+        with self._frame_cond:
+            self._frame_cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self.broadcaster.close()
+
+        if self.camera:
+            self.camera.release()
+            self.camera = None
+        self._frame = None
+        if self.frame_ring is not None:
+            self.frame_ring.retire()
+            self.frame_ring = None
+
+    def subscribe(self, render: str = 'server') -> Subscription:
+        """Subscribe to the processed frames of the running camera"""
+        return self.broadcaster.subscribe(render)
+
+    def get_frame(self):
+        """Get the newest frame captured from the camera"""
+        with self._frame_cond:
+            return self._frame
+
+    def _capture_loop(self):
+        """Read frames from the device as they arrive, keeping only the newest"""
+        while self.is_active:
+            ret, frame = self._read_frame()
+            if not ret:
+                time.sleep(0.1)
+                continue
+            if frame is None:
+                # Every ring slot is still in use downstream
+                continue
+            with self._frame_cond:
+                self._frame = frame
+                self._frame_seq += 1
+                self._frame_cond.notify_all()
+
+    def _read_frame(self):
+        """Read the next frame, into a free frame_ring slot when shared memory is on
+
+        Returns (ret, frame), with frame None when the frame had to be dropped.
+        """
+        ring = self.frame_ring
+        if ring is None:
+            ret, frame = self.camera.read()
+            if ret and self.shared_memory:
+                # Sized from a real frame, devices don't always honour the requested resolution
+                self.frame_ring = self._create_ring(frame.shape)
+            return ret, frame
+
+        buffer = ring.acquire()
+        if buffer is None:
+            # Still take the frame off the device so the next read isn't a stale one
+            return self.camera.grab(), None
+        ret, frame = self.camera.read(buffer)
+        if ret and frame is not buffer:
+            # The resolution changed, start a ring of the new size
+            ring.retire()
+            self.frame_ring = self._create_ring(frame.shape)
+        return ret, frame
+
+    def _create_ring(self, shape, slots: int = FRAME_RING_SLOTS) -> Optional[FrameRing]:
+        """A FrameRing for frames of shape, or None with shared memory turned off if it can't be allocated"""
+        try:
+            return FrameRing(shape, slots)
+        except OSError as e:
+            print(f"Camera {self.camera_id}: shared memory unavailable, passing frames by copy: {e}")
+            self.shared_memory = False
+            return None
+
+    def _wait_for_frame(self, last_seq: int, timeout: float):
+        """Wait for a frame newer than last_seq, returning (frame, seq)"""
+        with self._frame_cond:
+            if self._frame_seq <= last_seq and self.is_active:
+                self._frame_cond.wait(timeout)
+            if self._frame_seq <= last_seq:
+                return None, last_seq
+            return self._frame, self._frame_seq
+
+    def _pipeline_loop(self):
+        """Process each new frame once and publish it to all viewers
+
+        With motion gating, frames where nothing changed are dropped before
+        inference and viewers keep the last published frame. The loop checks
+        MOTION_IDLE_FPS frames per second while idle and goes back to
+        target_fps() as soon as motion appears.
+        """
+        idle_interval = 1 / min(MOTION_IDLE_FPS, CAMERA_MAX_FPS)
+        last_seq = 0
+        published_seq = 0
+        while self.is_active:
+            frame, seq = self._wait_for_frame(last_seq, timeout=1.0)
+            if frame is None:
+                continue
+            if last_seq:
+                # Frames the capture thread replaced before we got to them
+                self.frames_skipped += seq - last_seq - 1
+            last_seq = seq
+
+            started = time.time()
+            min_interval = 1 / self.target_fps()
+            if self.motion_gate is not None and not self.motion_gate.check(frame):
+                self._throttle(started, min_interval if self.motion_gate.active else idle_interval)
+                continue
+
+            # Only draw and encode what the connected viewers will actually show
+            render_modes = self.broadcaster.render_modes()
+            detection_result = self.process_frame(frame, self.student_id, annotate='server' in render_modes)
+            if detection_result:
+                published_seq += 1
+                self._publish(published_seq, frame, detection_result, render_modes)
+
+            # Share of the frame interval spent processing, which viewers use as inference headroom
+            busy = (time.time() - started) / min_interval
+            self.load += LOAD_SMOOTHING * (busy - self.load)
+            self._throttle(started, min_interval)
+
+    def target_fps(self) -> float:
+        """CAMERA_MAX_FPS, raised up to CAMERA_PEAK_FPS for viewers that keep up with more"""
+        wanted = self.broadcaster.wanted_fps()
+        if wanted is None:
+            return CAMERA_MAX_FPS
+        return max(CAMERA_MAX_FPS, min(CAMERA_PEAK_FPS, wanted))
+
+    def _publish(self, seq: int, frame, detection_result: Dict, render_modes: set):
+        """Hand a processed frame to the broadcaster, starting its encodes for the current viewers"""
+        published = PublishedFrame(
+            seq,
+            frame,
+            detection_result['annotated_frame'],
+            detection_result['detections'],
+            detection_result['compliance'],
+            detection_result['timestamp']
+        )
+        # Start the default encodes for current viewers, unless the encoder is behind and
+        # would only finish them after viewers have moved on; viewers then ask for what they need
+        for render in render_modes:
+            if not image_encoder.busy:
+                published.submit('jpeg', annotated=render == 'server')
+        self.broadcaster.publish(published)
+        self._record_processed()
+
+    @property
+    def frames_captured(self) -> int:
+        return self._frame_seq
+
+    def _record_processed(self):
+        now = time.time()
+        self.frames_processed += 1
+        self._processed_at.append(now)
+        while self._processed_at[0] < now - FPS_WINDOW_S:
+            self._processed_at.popleft()
+
+    def processing_fps(self) -> float:
+        """Frames processed per second over the last FPS_WINDOW_S seconds"""
+        cutoff = time.time() - FPS_WINDOW_S
+        return round(sum(1 for processed_at in list(self._processed_at) if processed_at >= cutoff) / FPS_WINDOW_S, 2)
+
+    def _throttle(self, started: float, interval: float):
+        """Sleep out the rest of interval to cap the processing rate"""
+        elapsed = time.time() - started
+        if elapsed < interval:
+            time.sleep(interval - elapsed)
+
+    def bind_student(self, student, ttl: float = ROSTER_SCAN_TTL):
+        """Attribute the next person detected by this camera to a scanned student
+
+        The scan waits up to ttl seconds for someone to be in view.
+        """
+        self.pending_scan = (student, time.time() + ttl)
+
+    def _bind_pending_scan(self) -> bool:
+        scan = self.pending_scan
+        if scan is None:
+            return False
+        student, expires_at = scan
+        if time.time() > expires_at:
+            self.pending_scan = None
+            return False
+        track_id = self.tracker.bind(student.student_id, student.gender)
+        if track_id is None:
+            return False
+        self.pending_scan = None
+        print(f"Camera {self.camera_id}: student {student.student_id} bound to track {track_id}")
+        return True
+
+    def process_frame(self, frame, student_id=None, annotate=True):
+        """Process frame for dress code detection"""
+        try:
+            # Run YOLO inference, batched with other frames and uploads
+            future = self.submit_frame(frame, annotate)
+            analysis, _ = future.result(timeout=INFERENCE_TIMEOUT)
+            return self.handle_analysis(analysis, student_id)
+
+        except ModelNotReady as e:
+            # Frames captured while the model is still loading are skipped quietly
+            if e.error:
+                print(f"Error processing frame: {e}")
+            return None
+        except Exception as e:
+            print(f"Error processing frame: {e}")
+            return None
+
+    def submit_frame(self, frame, annotate=True):
+        """Queue a frame for inference, returning the scheduler future"""
+        return self.scheduler.submit(frame, output='array' if annotate else 'none', source=self.camera_id, roi=self.roi)
+
+    def handle_analysis(self, analysis: Dict, student_id=None) -> Dict:
+        """Check compliance and update tracking for one frame's inference result
+
+        Frames must be handled in capture order, since tracks carry over from
+        one frame to the next.
+        """
+        detection_details = analysis['detections']
+        compliance_result = evaluate_compliance(analysis, location=self.location)
+        annotated_frame = analysis.get('annotated_image')
+
+        # A person already in view is bound before this frame's update, a new one right after
+        bound = self._bind_pending_scan()
+        violations = self.tracker.update(detection_details)
+        if not bound:
+            self._bind_pending_scan()
+
+        # Log each tracked person once, after they stay non-compliant for a few frames
+        for violation in violations:
+            self.log_violation(violation['student_id'] or student_id, violation['missing_items'], self.location)
+            self.violation_count += 1
+
+        # Store results
+        self.last_detection = {
+            'detections': detection_details,
+            'compliance': compliance_result,
+            'tracks': self.tracker.active_tracks(),
+            'violations': violations,
+            'regions': analysis.get('regions'),
+            'annotated_frame': annotated_frame,
+            'timestamp': datetime.now().isoformat()
+        }
+
+        return self.last_detection
+
+    def status(self) -> Dict:
+        """Return camera state without the annotated frame"""
+        last_detection = None
+        if self.last_detection:
+            last_detection = {
+                key: value for key, value in self.last_detection.items()
+                if key != 'annotated_frame'
+            }
+        scan = self.pending_scan
+        ring = self.frame_ring
+        return {
+            "camera_id": self.camera_id,
+            "source": self.source,
+            "location": self.location,
+            "width": self.width,
+            "height": self.height,
+            "fps": self.fps,
+            "roi": self.roi,
+            "active": self.is_active,
+            "last_detection": last_detection,
+            "violation_count": self.violation_count,
+            "pending_scan": scan[0].student_id if scan else None,
+            "frames": {
+                "captured": self.frames_captured,
+                "processed": self.frames_processed,
+                "skipped": self.frames_skipped,
+                "processing_fps": self.processing_fps(),
+                "target_fps": self.target_fps(),
+                "load": round(self.load, 3)
+            },
+            "tracking": self.tracker.stats(),
+            "motion": self.motion_gate.stats() if self.motion_gate is not None else None,
+            "viewers": self.broadcaster.stats(),
+            "shared_memory": ring.stats() if ring is not None else None
+        }
+
+
+class CameraManager:
+    """Registry of cameras, all feeding the same inference scheduler"""
+
+    def __init__(self, scheduler, log_violation: Callable):
+        self.scheduler = scheduler
+        self.log_violation = log_violation
+        self._cameras = {}
+        self._lock = threading.Lock()
+
+    def add_camera(self, source: Union[int, str], camera_id: Optional[str] = None,
+                   location: str = CAMERA_DEFAULT_LOCATION, width: int = CAMERA_WIDTH,
+                   height: int = CAMERA_HEIGHT, fps: int = CAMERA_FPS, roi=None) -> Camera:
+        """Register a camera and start its pipeline
+
+        Raises KeyError if the ID is taken, ValueError for an invalid roi and
+        RuntimeError if the source can't be opened.
+        """
+        return self.add(lambda camera_id: Camera(
+            camera_id, source, self.scheduler, self.log_violation,
+            location=location, width=width, height=height, fps=fps, roi=roi
+        ), camera_id)
+
+    def add(self, factory: Callable[[str], Camera], camera_id: Optional[str] = None) -> Camera:
+        """Register and start a camera built by factory(camera_id), for Camera subclasses"""
+        camera_id = camera_id or uuid.uuid4().hex[:8]
+        with self._lock:
+            if camera_id in self._cameras:
+                raise KeyError(camera_id)
+            camera = factory(camera_id)
+            self._cameras[camera_id] = camera
+
+        if not camera.start():
+            with self._lock:
+                self._cameras.pop(camera_id, None)
+            raise RuntimeError(f"Could not open camera source {camera.source}")
+        return camera
+
+    def remove_camera(self, camera_id: str) -> bool:
+        """Stop a camera and drop it from the registry"""
+        with self._lock:
+            camera = self._cameras.pop(camera_id, None)
+        if camera is None:
+            return False
+        camera.stop()
+        return True
+
+    def get(self, camera_id: str) -> Optional[Camera]:
+        with self._lock:
+            return self._cameras.get(camera_id)
+
+    def cameras(self) -> List[Camera]:
+        with self._lock:
+            return list(self._cameras.values())
+
+    def stop_all(self):
+        """Stop every registered camera"""
+        with self._lock:
+            cameras = list(self._cameras.values())
+            self._cameras.clear()
+        for camera in cameras:
+            camera.stop()
@@ -12,6 +12,11 @@ DB_CONFIG = {
 # YOLOv8 Model Configuration
 MODEL_PATH = "best.pt"
 CONFIDENCE_THRESHOLD = 0.5
+MODEL_IMGSZ = int(os.getenv('MODEL_IMGSZ', 640))  # Inference size images are letterboxed to
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'torch')  # 'torch', 'torchscript', 'onnxruntime', 'openvino' or 'stub'
+MODEL_WARMUP_RUNS = int(os.getenv('MODEL_WARMUP_RUNS', 2))  # Throwaway inferences per worker at startup
+STUB_MODEL_BOXES = int(os.getenv('STUB_MODEL_BOXES', 6))  # Boxes per image from the stub backend
+STUB_MODEL_LATENCY_MS = float(os.getenv('STUB_MODEL_LATENCY_MS', 0))  # Simulated model time per image for the stub backend
 
 # Class mapping for the trained model
 CLASS_NAMES = {
@@ -30,6 +35,17 @@ DRESS_CODE_REQUIREMENTS = {
     'Female': ['blouse', 'skirt', 'shoes']
 }
 
+# Items that satisfy a requirement in place of the required item, per gender
+EQUIVALENT_ITEMS = {
+    'Female': {'shoes': ['doll_shoes']}
+}
+
+# Items that hint at a student's gender when it isn't known
+GENDER_ITEMS = {
+    'Female': ['blouse', 'skirt', 'doll_shoes'],
+    'Male': ['polo_shirt', 'pants', 'shoes']
+}
+
 # Class mapping for display names
 DISPLAY_NAMES = {
     'blouse': 'Blouse',
@@ -40,3 +56,108 @@ DISPLAY_NAMES = {
     'shoes': 'Shoes',
     'skirt': 'Skirt'
 }
+
+# Upload ingest
+MAX_UPLOAD_BYTES = int(os.getenv('MAX_UPLOAD_BYTES', 20 * 1024 * 1024))  # Larger uploads are refused with 413
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 1024 * 1024))  # Bytes read per chunk
+UPLOAD_REDUCED_DECODE = os.getenv('UPLOAD_REDUCED_DECODE', 'true').lower() == 'true'  # Decode large JPEGs at 1/2, 1/4 or 1/8 size
+
+# Cache of /detect results for re-submitted images
+RESULT_CACHE_ENABLED = os.getenv('RESULT_CACHE_ENABLED', 'true').lower() == 'true'
+RESULT_CACHE_TTL = float(os.getenv('RESULT_CACHE_TTL', 300))  # Seconds a result stays valid
+RESULT_CACHE_MAX_BYTES = int(os.getenv('RESULT_CACHE_MAX_BYTES', 64 * 1024 * 1024))  # Memory cap, mostly annotated images
+RESULT_CACHE_SPILL_DIR = os.getenv('RESULT_CACHE_SPILL_DIR', '')  # Keep evicted results on disk here, empty to drop them
+RESULT_CACHE_DISK_MAX_BYTES = int(os.getenv('RESULT_CACHE_DISK_MAX_BYTES', 256 * 1024 * 1024))
+
+# Inference worker pool
+INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', 2))
+INFERENCE_WORKER_MODE = os.getenv('INFERENCE_WORKER_MODE', 'thread')  # 'thread' or 'process'
+INFERENCE_QUEUE_SIZE = int(os.getenv('INFERENCE_QUEUE_SIZE', 16))  # Requests allowed to wait for a worker
+INFERENCE_TIMEOUT = float(os.getenv('INFERENCE_TIMEOUT', 30))  # Seconds
+INFERENCE_THREADS_PER_WORKER = int(os.getenv('INFERENCE_THREADS_PER_WORKER', 0)) or None  # Torch threads per process worker
+
+# Dynamic micro-batching of inference requests
+BATCH_MAX_SIZE = int(os.getenv('BATCH_MAX_SIZE', 8))  # Images per model call
+BATCH_MAX_WAIT_MS = float(os.getenv('BATCH_MAX_WAIT_MS', 10))  # Longest an image waits for a batch to fill
+BATCH_BUCKETING = os.getenv('BATCH_BUCKETING', 'true').lower() == 'true'  # Only batch images with the same letterbox size
+
+# Batch scoring of image folders and archives
+BATCH_JOB_CONCURRENCY = int(os.getenv('BATCH_JOB_CONCURRENCY', BATCH_MAX_SIZE))  # Images decoded and in flight at once per job
+BATCH_ROOT = os.getenv('BATCH_ROOT', 'batch')  # Directory /detect/batch may read images from and write outputs to
+BATCH_MAX_UPLOAD_BYTES = int(os.getenv('BATCH_MAX_UPLOAD_BYTES', 512 * 1024 * 1024))  # Larger zip uploads are refused with 413
+BATCH_MAX_UNPACKED_BYTES = int(os.getenv('BATCH_MAX_UNPACKED_BYTES', 2 * 1024 * 1024 * 1024))  # Zips whose images unpack to more are refused with 413
+
+# Live camera pipeline
+CAMERA_MAX_FPS = float(os.getenv('CAMERA_MAX_FPS', 10))  # Frames processed per second
+CAMERA_JPEG_QUALITY = int(os.getenv('CAMERA_JPEG_QUALITY', 80))
+CAMERA_DEFAULT_SOURCE = os.getenv('CAMERA_DEFAULT_SOURCE', '0')  # Device index, RTSP URL or file used by /camera/start
+CAMERA_DEFAULT_LOCATION = os.getenv('CAMERA_DEFAULT_LOCATION', 'Live Camera')
+CAMERA_WIDTH = int(os.getenv('CAMERA_WIDTH', 640))
+CAMERA_HEIGHT = int(os.getenv('CAMERA_HEIGHT', 480))
+CAMERA_FPS = int(os.getenv('CAMERA_FPS', 30))
+CAMERA_PEAK_FPS = float(os.getenv('CAMERA_PEAK_FPS', 30))  # Highest processing rate, used when viewers keep up and inference has headroom
+CAMERA_SHARED_MEMORY = os.getenv('CAMERA_SHARED_MEMORY', str(INFERENCE_WORKER_MODE == 'process')).lower() == 'true'  # Capture into shared memory read by inference processes, on by default in process mode
+FRAME_RING_SLOTS = int(os.getenv('FRAME_RING_SLOTS', 8))  # Shared memory frame slots per camera
+
+# Image encoding for viewers
+ENCODER_THREADS = int(os.getenv('ENCODER_THREADS', min(4, os.cpu_count() or 1)))  # Threads encoding camera frames off the event loop
+ENCODER_BACKEND = os.getenv('ENCODER_BACKEND', 'auto')  # 'auto', 'opencv' or 'turbojpeg', auto uses TurboJPEG for JPEG when it is installed
+
+# Adaptive streaming to WebSocket viewers
+WS_MIN_FPS = float(os.getenv('WS_MIN_FPS', 1))  # Slowest rate a lagging viewer is throttled to
+WS_MAX_FPS = float(os.getenv('WS_MAX_FPS', 30))  # Fastest rate a viewer is sent frames at
+WS_MAX_UNACKED = int(os.getenv('WS_MAX_UNACKED', 2))  # Frames in flight to viewers that send acks
+WS_ACK_TIMEOUT = float(os.getenv('WS_ACK_TIMEOUT', 2))  # Seconds without an ack before frames resume anyway
+
+# Two-stage inference for high-resolution cameras
+CAMERA_TWO_STAGE = os.getenv('CAMERA_TWO_STAGE', 'false').lower() == 'true'  # Default for cameras added without a two_stage setting
+ROI_DETECT_IMGSZ = int(os.getenv('ROI_DETECT_IMGSZ', 320))  # Inference size of the downscaled search for people
+ROI_DETECT_CONFIDENCE = float(os.getenv('ROI_DETECT_CONFIDENCE', 0.25))  # Lower than CONFIDENCE_THRESHOLD so far-away people aren't missed
+ROI_CROP_IMGSZ = int(os.getenv('ROI_CROP_IMGSZ', 416))  # Inference size of each person or region crop
+ROI_MARGIN = float(os.getenv('ROI_MARGIN', 0.15))  # Fraction a person box is grown by on each side before cropping
+
+# Recorded video replay
+REPLAY_PREFETCH = int(os.getenv('REPLAY_PREFETCH', 32))  # Decoded frames buffered ahead of inference
+REPLAY_MAX_IN_FLIGHT = int(os.getenv('REPLAY_MAX_IN_FLIGHT', BATCH_MAX_SIZE * 2))  # Frames waiting on inference at once at max speed
+
+# Motion gating of live feeds
+MOTION_GATING = os.getenv('MOTION_GATING', 'true').lower() == 'true'  # Skip inference on frames where nothing changed
+MOTION_THRESHOLD = float(os.getenv('MOTION_THRESHOLD', 0.01))  # Fraction of changed pixels that counts as motion
+MOTION_PIXEL_DELTA = int(os.getenv('MOTION_PIXEL_DELTA', 25))  # Grayscale difference for a pixel to count as changed
+MOTION_IDLE_FPS = float(os.getenv('MOTION_IDLE_FPS', 2))  # Frames checked per second while the scene is idle
+MOTION_HOLD_S = float(os.getenv('MOTION_HOLD_S', 2))  # Seconds to stay at CAMERA_MAX_FPS after motion
+MOTION_REFRESH_S = float(os.getenv('MOTION_REFRESH_S', 10))  # Run inference at least this often even without motion
+MOTION_FRAME_WIDTH = int(os.getenv('MOTION_FRAME_WIDTH', 160))  # Width frames are shrunk to before comparing
+
+# Per-person tracking on live feeds
+TRACK_CONFIRM_FRAMES = int(os.getenv('TRACK_CONFIRM_FRAMES', 5))  # Consecutive non-compliant frames before a violation is logged
+TRACK_IOU_THRESHOLD = float(os.getenv('TRACK_IOU_THRESHOLD', 0.3))  # Minimum overlap to continue a track
+TRACK_MAX_MISSED = int(os.getenv('TRACK_MAX_MISSED', 10))  # Processed frames a track survives unseen
+TRACK_GROUP_OVERLAP = float(os.getenv('TRACK_GROUP_OVERLAP', 0.5))  # Horizontal overlap that joins items into one person
+
+# Violation write-behind logging
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))  # Connections shared by queries, the roster and rules; the violation writer has its own
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 2))  # Seconds to wait for a free pooled connection before giving up
+VIOLATION_FLUSH_SIZE = int(os.getenv('VIOLATION_FLUSH_SIZE', 50))  # Rows per executemany
+VIOLATION_FLUSH_INTERVAL = float(os.getenv('VIOLATION_FLUSH_INTERVAL', 1.0))  # Seconds between flushes
+VIOLATION_RETRY_INTERVAL = float(os.getenv('VIOLATION_RETRY_INTERVAL', 30))  # Seconds to wait after the database fails
+VIOLATION_MAX_BUFFER = int(os.getenv('VIOLATION_MAX_BUFFER', 10000))  # Rows held in memory before spilling
+VIOLATION_SPILL_PATH = os.getenv('VIOLATION_SPILL_PATH', 'violations_spill.ndjson')
+
+# Violations dashboard queries
+VIOLATION_STATS_CACHE_TTL = float(os.getenv('VIOLATION_STATS_CACHE_TTL', 30))  # Seconds /violations/stats results are reused
+
+# Student roster and RFID scans
+ROSTER_REFRESH_INTERVAL = float(os.getenv('ROSTER_REFRESH_INTERVAL', 60))  # Seconds between checks for new students
+ROSTER_FULL_RELOAD_INTERVAL = float(os.getenv('ROSTER_FULL_RELOAD_INTERVAL', 3600))  # Seconds between full reloads, to pick up edits
+ROSTER_MISS_REFRESH_INTERVAL = float(os.getenv('ROSTER_MISS_REFRESH_INTERVAL', 5))  # Minimum seconds between refreshes triggered by unknown tags
+ROSTER_SCAN_TTL = float(os.getenv('ROSTER_SCAN_TTL', 15))  # Seconds a scan waits for a person to appear on camera
+
+# Dress code rules
+RULES_REFRESH_INTERVAL = float(os.getenv('RULES_REFRESH_INTERVAL', 30))  # Seconds between checks of the requirements table
+
+# Web server, used by python main.py and gunicorn.conf.py
+SERVER_HOST = os.getenv('SERVER_HOST', '0.0.0.0')
+SERVER_PORT = int(os.getenv('SERVER_PORT', 8000))
+SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', 1))  # API processes under gunicorn, each with its own INFERENCE_WORKERS models
+SERVER_GRACEFUL_TIMEOUT = int(os.getenv('SERVER_GRACEFUL_TIMEOUT', 30))  # Seconds a stopping worker gets to finish its requests
@@ -0,0 +1,50 @@
+import threading
+import time
+from mysql.connector import Error, errors, pooling
+from config import DB_CONFIG, DB_POOL_SIZE, DB_POOL_TIMEOUT
+
+# Pool used by the dashboard queries, the roster refresh and the rules poller
+SHARED_POOL = 'dresstest'
+# Pool only the violation writer uses, so read traffic can never push writes onto the spill path
+WRITER_POOL = 'dresstest_writer'
+
+# Connections per pool; the writer's single thread holds at most one at a time
+POOL_SIZES = {SHARED_POOL: DB_POOL_SIZE, WRITER_POOL: 1}
+
+# Seconds between attempts to get a connection while every one is lent out
+POOL_RETRY_INTERVAL = 0.05
+
+_pools = {}
+_pool_lock = threading.Lock()
+
+
+def get_db_connection(pool_name: str = SHARED_POOL, timeout: float = DB_POOL_TIMEOUT):
+    """Get a pooled database connection, or None when the database is unavailable
+
+    Closing the returned connection hands it back to the pool. When every
+    connection in the pool is in use this waits up to timeout seconds for
+    one to come back, since a busy pool doesn't mean the database is down.
+    """
+    try:
+        with _pool_lock:
+            pool = _pools.get(pool_name)
+            if pool is None:
+                pool = _pools[pool_name] = pooling.MySQLConnectionPool(
+                    pool_name=pool_name,
+                    pool_size=POOL_SIZES[pool_name],
+                    pool_reset_session=True,
+                    **DB_CONFIG
+                )
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return pool.get_connection()
+            except errors.PoolError:
+                if time.monotonic() >= deadline:
+                    print(f"Database pool {pool_name} busy: all {pool.pool_size} connection(s) in use")
+                    return None
+                time.sleep(POOL_RETRY_INTERVAL)
+    except Error as e:
+        print(f"Warning: Could not connect to MySQL database: {e}")
+        print("Application will continue without database logging.")
+        return None
@@ -0,0 +1,124 @@
+import cv2
+import numpy as np
+import base64
+import time
+from typing import List, Dict, Optional
+from config import MODEL_IMGSZ
+from encoder import image_encoder
+from frame_ring import attach_frames
+from postprocess import extract_boxes, build_detections, draw_boxes, class_mask
+from rules import rule_engine
+
+
+class InvalidImageError(ValueError):
+    """Raised when uploaded bytes cannot be decoded as an image"""
+
+
+def detect_gender_from_items(detected_items: List[str]) -> str:
+    """Detect gender based on detected clothing items"""
+    return rule_engine.guess_gender(detected_items)
+
+def check_dress_code_compliance(detected_items: List[str], gender: str, location: Optional[str] = None) -> Dict:
+    """Check dress code compliance based on detected items and gender"""
+    return rule_engine.evaluate(detected_items, gender, location)
+
+def evaluate_compliance(analysis: Dict, gender: Optional[str] = None, location: Optional[str] = None) -> Dict:
+    """Check an analysis from analyze_batch against the rules for a location
+
+    Compliance is evaluated by the caller rather than in the inference
+    worker, so rule changes and per-location rules apply to cached results
+    and process workers alike.
+    """
+    detected_items = [detection['label'] for detection in analysis['detections']]
+    return rule_engine.evaluate(detected_items, gender, location, mask=analysis.get('class_mask'))
+
+def image_to_base64(image: np.ndarray) -> str:
+    """Convert numpy image to base64 string"""
+    img_base64 = base64.b64encode(image_encoder.encode(image)).decode('utf-8')
+    return f"data:image/jpeg;base64,{img_base64}"
+
+def decode_image(contents: bytes) -> np.ndarray:
+    """Decode uploaded image bytes into a BGR array"""
+    nparr = np.frombuffer(contents, np.uint8)
+    image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+    if image is None:
+        raise InvalidImageError("Invalid image file or corrupted image")
+
+    return image
+
+def letterbox_shape(height: int, width: int, imgsz: int = MODEL_IMGSZ, stride: int = 32):
+    """Return the (height, width) YOLO letterboxes an image of this size to"""
+    ratio = min(imgsz / height, imgsz / width)
+    new_height = int(round(height * ratio))
+    new_width = int(round(width * ratio))
+    return (
+        new_height + (-new_height) % stride,
+        new_width + (-new_width) % stride
+    )
+
+def analyze_batch(model, items: List) -> List[Dict]:
+    """Run one batched inference over several images and analyze each result.
+
+    Each item is an (image, output) pair, where image may also be the
+    FrameRef of a camera frame in shared memory. output 'base64' returns the
+    annotated image as a base64 JPEG in 'image', 'array' returns it as an
+    array in 'annotated_image', and 'none' skips annotation entirely for
+    clients that draw the boxes themselves. class_mask has a bit set for each
+    detected class id, for evaluate_compliance, and model_pixels counts the
+    letterboxed pixels the model processed. Runs inside an inference worker,
+    so it only returns plain picklable data.
+    """
+    items = attach_frames(items)
+    images = [image for image, _ in items]
+
+    # Run YOLO inference on the whole batch in one call
+    inference_start = time.perf_counter()
+    batch_results = model(images, imgsz=MODEL_IMGSZ, verbose=False)
+    inference_ms = (time.perf_counter() - inference_start) * 1000
+
+    analyses = []
+    for (image, output), result in zip(items, batch_results):
+        postprocess_start = time.perf_counter()
+        # Pull the boxes once and derive everything else from the arrays
+        boxes = extract_boxes(result)
+        height, width = image.shape[:2]
+        analysis = build_analysis(image, output, boxes, postprocess_start, inference_ms, len(items))
+        analysis['model_pixels'] = letterbox_pixels(height, width)
+        analyses.append(analysis)
+
+    return analyses
+
+def letterbox_pixels(height: int, width: int, imgsz: int = MODEL_IMGSZ) -> int:
+    """Pixels the model sees for an image of this size once letterboxed"""
+    new_height, new_width = letterbox_shape(height, width, imgsz)
+    return new_height * new_width
+
+def build_analysis(image: np.ndarray, output: str, boxes, postprocess_start: float,
+                   inference_ms: float, batch_size: int) -> Dict:
+    """Turn one image's boxes into the analysis dict returned by analyze_batch"""
+    _, detection_details = build_detections(boxes)
+
+    height, width = image.shape[:2]
+    analysis = {
+        'detections': detection_details,
+        'class_mask': class_mask(boxes),
+        'width': width,
+        'height': height,
+        'inference_ms': inference_ms,
+        'postprocess_ms': (time.perf_counter() - postprocess_start) * 1000,
+        'batch_size': batch_size
+    }
+
+    if output != 'none':
+        # Draw bounding boxes on image
+        draw_start = time.perf_counter()
+        annotated_image = draw_boxes(image, boxes)
+        analysis['draw_ms'] = (time.perf_counter() - draw_start) * 1000
+        if output == 'base64':
+            encode_start = time.perf_counter()
+            analysis['image'] = image_to_base64(annotated_image)
+            analysis['encode_ms'] = (time.perf_counter() - encode_start) * 1000
+        else:
+            analysis['annotated_image'] = annotated_image
+    return analysis
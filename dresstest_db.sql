@@ -83,6 +83,8 @@ CREATE TABLE `requirements` (
   `requirement_id` int NOT NULL AUTO_INCREMENT,
   `gender` enum('Male','Female') NOT NULL,
   `item_name` varchar(100) NOT NULL,
+  `location` varchar(100) DEFAULT NULL,
+  `day_of_week` tinyint DEFAULT NULL,
   PRIMARY KEY (`requirement_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
@@ -113,7 +115,8 @@ CREATE TABLE `students` (
   `year_level` int DEFAULT NULL,
   `created_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
   PRIMARY KEY (`student_id`),
-  UNIQUE KEY `rfid_tag` (`rfid_tag`)
+  UNIQUE KEY `rfid_tag` (`rfid_tag`),
+  KEY `idx_students_created` (`created_at`,`student_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
@@ -126,6 +129,33 @@ LOCK TABLES `students` WRITE;
 /*!40000 ALTER TABLE `students` ENABLE KEYS */;
 UNLOCK TABLES;
 
+--
+-- Table structure for table `violation_daily_counts`
+--
+
+DROP TABLE IF EXISTS `violation_daily_counts`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `violation_daily_counts` (
+  `day` date NOT NULL,
+  `location` varchar(100) NOT NULL DEFAULT '',
+  `missing_item` varchar(100) NOT NULL,
+  `violation_count` int NOT NULL DEFAULT '0',
+  PRIMARY KEY (`day`,`location`,`missing_item`),
+  KEY `idx_daily_counts_location_day` (`location`,`day`),
+  KEY `idx_daily_counts_item_day` (`missing_item`,`day`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `violation_daily_counts`
+--
+
+LOCK TABLES `violation_daily_counts` WRITE;
+/*!40000 ALTER TABLE `violation_daily_counts` DISABLE KEYS */;
+/*!40000 ALTER TABLE `violation_daily_counts` ENABLE KEYS */;
+UNLOCK TABLES;
+
 --
 -- Table structure for table `violations`
 --
@@ -142,6 +172,10 @@ CREATE TABLE `violations` (
   `status` enum('Pending','Acknowledged','Forwarded to OSAS','Resolved') DEFAULT 'Pending',
   PRIMARY KEY (`violation_id`),
   KEY `student_id` (`student_id`),
+  KEY `idx_violations_detected` (`detected_at`,`violation_id`),
+  KEY `idx_violations_location_detected` (`location`,`detected_at`,`violation_id`),
+  KEY `idx_violations_status_detected` (`status`,`detected_at`,`violation_id`),
+  KEY `idx_violations_item_detected` (`missing_item`,`detected_at`,`violation_id`),
   CONSTRAINT `violations_ibfk_1` FOREIGN KEY (`student_id`) REFERENCES `students` (`student_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
@@ -154,6 +188,53 @@ LOCK TABLES `violations` WRITE;
 /*!40000 ALTER TABLE `violations` DISABLE KEYS */;
 /*!40000 ALTER TABLE `violations` ENABLE KEYS */;
 UNLOCK TABLES;
+/*!50003 SET @saved_cs_client      = @@character_set_client */ ;
+/*!50003 SET @saved_cs_results     = @@character_set_results */ ;
+/*!50003 SET @saved_col_connection = @@collation_connection */ ;
+/*!50003 SET character_set_client  = utf8mb4 */ ;
+/*!50003 SET character_set_results = utf8mb4 */ ;
+/*!50003 SET collation_connection  = utf8mb4_0900_ai_ci */ ;
+/*!50003 SET @saved_sql_mode       = @@sql_mode */ ;
+/*!50003 SET sql_mode              = 'ONLY_FULL_GROUP_BY,STRICT_TRANS_TABLES,NO_ZERO_IN_DATE,NO_ZERO_DATE,ERROR_FOR_DIVISION_BY_ZERO,NO_ENGINE_SUBSTITUTION' */ ;
+DELIMITER ;;
+/*!50003 CREATE*/ /*!50003 TRIGGER `violations_daily_count` AFTER INSERT ON `violations` FOR EACH ROW BEGIN
+  IF NEW.detected_at IS NOT NULL THEN
+    INSERT INTO violation_daily_counts (day, location, missing_item, violation_count)
+    VALUES (DATE(NEW.detected_at), COALESCE(NEW.location, ''), NEW.missing_item, 1)
+    ON DUPLICATE KEY UPDATE violation_count = violation_count + 1;
+  END IF;
+END */;;
+/*!50003 CREATE*/ /*!50003 TRIGGER `violations_daily_uncount` AFTER DELETE ON `violations` FOR EACH ROW BEGIN
+  IF OLD.detected_at IS NOT NULL THEN
+    UPDATE violation_daily_counts SET violation_count = violation_count - 1
+    WHERE day = DATE(OLD.detected_at) AND location = COALESCE(OLD.location, '') AND missing_item = OLD.missing_item;
+    DELETE FROM violation_daily_counts
+    WHERE day = DATE(OLD.detected_at) AND location = COALESCE(OLD.location, '') AND missing_item = OLD.missing_item
+      AND violation_count <= 0;
+  END IF;
+END */;;
+/*!50003 CREATE*/ /*!50003 TRIGGER `violations_daily_recount` AFTER UPDATE ON `violations` FOR EACH ROW BEGIN
+  IF NOT (DATE(OLD.detected_at) <=> DATE(NEW.detected_at) AND OLD.location <=> NEW.location
+          AND OLD.missing_item <=> NEW.missing_item) THEN
+    IF OLD.detected_at IS NOT NULL THEN
+      UPDATE violation_daily_counts SET violation_count = violation_count - 1
+      WHERE day = DATE(OLD.detected_at) AND location = COALESCE(OLD.location, '') AND missing_item = OLD.missing_item;
+      DELETE FROM violation_daily_counts
+      WHERE day = DATE(OLD.detected_at) AND location = COALESCE(OLD.location, '') AND missing_item = OLD.missing_item
+        AND violation_count <= 0;
+    END IF;
+    IF NEW.detected_at IS NOT NULL THEN
+      INSERT INTO violation_daily_counts (day, location, missing_item, violation_count)
+      VALUES (DATE(NEW.detected_at), COALESCE(NEW.location, ''), NEW.missing_item, 1)
+      ON DUPLICATE KEY UPDATE violation_count = violation_count + 1;
+    END IF;
+  END IF;
+END */;;
+DELIMITER ;
+/*!50003 SET sql_mode              = @saved_sql_mode */ ;
+/*!50003 SET character_set_client  = @saved_cs_client */ ;
+/*!50003 SET character_set_results = @saved_cs_results */ ;
+/*!50003 SET collation_connection  = @saved_col_connection */ ;
 /*!40103 SET TIME_ZONE=@OLD_TIME_ZONE */;
 
 /*!40101 SET SQL_MODE=@OLD_SQL_MODE */;
@@ -0,0 +1,39 @@
+"""Export the trained model for the faster inference backends
+
+Usage:
+    python export_model.py onnxruntime openvino
+    python export_model.py all --model best.pt --imgsz 640
+
+Set INFERENCE_BACKEND to the exported backend to serve it.
+"""
+import argparse
+import time
+from config import MODEL_PATH, MODEL_IMGSZ
+from backends import BACKEND_FORMATS, export_model, load_model, measure_latency, warmup
+
+
+def main():
+    exportable = [name for name, export_format in BACKEND_FORMATS.items() if export_format]
+    parser = argparse.ArgumentParser(description="Export the YOLO model for other inference backends")
+    parser.add_argument('backends', nargs='+', choices=exportable + ['all'], help="Backends to export for")
+    parser.add_argument('--model', default=MODEL_PATH, help="Path of the trained .pt model")
+    parser.add_argument('--imgsz', type=int, default=MODEL_IMGSZ, help="Inference size to export with")
+    parser.add_argument('--benchmark', action='store_true', help="Time each exported backend afterwards")
+    args = parser.parse_args()
+
+    backends = exportable if 'all' in args.backends else args.backends
+    for backend in backends:
+        started = time.time()
+        path = export_model(backend, args.model, args.imgsz)
+        print(f"Exported {backend} model to {path} in {time.time() - started:.1f}s")
+
+    if args.benchmark:
+        for backend in ['torch'] + backends:
+            model = load_model(backend, args.model)
+            warmup(model)
+            latency_ms = min(measure_latency(model, imgsz=args.imgsz) for _ in range(5))
+            print(f"{backend}: {latency_ms:.1f} ms per image")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import threading
+import weakref
+from collections import OrderedDict
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from config import FRAME_RING_SLOTS
+
+# Frames start on a cache line boundary after the per-slot sequence numbers
+_ALIGN = 64
+
+# Rings a worker process keeps attached at once, the least recently used is closed
+MAX_ATTACHED_RINGS = 8
+
+
+class StaleFrameError(RuntimeError):
+    """Raised when a worker reads a ring slot that was reused for a newer frame"""
+
+
+class FrameRef:
+    """Picklable handle on a frame in a FrameRing, sent to worker processes instead of its pixels"""
+    __slots__ = ('name', 'offset', 'shape', 'slot', 'seq')
+
+    def __init__(self, name: str, offset: int, shape: Tuple[int, ...], slot: int, seq: int):
+        self.name = name
+        self.offset = offset
+        self.shape = shape
+        self.slot = slot
+        self.seq = seq
+
+
+class SharedFrame(np.ndarray):
+    """A frame held in a FrameRing slot
+
+    The slot stays pinned, so it is never overwritten, for as long as this
+    array or any view of it is alive. Pickled, e.g. into an inference
+    process, it becomes its FrameRef; attach_frames() turns that back into
+    an array over the same memory. Copies and other arrays derived from it
+    are ordinary frames.
+    """
+
+    def __array_finalize__(self, obj):
+        self.ref = None
+
+    def __reduce_ex__(self, protocol):
+        ref = self.ref
+        if ref is None:
+            return self.view(np.ndarray).__reduce_ex__(protocol)
+        return FrameRef, (ref.name, ref.offset, ref.shape, ref.slot, ref.seq)
+
+
+class FrameRing:
+    """Fixed frame slots in one shared memory block, written by a capture thread
+
+    The block holds one int64 sequence number per slot followed by the
+    slots. acquire() hands out the next free slot as a SharedFrame to read a
+    frame into, and stamps the slot with a new sequence number so a reader
+    holding an older FrameRef can tell it was reused. When every slot is
+    still pinned downstream the frame is dropped instead of overwriting one.
+    """
+
+    def __init__(self, shape: Tuple[int, ...], slots: int = FRAME_RING_SLOTS):
+        self.shape = tuple(int(size) for size in shape)
+        self.slots = max(2, slots)
+        self.frame_bytes = int(np.prod(self.shape))
+        self.offset = -(-self.slots * 8 // _ALIGN) * _ALIGN
+        self._shm = shared_memory.SharedMemory(create=True, size=self.offset + self.slots * self.frame_bytes)
+        self.name = self._shm.name
+        self._seqs = np.ndarray((self.slots,), dtype=np.int64, buffer=self._shm.buf)
+        self._seqs[:] = 0
+        self._frames = np.ndarray((self.slots,) + self.shape, dtype=np.uint8,
+                                  buffer=self._shm.buf, offset=self.offset)
+        self._pins = [0] * self.slots
+        # Reentrant: a frame can be garbage collected, releasing its slot, on a thread already holding it
+        self._lock = threading.RLock()
+        self._released = threading.Condition(self._lock)
+        self._next = 0
+        self._seq = 0
+        self._retired = False
+        self.drops = 0
+
+    def acquire(self, timeout: Optional[float] = None) -> Optional[SharedFrame]:
+        """The next free slot to write a frame into, or None if none is free
+
+        Without a timeout a full ring counts the frame as dropped. With one,
+        for readers like replays that must not lose frames, it waits up to
+        timeout seconds for a slot and returns None for the caller to retry.
+        """
+        with self._lock:
+            slot = self._free_slot()
+            if slot is None and timeout is not None:
+                self._released.wait(timeout)
+                slot = self._free_slot()
+                if slot is None:
+                    return None
+            if slot is None:
+                self.drops += 1
+                return None
+            self._pins[slot] = 1
+            self._next = (slot + 1) % self.slots
+            self._seq += 1
+            seq = self._seq
+            self._seqs[slot] = seq
+
+        frame = self._frames[slot].view(SharedFrame)
+        frame.ref = FrameRef(self.name, self.offset + slot * self.frame_bytes, self.shape, slot, seq)
+        weakref.finalize(frame, self._release, slot)
+        return frame
+
+    def _free_slot(self) -> Optional[int]:
+        for step in range(self.slots):
+            slot = (self._next + step) % self.slots
+            if not self._pins[slot]:
+                return slot
+        return None
+
+    def _release(self, slot: int):
+        with self._lock:
+            self._pins[slot] -= 1
+            self._released.notify()
+            close = self._retired and not any(self._pins)
+        if close:
+            self._close()
+
+    def retire(self):
+        """Unlink the block when its camera stops, closing it once the last frame on it is released"""
+        with self._lock:
+            if self._retired:
+                return
+            self._retired = True
+            close = not any(self._pins)
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+        if close:
+            self._close()
+
+    def _close(self):
+        # Our own arrays over the block have to go before it can be closed
+        self._frames = self._seqs = None
+        try:
+            self._shm.close()
+        except BufferError:
+            pass
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'name': self.name,
+                'slots': self.slots,
+                'in_use': sum(1 for pins in self._pins if pins),
+                'frame_bytes': self.frame_bytes,
+                'drops': self.drops
+            }
+
+
+# Rings attached by this (worker) process, by name
+_attached = OrderedDict()
+_attached_lock = threading.Lock()
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    with _attached_lock:
+        block = _attached.get(name)
+        if block is not None:
+            _attached.move_to_end(name)
+            return block
+        block = _attached[name] = shared_memory.SharedMemory(name=name)
+        while len(_attached) > MAX_ATTACHED_RINGS:
+            _, oldest = _attached.popitem(last=False)
+            try:
+                oldest.close()
+            except BufferError:
+                pass
+        return block
+
+def attach_frame(ref: FrameRef) -> np.ndarray:
+    """A read-only array over a ring frame, without copying it
+
+    Raises StaleFrameError if the slot has been reused since ref was taken
+    and FileNotFoundError if the ring is gone.
+    """
+    block = _attach(ref.name)
+    seq = int(np.ndarray((1,), dtype=np.int64, buffer=block.buf, offset=ref.slot * 8)[0])
+    if seq != ref.seq:
+        raise StaleFrameError(f"Frame {ref.seq} in {ref.name} slot {ref.slot} was overwritten by frame {seq}")
+    frame = np.ndarray(ref.shape, dtype=np.uint8, buffer=block.buf, offset=ref.offset)
+    frame.flags.writeable = False
+    return frame
+
+def attach_frames(items: List) -> List:
+    """Job items with any FrameRef in front turned back into arrays, for jobs run in worker processes"""
+    return [
+        (attach_frame(item[0]),) + tuple(item[1:]) if isinstance(item[0], FrameRef) else item
+        for item in items
+    ]
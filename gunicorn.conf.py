@@ -0,0 +1,47 @@
+"""Gunicorn settings for running the API in several worker processes
+
+Usage:
+    SERVER_WORKERS=4 gunicorn main:app -c gunicorn.conf.py
+
+The app and the inference libraries are imported once in the master process
+(preload_app) and workers are forked from it, so they share that memory
+copy-on-write instead of each importing it again. Every worker then loads its
+own model in the background: it answers /health at once and GET /ready once
+its model is warmed up. Send HUP to the master to replace the workers
+without dropping connections.
+"""
+import os
+from config import (
+    INFERENCE_BACKEND, SERVER_HOST, SERVER_PORT, SERVER_WORKERS, SERVER_GRACEFUL_TIMEOUT,
+    VIOLATION_SPILL_PATH, RESULT_CACHE_SPILL_DIR
+)
+
+bind = f"{SERVER_HOST}:{SERVER_PORT}"
+workers = max(1, SERVER_WORKERS)
+worker_class = 'uvicorn.workers.UvicornWorker'
+preload_app = True
+graceful_timeout = SERVER_GRACEFUL_TIMEOUT
+
+
+def on_starting(server):
+    from backends import preload_backend
+    modules = preload_backend(INFERENCE_BACKEND)
+    if modules:
+        server.log.info(f"Preloaded {', '.join(modules)} for the {INFERENCE_BACKEND} backend")
+
+def pre_fork(server, worker):
+    """Give the new worker the lowest slot number no live worker holds"""
+    taken = {getattr(other, 'slot', None) for other in server.WORKERS.values()}
+    worker.slot = next(slot for slot in range(len(taken) + 1) if slot not in taken)
+
+def post_fork(server, worker):
+    """Give each worker slot its own violation spill file and result cache spill directory
+
+    Two workers then never replay the same rows or count and delete each
+    other's cache files.
+    """
+    import main
+    if worker.slot:
+        main.violation_writer.spill_path = f"{VIOLATION_SPILL_PATH}.{worker.slot}"
+        if main.result_cache.spill_dir:
+            main.result_cache.use_spill_dir(f"{RESULT_CACHE_SPILL_DIR.rstrip(os.sep)}.{worker.slot}")
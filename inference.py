@@ -0,0 +1,267 @@
+import asyncio
+import math
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures import wait as wait_futures
+from typing import Dict, Optional
+from config import (
+    INFERENCE_BACKEND, INFERENCE_WORKERS, INFERENCE_WORKER_MODE,
+    INFERENCE_QUEUE_SIZE, INFERENCE_THREADS_PER_WORKER
+)
+from backends import backend_model_path, load_model, measure_latency, warmup
+
+# Each worker thread (or process) keeps its own model instance here
+_worker_state = threading.local()
+
+# Retry-After in seconds for requests that arrive while the model is loading
+MODEL_LOADING_RETRY_AFTER = 5
+
+
+class InferenceQueueFull(Exception):
+    """Raised when the admission queue of the inference pool is full"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Inference queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class ModelNotReady(InferenceQueueFull):
+    """Raised when a job is submitted while the worker models are loading, or after they failed to"""
+
+    def __init__(self, retry_after: int, error: Optional[str] = None):
+        super().__init__(retry_after)
+        self.error = error
+        self.args = (f"Model failed to load: {error}" if error else
+                     f"Model is still loading, retry after {retry_after}s",)
+
+
+def _get_worker_model():
+    """Return the model owned by the current worker, loading it on first use"""
+    model = getattr(_worker_state, 'model', None)
+    if model is None:
+        model = load_model(INFERENCE_BACKEND)
+        _worker_state.model = model
+    return model
+
+def _init_worker(torch_threads: Optional[int] = None):
+    """Load and warm up the worker model up front so the first request doesn't pay for it"""
+    if torch_threads:
+        import torch
+        torch.set_num_threads(torch_threads)
+    try:
+        warmup(_get_worker_model())
+    except Exception:
+        # A failing initializer breaks the whole pool, so leave the error for
+        # the worker's first job to raise where the caller can see it
+        pass
+
+def _run_job(job, submitted_at: float, *args):
+    """Execute a job with the worker model and measure how long it waited"""
+    started_at = time.time()
+    result = job(_get_worker_model(), *args)
+    finished_at = time.time()
+
+    timing = {
+        'queue_wait_ms': round((started_at - submitted_at) * 1000, 2),
+        'processing_ms': round((finished_at - started_at) * 1000, 2)
+    }
+    return result, timing
+
+
+class InferenceExecutor:
+    """Bounded pool of inference workers, each holding its own YOLO model
+
+    state goes from 'idle' to 'loading' while warmup() runs, then to 'ready'
+    or 'failed'. Jobs are refused with ModelNotReady while loading or after a
+    failure, so callers get a quick 503 instead of queueing behind the load.
+    An executor that is never warmed up loads lazily on its first job.
+    """
+
+    def __init__(self, workers: int = INFERENCE_WORKERS, mode: str = INFERENCE_WORKER_MODE,
+                 queue_size: int = INFERENCE_QUEUE_SIZE):
+        if mode not in ('thread', 'process'):
+            raise ValueError(f"Unknown inference worker mode: {mode}")
+
+        self.workers = max(1, workers)
+        self.mode = mode
+        self.queue_size = max(0, queue_size)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._avg_service_s = 0.5
+        self.warmup_ms = None
+        self.state = 'idle'
+        self.load_error = None
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def average_service_s(self) -> float:
+        """Moving average of the time a worker spends on one job"""
+        return self._avg_service_s
+
+    @property
+    def capacity(self) -> int:
+        """Maximum number of jobs that may be running or waiting at once"""
+        return self.workers + self.queue_size
+
+    def start(self):
+        """Start the worker pool"""
+        if self._executor is not None:
+            return
+
+        if self.mode == 'process':
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(INFERENCE_THREADS_PER_WORKER,)
+            )
+        else:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix='inference',
+                initializer=_init_worker
+            )
+        print(f"Inference pool started: {self.workers} {self.mode} worker(s), queue size {self.queue_size}")
+
+    @property
+    def is_ready(self) -> bool:
+        return self.state == 'ready'
+
+    def check_ready(self):
+        """Raise ModelNotReady while the model is loading or after it failed to load"""
+        if self.state == 'loading':
+            raise ModelNotReady(MODEL_LOADING_RETRY_AFTER)
+        if self.state == 'failed':
+            raise ModelNotReady(MODEL_LOADING_RETRY_AFTER, self.load_error)
+
+    def warmup(self, timeout: Optional[float] = None) -> float:
+        """Start every worker, which loads and warms its model, then time one image
+
+        Blocks until the pool is ready, returning the measured per-image
+        latency in milliseconds.
+        """
+        self.start()
+        self.state = 'loading'
+        self.load_error = None
+        try:
+            # One job per worker so the pool spawns, and initializes, all of them
+            futures = [self._submit(measure_latency) for _ in range(self.workers)]
+            done, _ = wait_futures(futures, timeout)
+            latencies = [future.result()[0] for future in done if future.exception() is None]
+            if not latencies:
+                for future in done:
+                    future.result()
+                raise TimeoutError("Inference workers did not warm up in time")
+        except Exception as e:
+            self.state = 'failed'
+            self.load_error = str(e) or type(e).__name__
+            raise
+        self.warmup_ms = round(min(latencies), 2)
+        self.state = 'ready'
+        print(f"Inference backend {INFERENCE_BACKEND} ready: {self.warmup_ms} ms per image")
+        return self.warmup_ms
+
+    def start_warmup(self, timeout: Optional[float] = None):
+        """Run warmup() on a background thread, so the caller can serve other requests meanwhile"""
+        self.start()
+        self.state = 'loading'
+
+        def run():
+            try:
+                self.warmup(timeout)
+            except Exception as e:
+                print(f"Error loading the {INFERENCE_BACKEND} model: {e}")
+
+        threading.Thread(target=run, name='model-warmup', daemon=True).start()
+
+    def shutdown(self):
+        """Stop the worker pool, waiting for running jobs to finish"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def retry_after(self) -> int:
+        """Estimate in seconds how long until a slot frees up"""
+        with self._lock:
+            backlog = self._in_flight - self.workers + 1
+            return max(1, math.ceil(self._avg_service_s * backlog / self.workers))
+
+    def _release(self, future):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _record(self, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        _, timing = future.result()
+        with self._lock:
+            # Exponential moving average of service time, used for Retry-After
+            service_s = timing['processing_ms'] / 1000
+            self._avg_service_s = 0.8 * self._avg_service_s + 0.2 * service_s
+            self.completed += 1
+
+    def submit(self, job, *args) -> Future:
+        """Submit job(model, *args) to a worker, returning a future of (result, timing)
+
+        Raises InferenceQueueFull when every worker is busy and the queue is
+        full, and ModelNotReady while the model is loading or failed to load.
+        """
+        self.check_ready()
+        return self._submit(job, *args)
+
+    def _submit(self, job, *args) -> Future:
+        if self._executor is None:
+            self.start()
+
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self.rejected += 1
+                full = True
+            else:
+                self._in_flight += 1
+                full = False
+        if full:
+            raise InferenceQueueFull(self.retry_after())
+
+        try:
+            future = self._executor.submit(_run_job, job, time.time(), *args)
+        except Exception:
+            self._release(None)
+            raise
+        # Release the slot only when the worker is really done, even if the
+        # caller stops waiting because of a timeout or disconnect
+        future.add_done_callback(self._release)
+        future.add_done_callback(self._record)
+        return future
+
+    async def run(self, job, *args, timeout: Optional[float] = None):
+        """Run job(model, *args) on a worker, returning (result, timing)
+
+        Raises InferenceQueueFull when every worker is busy and the queue is
+        full, and asyncio.TimeoutError when the job exceeds the timeout.
+        """
+        future = self.submit(job, *args)
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+
+    def stats(self) -> Dict:
+        """Return pool occupancy and counters"""
+        with self._lock:
+            return {
+                'backend': INFERENCE_BACKEND,
+                'model_path': backend_model_path(INFERENCE_BACKEND),
+                'warmup_ms_per_image': self.warmup_ms,
+                'state': self.state,
+                'load_error': self.load_error,
+                'mode': self.mode,
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'in_flight': self._in_flight,
+                'queued': max(0, self._in_flight - self.workers),
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'avg_service_ms': round(self._avg_service_s * 1000, 2)
+            }
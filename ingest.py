@@ -0,0 +1,133 @@
+from typing import Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+from fastapi import UploadFile
+from config import MODEL_IMGSZ, MAX_UPLOAD_BYTES, UPLOAD_CHUNK_SIZE, UPLOAD_REDUCED_DECODE
+from detection import InvalidImageError
+
+# OpenCV flags that make libjpeg decode straight to 1/2, 1/4 or 1/8 size
+REDUCED_DECODE_FLAGS = {
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    2: cv2.IMREAD_REDUCED_COLOR_2
+}
+
+# Start-of-frame markers that carry the image size (C4, C8 and CC are other segments)
+_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload is bigger than the allowed maximum"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Upload exceeds the {max_bytes // (1024 * 1024)} MB limit")
+        self.max_bytes = max_bytes
+
+
+async def read_upload(upload: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES,
+                      chunk_size: int = UPLOAD_CHUNK_SIZE) -> bytearray:
+    """Read an upload chunk by chunk, stopping as soon as it goes over max_bytes"""
+    if getattr(upload, 'size', None) is not None and upload.size > max_bytes:
+        raise UploadTooLarge(max_bytes)
+
+    contents = bytearray()
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+        contents += chunk
+        if len(contents) > max_bytes:
+            raise UploadTooLarge(max_bytes)
+    return contents
+
+def jpeg_dimensions(contents: bytes) -> Optional[Tuple[int, int]]:
+    """Return (width, height) from a JPEG header without decoding, or None if it isn't a JPEG"""
+    if contents[:2] != b'\xff\xd8':
+        return None
+
+    position = 2
+    while position + 9 <= len(contents):
+        if contents[position] != 0xFF:
+            return None
+        marker = contents[position + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker
+            position += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            # Markers without a length field
+            position += 2
+            continue
+        if marker in _SOF_MARKERS:
+            height = int.from_bytes(contents[position + 5:position + 7], 'big')
+            width = int.from_bytes(contents[position + 7:position + 9], 'big')
+            return width, height
+        position += 2 + int.from_bytes(contents[position + 2:position + 4], 'big')
+    return None
+
+def reduction_factor(width: int, height: int, target: int = MODEL_IMGSZ) -> int:
+    """Largest JPEG scale-down that still leaves the long side at least target pixels"""
+    for factor in sorted(REDUCED_DECODE_FLAGS, reverse=True):
+        if max(width, height) // factor >= target:
+            return factor
+    return 1
+
+def decode_upload(contents: bytes, reduce: bool = UPLOAD_REDUCED_DECODE) -> Tuple[np.ndarray, Tuple[int, int]]:
+    """Decode uploaded image bytes, scaling big JPEGs down during decode
+
+    The model letterboxes to MODEL_IMGSZ anyway, so decoding a 12 MP photo
+    at 1/4 size gives the same detections for a fraction of the memory.
+    Returns the image and the original (width, height).
+    """
+    dimensions = jpeg_dimensions(contents) if reduce else None
+    factor = reduction_factor(*dimensions) if dimensions else 1
+
+    nparr = np.frombuffer(contents, np.uint8)
+    image = cv2.imdecode(nparr, REDUCED_DECODE_FLAGS.get(factor, cv2.IMREAD_COLOR))
+    if image is None:
+        raise InvalidImageError("Invalid image file or corrupted image")
+
+    height, width = image.shape[:2]
+    if factor == 1:
+        return image, (width, height)
+
+    original_width, original_height = dimensions
+    if (width > height) != (original_width > original_height):
+        # OpenCV applied the EXIF rotation, which the header size doesn't include
+        original_width, original_height = original_height, original_width
+    return image, (original_width, original_height)
+
+def scale_detections(detections: List[Dict], scale_x: float, scale_y: float) -> List[Dict]:
+    """Map detection boxes from the decoded image back to original image coordinates"""
+    if scale_x == 1 and scale_y == 1:
+        return detections
+    return [
+        {
+            **detection,
+            'bbox': [
+                round(detection['bbox'][0] * scale_x), round(detection['bbox'][1] * scale_y),
+                round(detection['bbox'][2] * scale_x), round(detection['bbox'][3] * scale_y)
+            ]
+        }
+        for detection in detections
+    ]
+
+def restore_original_size(analysis: Dict, original_size: Tuple[int, int]) -> Dict:
+    """Rewrite an analysis of a reduced decode in terms of the original image
+
+    Detections, width and height describe the original upload. An annotated
+    image in the analysis stays at the decoded size, recorded as
+    image_width and image_height.
+    """
+    original_width, original_height = original_size
+    if 'image' in analysis:
+        analysis['image_width'] = analysis['width']
+        analysis['image_height'] = analysis['height']
+    analysis['detections'] = scale_detections(
+        analysis['detections'],
+        original_width / analysis['width'],
+        original_height / analysis['height']
+    )
+    analysis['width'] = original_width
+    analysis['height'] = original_height
+    return analysis
@@ -1,26 +1,51 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Query, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import cv2
-import numpy as np
-from PIL import Image
-import io
-import base64
-from ultralytics import YOLO
-import mysql.connector
-from mysql.connector import Error
 import os
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union
+from pydantic import BaseModel, Field
 import json
-from datetime import datetime
+from datetime import date, datetime
 import asyncio
-import threading
 import time
+import struct
+import tempfile
+import uuid
+import zipfile
+from fastapi.concurrency import run_in_threadpool
 from config import (
-    DB_CONFIG, MODEL_PATH, CONFIDENCE_THRESHOLD,
-    CLASS_NAMES, DRESS_CODE_REQUIREMENTS, DISPLAY_NAMES
+    INFERENCE_TIMEOUT, CAMERA_DEFAULT_SOURCE, CAMERA_DEFAULT_LOCATION,
+    CAMERA_WIDTH, CAMERA_HEIGHT, CAMERA_FPS, CAMERA_TWO_STAGE, ROSTER_SCAN_TTL,
+    SERVER_HOST, SERVER_PORT, UPLOAD_CHUNK_SIZE, BATCH_MAX_UPLOAD_BYTES
 )
+from detection import InvalidImageError, evaluate_compliance
+from inference import InferenceExecutor, InferenceQueueFull, ModelNotReady
+from batching import BatchScheduler
+from ingest import UploadTooLarge, read_upload, decode_upload, restore_original_size
+from result_cache import ResultCache
+from batch_jobs import (
+    check_zip_archive, iter_directory_images, iter_zip_images, resolve_batch_path, score_images
+)
+from camera import CameraManager
+from replay import ReplayCamera
+from roi import PEOPLE, validate_roi
+from violation_writer import ViolationWriter
+from roster import Roster
+from rate_control import RateController
+from encoder import image_encoder
+from rules import rule_engine
+from violation_queries import DatabaseUnavailable, list_violations, stats_cache, violation_stats
+from metrics import REGISTRY, DETECT_REQUESTS, STAGE_SECONDS, VIOLATIONS
+
+# Camera used by the single-camera /camera/* endpoints and the web UI
+DEFAULT_CAMERA_ID = "default"
+
+# Location recorded for uploads, also used to pick their dress code rules
+UPLOAD_LOCATION = "Web Detection"
+
+# WebSocket subprotocol for binary frames with separate JSON metadata
+BINARY_WS_SUBPROTOCOL = "dress.binary.v1"
 
 app = FastAPI(title="Dress Code Detection API")
 
@@ -36,120 +61,47 @@ app.add_middleware(
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# Load YOLOv8 model
-model = YOLO(MODEL_PATH)
+# Worker pool for inference, each worker holds its own model. Uploads and
+# camera frames are micro-batched into shared model calls by the scheduler.
+inference_executor = InferenceExecutor()
+inference_scheduler = BatchScheduler(inference_executor)
 
-def get_db_connection():
-    """Create database connection"""
-    try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        return connection
-    except Error as e:
-        print(f"Warning: Could not connect to MySQL database: {e}")
-        print("Application will continue without database logging.")
-        return None
+@app.on_event("startup")
+async def start_inference_scheduler():
+    """Start the inference worker pool and batch scheduler
 
-def detect_gender_from_items(detected_items: List[str]) -> str:
-    """Detect gender based on detected clothing items"""
-    female_items = {'blouse', 'skirt', 'doll_shoes'}
-    male_items = {'polo_shirt', 'pants', 'shoes'}
-    
-    female_score = len(set(detected_items) & female_items)
-    male_score = len(set(detected_items) & male_items)
-    
-    if female_score > male_score:
-        return 'Female'
-    elif male_score > female_score:
-        return 'Male'
-    else:
-        # Default to Male if unclear
-        return 'Male'
+    Workers load and warm up their model in the background, so pages,
+    /health and /ready are served right away. Inference requests get a 503
+    with Retry-After until GET /ready reports the model is loaded.
+    """
+    inference_scheduler.start()
+    inference_executor.start_warmup()
 
-def check_dress_code_compliance(detected_items: List[str], gender: str) -> Dict:
-    """Check dress code compliance based on detected items and gender"""
-    required_items = DRESS_CODE_REQUIREMENTS[gender].copy()
-    detected_set = set(detected_items)
-    
-    # For female students, accept either 'shoes' or 'doll_shoes' as valid footwear
-    if gender == 'Female':
-        if 'doll_shoes' in detected_set:
-            detected_set.add('shoes')  # Treat doll_shoes as shoes for compliance check
-    
-    missing_items = []
-    for item in required_items:
-        if item not in detected_set:
-            missing_items.append(DISPLAY_NAMES[item])
-    
-    is_compliant = len(missing_items) == 0
-    
-    return {
-        'is_compliant': is_compliant,
-        'missing_items': missing_items,
-        'detected_items': [DISPLAY_NAMES.get(item, item) for item in detected_items],
-        'gender': gender
-    }
+# Violations are written to the database in batches by a background thread
+violation_writer = ViolationWriter()
 
-def draw_bounding_boxes(image: np.ndarray, results) -> np.ndarray:
-    """Draw bounding boxes on the image"""
-    annotated_image = image.copy()
-    
-    for result in results:
-        boxes = result.boxes
-        if boxes is not None:
-            for box in boxes:
-                # Get coordinates
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                
-                # Get class and confidence
-                cls = int(box.cls[0])
-                conf = float(box.conf[0])
-                
-                if conf > CONFIDENCE_THRESHOLD:  # Only show detections with confidence > threshold
-                    class_name = CLASS_NAMES.get(cls, f'class_{cls}')
-                    display_name = DISPLAY_NAMES.get(class_name, class_name)
-                    
-                    # Draw bounding box
-                    cv2.rectangle(annotated_image, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                    
-                    # Draw label
-                    label = f'{display_name}: {conf:.2f}'
-                    (label_width, label_height), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
-                    cv2.rectangle(annotated_image, (x1, y1 - label_height - 10), (x1 + label_width, y1), (0, 255, 0), -1)
-                    cv2.putText(annotated_image, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
-    
-    return annotated_image
+@app.on_event("startup")
+async def start_violation_writer():
+    """Start the violation write-behind thread"""
+    violation_writer.start()
 
-def image_to_base64(image: np.ndarray) -> str:
-    """Convert numpy image to base64 string"""
-    _, buffer = cv2.imencode('.jpg', image)
-    img_base64 = base64.b64encode(buffer).decode('utf-8')
-    return f"data:image/jpeg;base64,{img_base64}"
+# Students by RFID tag and ID, kept in memory so scans and uploads never wait on the database
+roster = Roster()
 
-def log_violation(student_id: Optional[int], missing_items: List[str], location: str = "Web Detection"):
-    """Log violation to database"""
-    if not missing_items:
-        return
-    
-    connection = get_db_connection()
-    if connection:
-        try:
-            cursor = connection.cursor()
-            for item in missing_items:
-                query = """
-                INSERT INTO violations (student_id, missing_item, location, status)
-                VALUES (%s, %s, %s, 'Pending')
-                """
-                cursor.execute(query, (student_id, item, location))
-            
-            connection.commit()
-            cursor.close()
-            print(f"Violation logged: Student {student_id}, Missing: {', '.join(missing_items)}")
-        except Error as e:
-            print(f"Error logging violation: {e}")
-        finally:
-            connection.close()
-    else:
-        print(f"Database not available. Would log violation: Student {student_id}, Missing: {', '.join(missing_items)}")
+@app.on_event("startup")
+async def start_roster():
+    """Load the student roster in the background"""
+    roster.start()
+
+@app.on_event("startup")
+async def start_rule_engine():
+    """Load the dress code rules from the database and watch them for changes"""
+    rule_engine.start()
+
+def log_violation(student_id: Optional[int], missing_items: List[str], location: str = UPLOAD_LOCATION):
+    """Queue a violation for logging to the database"""
+    VIOLATIONS.inc(location=location)
+    violation_writer.log(student_id, missing_items, location)
 
 @app.get("/", response_class=HTMLResponse)
 async def read_root():
@@ -175,13 +127,96 @@ async def detection_page():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error loading detection page: {str(e)}")
 
+# Results of recent uploads, so retries and double submits skip inference
+result_cache = ResultCache()
+
+# Futures for uploads being analyzed right now, keyed like the result cache
+uploads_in_flight: Dict[str, asyncio.Future] = {}
+
+async def analyze_upload(contents: bytes, render: str):
+    """Decode and analyze an upload, reusing the result of an identical earlier upload
+
+    Returns (analysis, timing, seen). seen is True when the same image was
+    already analyzed, and its violation logged, either earlier or by a
+    request still in flight. That depends only on the image: a result
+    cached without the annotated image a render=server request needs is
+    analyzed again to draw it, but still counts as seen.
+    """
+    need_image = render == 'server'
+    lookup_started = time.perf_counter()
+    key, cached = await run_in_threadpool(result_cache.lookup, contents)
+    while cached is None and key in uploads_in_flight:
+        # A retry or double click while the first request is still running
+        await asyncio.shield(uploads_in_flight[key])
+        cached = await run_in_threadpool(result_cache.get, key)
+    if cached is not None and (not need_image or 'image' in cached):
+        timing = {'cache_hit': True, 'lookup_ms': round((time.perf_counter() - lookup_started) * 1000, 2)}
+        return cached, timing, True
+    seen = cached is not None or result_cache.analyzed(key)
+
+    in_flight = asyncio.get_running_loop().create_future()
+    uploads_in_flight[key] = in_flight
+    try:
+        # Decode off the event loop, at reduced resolution for large JPEGs
+        decode_started = time.perf_counter()
+        try:
+            image, original_size = await run_in_threadpool(decode_upload, contents)
+        except InvalidImageError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        decode_s = time.perf_counter() - decode_started
+        STAGE_SECONDS.observe(decode_s, pipeline='upload', stage='decode')
+
+        # Run batched YOLO inference and annotate on a worker
+        try:
+            analysis, timing = await inference_scheduler.run(
+                image, output='base64' if need_image else 'none',
+                timeout=INFERENCE_TIMEOUT
+            )
+        except ModelNotReady as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+        except InferenceQueueFull as e:
+            raise HTTPException(
+                status_code=503,
+                detail="Detection service is busy. Please retry shortly.",
+                headers={"Retry-After": str(e.retry_after)}
+            )
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Detection timed out")
+
+        # Report boxes in the coordinates of the uploaded image
+        analysis = restore_original_size(analysis, original_size)
+        await run_in_threadpool(result_cache.put, key, analysis)
+        timing = {'decode_ms': round(decode_s * 1000, 2), **timing, 'cache_hit': False}
+        return analysis, timing, seen
+    finally:
+        del uploads_in_flight[key]
+        in_flight.set_result(None)
+
 @app.post("/detect")
 async def detect_dress_code(
     file: UploadFile = File(None),
-    student_id: Optional[int] = Form(None)
+    student_id: Optional[int] = Form(None),
+    rfid_tag: Optional[str] = Form(None),
+    render: str = Query('server', pattern='^(server|client)$')
 ):
-    """Process uploaded image and detect dress code violations"""
+    """Process uploaded image and detect dress code violations
+
+    With render=client no annotated image is produced; the response carries
+    the detections and frame dimensions for the browser to draw itself.
+    When the student is known, by rfid_tag or student_id, compliance is
+    checked against their recorded gender instead of one guessed from the
+    detected clothes.
+    """
     try:
+        student = None
+        if rfid_tag:
+            student = roster.by_rfid(rfid_tag)
+            if student is None:
+                raise HTTPException(status_code=404, detail=f"Unknown RFID tag {rfid_tag}")
+            student_id = student.student_id
+        elif student_id is not None:
+            student = roster.by_id(student_id)
+        
         # Validate that a file was uploaded
         if file is None or file.filename is None or file.filename == "":
             raise HTTPException(status_code=400, detail="No image file provided")
@@ -190,238 +225,418 @@ async def detect_dress_code(
         if not file.content_type or not file.content_type.startswith('image/'):
             raise HTTPException(status_code=400, detail="Invalid file type. Please upload an image file.")
         
-        # Read image
-        contents = await file.read()
+        # Read image in chunks, refusing oversized uploads early
+        try:
+            contents = await read_upload(file)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
         
         # Check if file is empty
         if len(contents) == 0:
             raise HTTPException(status_code=400, detail="Empty file provided")
         
-        nparr = np.frombuffer(contents, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if image is None:
-            raise HTTPException(status_code=400, detail="Invalid image file or corrupted image")
-        
-        # Run YOLO inference
-        results = model(image)
-        
-        # Extract detected items
-        detected_items = []
-        detection_details = []
-        
-        for result in results:
-            boxes = result.boxes
-            if boxes is not None:
-                for box in boxes:
-                    cls = int(box.cls[0])
-                    conf = float(box.conf[0])
-                    
-                    if conf > CONFIDENCE_THRESHOLD:  # Only consider detections with confidence > threshold
-                        class_name = CLASS_NAMES.get(cls, f'class_{cls}')
-                        detected_items.append(class_name)
-                        
-                        x1, y1, x2, y2 = map(int, box.xyxy[0])
-                        detection_details.append({
-                            'class': DISPLAY_NAMES.get(class_name, class_name),
-                            'confidence': conf,
-                            'bbox': [x1, y1, x2, y2]
-                        })
-        
-        # Detect gender based on clothing items
-        gender = detect_gender_from_items(detected_items)
-        
-        # Check dress code compliance
-        compliance_result = check_dress_code_compliance(detected_items, gender)
-        
-        # Draw bounding boxes on image
-        annotated_image = draw_bounding_boxes(image, results)
+        analysis, timing, seen = await analyze_upload(contents, render)
+        del contents
+        compliance_result = evaluate_compliance(
+            analysis, student.gender if student is not None else None, UPLOAD_LOCATION
+        )
         
-        # Convert annotated image to base64
-        image_base64 = image_to_base64(annotated_image)
-        
-        # Log violation if not compliant
-        if not compliance_result['is_compliant']:
+        # Log violation if not compliant, but only once for a re-submitted image
+        if not compliance_result['is_compliant'] and not seen:
             log_violation(student_id, compliance_result['missing_items'])
         
         # Prepare response
         response = {
             'success': True,
-            'image': image_base64,
-            'detections': detection_details,
+            'render': render,
+            'detections': analysis['detections'],
+            'frame': {
+                'id': uuid.uuid4().hex,
+                'width': analysis['width'],
+                'height': analysis['height']
+            },
             'compliance': compliance_result,
-            'message': 'Compliant' if compliance_result['is_compliant'] else f"Violation: Missing {', '.join(compliance_result['missing_items'])}"
+            'message': 'Compliant' if compliance_result['is_compliant'] else f"Violation: Missing {', '.join(compliance_result['missing_items'])}",
+            'student': student.to_dict() if student is not None else None,
+            'cached': seen,
+            'timing': timing
         }
+        if render == 'server':
+            # The annotated image may be a reduced decode, smaller than the frame the boxes are in
+            response['image'] = analysis['image']
+            response['frame']['image_width'] = analysis.get('image_width', analysis['width'])
+            response['frame']['image_height'] = analysis.get('image_height', analysis['height'])
         
+        DETECT_REQUESTS.inc(outcome='cached' if timing['cache_hit'] else 'analyzed')
         return JSONResponse(content=response)
         
+    except HTTPException as e:
+        DETECT_REQUESTS.inc(outcome=str(e.status_code))
+        raise
     except Exception as e:
+        DETECT_REQUESTS.inc(outcome='500')
         print(f"Error processing image: {e}")
         raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
 
-# Global variables for camera management
-camera_active = False
-camera = None
-detection_results = {}
-violation_alerts = []
-
-class CameraManager:
-    def __init__(self):
-        self.camera = None
-        self.is_active = False
-        self.last_detection = None
-        self.violation_count = 0
-        self.last_violation_time = 0
-        
-    def start_camera(self, camera_index=0):
-        """Start camera capture"""
+def save_upload(upload: UploadFile, max_bytes: int = BATCH_MAX_UPLOAD_BYTES) -> str:
+    """Copy an upload to a temporary file that outlives the request, chunk by chunk
+
+    Raises UploadTooLarge, leaving nothing behind, as soon as it goes over max_bytes.
+    """
+    if getattr(upload, 'size', None) is not None and upload.size > max_bytes:
+        raise UploadTooLarge(max_bytes)
+
+    copied = 0
+    with tempfile.NamedTemporaryFile(suffix='.zip', delete=False) as temp_file:
         try:
-            self.camera = cv2.VideoCapture(camera_index)
-            self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-            self.camera.set(cv2.CAP_PROP_FPS, 30)
-            self.is_active = True
-            return True
-        except Exception as e:
-            print(f"Error starting camera: {e}")
-            return False
-    
-    def stop_camera(self):
-        """Stop camera capture"""
-        self.is_active = False
-        if self.camera:
-            self.camera.release()
-            self.camera = None
+            while True:
+                chunk = upload.file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                copied += len(chunk)
+                if copied > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                temp_file.write(chunk)
+        except BaseException:
+            temp_file.close()
+            os.remove(temp_file.name)
+            raise
+        return temp_file.name
+
+@app.post("/detect/batch")
+async def detect_batch(
+    file: UploadFile = File(None),
+    directory: Optional[str] = Form(None),
+    annotated_dir: Optional[str] = Form(None),
+    checkpoint: Optional[str] = Form(None)
+):
+    """Score a zip archive or a server-side directory, streaming NDJSON results
+
+    Each line is a result (or error) for one image as soon as it finishes,
+    and the last line is a summary. directory, annotated_dir and checkpoint
+    are paths under BATCH_ROOT. With a checkpoint, images scored by an
+    earlier run of the same job are skipped.
+    """
+    has_file = file is not None and bool(file.filename)
+    if has_file == (directory is not None):
+        raise HTTPException(status_code=400, detail="Provide either a zip file or a directory")
+
+    try:
+        directory_path = resolve_batch_path(directory) if directory is not None else None
+        annotated_path = resolve_batch_path(annotated_dir) if annotated_dir else None
+        checkpoint_path = resolve_batch_path(checkpoint) if checkpoint else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    archive = None
+    archive_path = None
+    if directory_path is not None:
+        if not os.path.isdir(directory_path):
+            raise HTTPException(status_code=404, detail=f"Directory not found: {directory}")
+        images = iter_directory_images(directory_path)
+    else:
+        # The upload is closed once streaming starts, so keep the archive on disk
+        try:
+            archive_path = await run_in_threadpool(save_upload, file)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        if not zipfile.is_zipfile(archive_path):
+            os.remove(archive_path)
+            raise HTTPException(status_code=400, detail="Uploaded file is not a zip archive")
+        archive = zipfile.ZipFile(archive_path)
+        try:
+            check_zip_archive(archive)
+        except ValueError as e:
+            archive.close()
+            os.remove(archive_path)
+            raise HTTPException(status_code=413, detail=str(e))
+        images = iter_zip_images(archive)
+
+    def stream_results():
+        try:
+            for record in score_images(inference_scheduler, images, annotated_path, checkpoint_path):
+                yield json.dumps(record) + '\n'
+        finally:
+            if archive is not None:
+                archive.close()
+                os.remove(archive_path)
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+# Registry of live cameras, all sharing the inference scheduler
+camera_manager = CameraManager(inference_scheduler, log_violation)
+
+@app.on_event("shutdown")
+async def stop_pipelines():
+    """Stop every camera pipeline and the inference pool, then flush violations"""
+    await run_in_threadpool(camera_manager.stop_all)
+    await run_in_threadpool(inference_scheduler.shutdown)
+    await run_in_threadpool(violation_writer.shutdown)
+    await run_in_threadpool(roster.shutdown)
+    await run_in_threadpool(rule_engine.shutdown)
+    await run_in_threadpool(image_encoder.shutdown)
+
+class CameraConfig(BaseModel):
+    source: Union[int, str] = Field(0, description="Device index, RTSP URL or video file path")
+    camera_id: Optional[str] = None
+    location: str = CAMERA_DEFAULT_LOCATION
+    width: int = CAMERA_WIDTH
+    height: int = CAMERA_HEIGHT
+    fps: int = CAMERA_FPS
+    two_stage: bool = Field(CAMERA_TWO_STAGE, description="Find people on a downscaled frame, then detect on crops")
+    roi: Optional[List[List[List[int]]]] = Field(None, description="Only detect inside these [x, y] polygons")
+
+def camera_roi(config):
+    """The roi setting for a camera or replay config, raising a 400 if it is invalid"""
+    try:
+        return validate_roi(config.roi or (PEOPLE if config.two_stage else None))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def get_camera_or_404(camera_id: str):
+    """Look up a registered camera"""
+    camera = camera_manager.get(camera_id)
+    if camera is None:
+        raise HTTPException(status_code=404, detail=f"Camera {camera_id} not found")
+    return camera
+
+@app.post("/cameras")
+async def add_camera(config: CameraConfig):
+    """Register a camera and start its detection pipeline"""
+    roi = camera_roi(config)
+    try:
+        camera = await run_in_threadpool(
+            camera_manager.add_camera, config.source, config.camera_id,
+            config.location, config.width, config.height, config.fps, roi
+        )
+    except KeyError:
+        raise HTTPException(status_code=409, detail=f"Camera {config.camera_id} already exists")
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
     
-    def get_frame(self):
-        """Get current frame from camera"""
-        if self.camera and self.is_active:
-            ret, frame = self.camera.read()
-            if ret:
-                return frame
+    return {"success": True, "camera": camera.status()}
+
+class ReplayConfig(BaseModel):
+    source: str = Field(..., description="Video file under BATCH_ROOT, or a stream URL")
+    camera_id: Optional[str] = None
+    location: str = CAMERA_DEFAULT_LOCATION
+    stride: int = Field(1, ge=1, description="Process every Nth frame")
+    speed: float = Field(1.0, gt=0, description="Playback rate relative to the recording")
+    max_speed: bool = Field(False, description="Process frames as fast as inference allows")
+    timeline: Optional[str] = Field(None, description="NDJSON timeline under BATCH_ROOT")
+    output_video: Optional[str] = Field(None, description="Annotated video under BATCH_ROOT")
+    log_violations: bool = False
+    two_stage: bool = CAMERA_TWO_STAGE
+    roi: Optional[List[List[List[int]]]] = None
+
+def _replay_output(path: Optional[str]) -> Optional[str]:
+    if not path:
         return None
+    resolved = resolve_batch_path(path)
+    os.makedirs(os.path.dirname(resolved), exist_ok=True)
+    return resolved
+
+@app.post("/cameras/replay")
+async def add_replay(config: ReplayConfig):
+    """Run a recorded video through the camera pipeline
+
+    The replay is registered like a camera, so it can be watched over
+    /ws/camera and its progress read from GET /cameras/{camera_id}, and
+    stays registered after it ends until it is deleted.
+    """
+    try:
+        source = config.source if '://' in config.source else resolve_batch_path(config.source)
+        timeline_path = _replay_output(config.timeline)
+        output_video = _replay_output(config.output_video)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    roi = camera_roi(config)
     
-    def process_frame(self, frame, student_id=None):
-        """Process frame for dress code detection"""
-        try:
-            # Run YOLO inference
-            results = model(frame)
-            
-            # Extract detected items
-            detected_items = []
-            detection_details = []
-            
-            for result in results:
-                boxes = result.boxes
-                if boxes is not None:
-                    for box in boxes:
-                        cls = int(box.cls[0])
-                        conf = float(box.conf[0])
-                        
-                        if conf > CONFIDENCE_THRESHOLD:
-                            class_name = CLASS_NAMES.get(cls, f'class_{cls}')
-                            detected_items.append(class_name)
-                            
-                            x1, y1, x2, y2 = map(int, box.xyxy[0])
-                            detection_details.append({
-                                'class': DISPLAY_NAMES.get(class_name, class_name),
-                                'confidence': conf,
-                                'bbox': [x1, y1, x2, y2]
-                            })
-            
-            # Detect gender and check compliance
-            gender = detect_gender_from_items(detected_items)
-            compliance_result = check_dress_code_compliance(detected_items, gender)
-            
-            # Draw bounding boxes
-            annotated_frame = draw_bounding_boxes(frame, results)
-            
-            # Check for violations and alert
-            if not compliance_result['is_compliant']:
-                current_time = time.time()
-                # Only log violation every 5 seconds to avoid spam
-                if current_time - self.last_violation_time > 5:
-                    log_violation(student_id, compliance_result['missing_items'], "Live Camera")
-                    self.violation_count += 1
-                    self.last_violation_time = current_time
-            
-            # Store results
-            self.last_detection = {
-                'detections': detection_details,
-                'compliance': compliance_result,
-                'annotated_frame': annotated_frame,
-                'timestamp': datetime.now().isoformat()
-            }
-            
-            return self.last_detection
-            
-        except Exception as e:
-            print(f"Error processing frame: {e}")
-            return None
+    try:
+        camera = await run_in_threadpool(camera_manager.add, lambda camera_id: ReplayCamera(
+            camera_id, source, inference_scheduler, log_violation, location=config.location,
+            stride=config.stride, speed=config.speed, max_speed=config.max_speed,
+            timeline_path=timeline_path, output_video=output_video,
+            log_violations=config.log_violations, roi=roi
+        ), config.camera_id)
+    except KeyError:
+        raise HTTPException(status_code=409, detail=f"Camera {config.camera_id} already exists")
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return {"success": True, "camera": camera.status()}
+
+class RfidScan(BaseModel):
+    rfid_tag: str = Field(..., min_length=1)
+
+@app.post("/cameras/{camera_id}/scan")
+async def scan_rfid(camera_id: str, scan: RfidScan):
+    """Attribute the next person this camera sees to the student with this RFID tag
+
+    The lookup is served from the in-memory roster. The student's recorded
+    gender is used for their compliance check and their violations are
+    logged under their student ID.
+    """
+    camera = get_camera_or_404(camera_id)
+    student = roster.by_rfid(scan.rfid_tag)
+    if student is None:
+        raise HTTPException(status_code=404, detail=f"Unknown RFID tag {scan.rfid_tag}")
+    camera.bind_student(student)
+    return {"success": True, "camera_id": camera_id, "student": student.to_dict(), "expires_in": ROSTER_SCAN_TTL}
+
+@app.get("/cameras")
+async def list_cameras():
+    """List registered cameras"""
+    return {"cameras": [camera.status() for camera in camera_manager.cameras()]}
 
-# Global camera manager
-camera_manager = CameraManager()
+@app.get("/cameras/{camera_id}")
+async def get_camera(camera_id: str):
+    """Get a camera's status"""
+    return get_camera_or_404(camera_id).status()
+
+@app.delete("/cameras/{camera_id}")
+async def remove_camera(camera_id: str):
+    """Stop a camera and remove it from the registry"""
+    if not await run_in_threadpool(camera_manager.remove_camera, camera_id):
+        raise HTTPException(status_code=404, detail=f"Camera {camera_id} not found")
+    return {"success": True, "message": f"Camera {camera_id} removed"}
 
 @app.post("/camera/start")
 async def start_camera():
-    """Start live camera detection"""
-    global camera_manager
-    
-    if camera_manager.start_camera():
+    """Start live camera detection on the default camera"""
+    if camera_manager.get(DEFAULT_CAMERA_ID):
         return {"success": True, "message": "Camera started successfully"}
-    else:
+    
+    try:
+        await run_in_threadpool(
+            camera_manager.add_camera, CAMERA_DEFAULT_SOURCE, DEFAULT_CAMERA_ID,
+            roi=PEOPLE if CAMERA_TWO_STAGE else None
+        )
+    except KeyError:
+        # Started by a concurrent request
+        pass
+    except RuntimeError:
         raise HTTPException(status_code=500, detail="Failed to start camera")
+    return {"success": True, "message": "Camera started successfully"}
 
 @app.post("/camera/stop")
 async def stop_camera():
-    """Stop live camera detection"""
-    global camera_manager
-    
-    camera_manager.stop_camera()
+    """Stop live camera detection on the default camera"""
+    await run_in_threadpool(camera_manager.remove_camera, DEFAULT_CAMERA_ID)
     return {"success": True, "message": "Camera stopped successfully"}
 
 @app.get("/camera/status")
-async def camera_status():
+async def camera_status(camera_id: str = DEFAULT_CAMERA_ID):
     """Get camera status"""
-    global camera_manager
+    camera = camera_manager.get(camera_id)
+    if camera is None:
+        return {"camera_id": camera_id, "active": False, "last_detection": None, "violation_count": 0}
     
-    return {
-        "active": camera_manager.is_active,
-        "last_detection": camera_manager.last_detection,
-        "violation_count": camera_manager.violation_count
-    }
+    return camera.status()
+
+async def receive_acks(websocket: WebSocket, controller: RateController):
+    """Pass frame acks from a viewer to its rate controller until the socket closes"""
+    while True:
+        message = await websocket.receive()
+        if message['type'] == 'websocket.disconnect':
+            return
+        try:
+            data = json.loads(message.get('text') or '')
+            if data.get('type') == 'ack':
+                controller.ack(int(data['seq']))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            continue
 
 @app.websocket("/ws/camera")
-async def websocket_camera(websocket: WebSocket, student_id: Optional[int] = None):
-    """WebSocket endpoint for real-time camera feed"""
-    await websocket.accept()
-    global camera_manager
+async def websocket_camera(websocket: WebSocket, student_id: Optional[int] = None,
+                           camera_id: str = DEFAULT_CAMERA_ID, image_format: str = 'jpeg',
+                           render: str = 'server'):
+    """WebSocket endpoint for real-time camera feed
+
+    Clients that offer the binary subprotocol get each frame as a compact JSON
+    metadata message followed by a binary message holding a 4-byte big-endian
+    sequence number and the raw JPEG (or WebP, with image_format=webp) bytes.
+    Other clients get the original JSON messages with a base64 data URI.
+    With render=client the frames are sent without boxes drawn on them and
+    the client draws the detections itself.
+
+    Each viewer always gets the newest frame, at a rate and image quality
+    adapted to how fast it keeps up (see RateController). Clients may send
+    {"type": "ack", "seq": N} once they have shown a frame to switch to
+    ack-based flow control. Every message carries the viewer's effective
+    frame rate under "stream".
+    """
+    binary = BINARY_WS_SUBPROTOCOL in websocket.scope.get('subprotocols', [])
+    await websocket.accept(subprotocol=BINARY_WS_SUBPROTOCOL if binary else None)
+    if image_format not in ('jpeg', 'webp'):
+        image_format = 'jpeg'
+    if render not in ('server', 'client'):
+        render = 'server'
+    annotated = render == 'server'
+    
+    camera = camera_manager.get(camera_id)
+    if camera is None:
+        await websocket.close()
+        return
+    
+    # Violations from the shared feed are attributed to the latest viewer's student ID
+    if student_id is not None:
+        camera.student_id = student_id
+    subscription = camera.subscribe(render)
+    controller = RateController()
+    receiver = asyncio.create_task(receive_acks(websocket, controller))
     
     try:
-        while camera_manager.is_active:
-            frame = camera_manager.get_frame()
-            if frame is not None:
-                # Process frame for detection
-                detection_result = camera_manager.process_frame(frame, student_id)
-                
-                if detection_result:
-                    # Convert annotated frame to base64
-                    _, buffer = cv2.imencode('.jpg', detection_result['annotated_frame'])
-                    img_base64 = base64.b64encode(buffer).decode('utf-8')
-                    
-                    # Send detection results via WebSocket
-                    await websocket.send_json({
-                        "type": "detection",
-                        "image": f"data:image/jpeg;base64,{img_base64}",
-                        "detections": detection_result['detections'],
-                        "compliance": detection_result['compliance'],
-                        "timestamp": detection_result['timestamp']
-                    })
+        while camera.is_active and not subscription.closed and not receiver.done():
+            # Let the camera speed up for this viewer if it can take more than CAMERA_MAX_FPS
+            subscription.max_fps = controller.fps
+            controller.observe_source(camera.processing_fps(), camera.load)
+            await controller.wait()
+            
+            # Wait for the pipeline's next frame, skipping any we were too slow for
+            frame = await subscription.next(timeout=1.0)
+            if frame is None:
+                continue
+            
+            quality, scale = controller.quality, controller.scale
+            frame_info = {"id": frame.seq, "width": frame.width, "height": frame.height}
+            if binary:
+                image_bytes = await frame.encoded_async(image_format, annotated, quality, scale)
                 
-                # Control frame rate (10 FPS for real-time detection)
-                await asyncio.sleep(0.1)
-            else:
-                await asyncio.sleep(0.1)
+                # Metadata first, then the image keyed by the same sequence number
+                send_started = time.perf_counter()
+                await websocket.send_text(json.dumps({
+                    "type": "detection",
+                    "seq": frame.seq,
+                    "format": image_format,
+                    "render": render,
+                    "frame": frame_info,
+                    "camera_id": camera.camera_id,
+                    "detections": frame.detections,
+                    "compliance": frame.compliance,
+                    "timestamp": frame.timestamp,
+                    "stream": controller.stats()
+                }, separators=(',', ':')))
+                await websocket.send_bytes(struct.pack('>I', frame.seq) + image_bytes)
+                controller.sent(frame.seq, time.perf_counter() - send_started)
+                continue
+            
+            # Send detection results via WebSocket
+            image = await frame.data_uri(annotated, quality, scale)
+            send_started = time.perf_counter()
+            await websocket.send_json({
+                "type": "detection",
+                "seq": frame.seq,
+                "camera_id": camera.camera_id,
+                "render": render,
+                "frame": frame_info,
+                "image": image,
+                "detections": frame.detections,
+                "compliance": frame.compliance,
+                "timestamp": frame.timestamp,
+                "stream": controller.stats()
+            })
+            controller.sent(frame.seq, time.perf_counter() - send_started)
                 
     except WebSocketDisconnect:
         print("WebSocket client disconnected")
@@ -429,52 +644,209 @@ async def websocket_camera(websocket: WebSocket, student_id: Optional[int] = Non
         print(f"WebSocket error: {e}")
     finally:
         # Don't automatically stop camera when one client disconnects
-        # camera_manager.stop_camera()
-        pass
+        receiver.cancel()
+        subscription.close()
 
-def generate_camera_stream():
+async def generate_camera_stream(camera):
     """Generate camera stream for HTTP streaming"""
-    global camera_manager
-    
-    while camera_manager.is_active:
-        frame = camera_manager.get_frame()
-        if frame is not None:
-            # Process frame for detection
-            detection_result = camera_manager.process_frame(frame)
-            
-            if detection_result:
-                annotated_frame = detection_result['annotated_frame']
-            else:
-                annotated_frame = frame
-            
-            # Encode frame as JPEG
-            _, buffer = cv2.imencode('.jpg', annotated_frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
-            frame_bytes = buffer.tobytes()
+    subscription = camera.subscribe('server')
+    try:
+        while camera.is_active and not subscription.closed:
+            frame = await subscription.next(timeout=1.0)
+            if frame is None:
+                continue
             
-            # Yield frame in multipart format
+            # Yield the already encoded frame in multipart format
+            jpeg = await frame.encoded_async()
             yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-        else:
-            time.sleep(0.1)
+                   b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+    finally:
+        subscription.close()
 
 @app.get("/camera/stream")
-async def camera_stream():
+async def camera_stream(camera_id: str = DEFAULT_CAMERA_ID):
     """HTTP streaming endpoint for camera feed"""
-    global camera_manager
-    
-    if not camera_manager.is_active:
+    camera = camera_manager.get(camera_id)
+    if camera is None or not camera.is_active:
         raise HTTPException(status_code=400, detail="Camera is not active")
     
     return StreamingResponse(
-        generate_camera_stream(),
+        generate_camera_stream(camera),
         media_type="multipart/x-mixed-replace; boundary=frame"
     )
 
+@app.get("/violations")
+async def get_violations(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    location: Optional[str] = None,
+    status: Optional[str] = None,
+    missing_item: Optional[str] = None,
+    student_id: Optional[int] = None
+):
+    """List violations newest first, one page at a time
+
+    Pass the returned next_cursor as cursor to get the following page.
+    """
+    try:
+        return await run_in_threadpool(
+            list_violations, limit, cursor, start, end, location, status, missing_item, student_id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except DatabaseUnavailable:
+        raise HTTPException(status_code=503, detail="Database not available")
+
+@app.get("/violations/stats")
+async def get_violation_stats(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    location: Optional[str] = None,
+    missing_item: Optional[str] = None
+):
+    """Violation counts per day, location and item from the daily rollup"""
+    try:
+        return await run_in_threadpool(violation_stats, start, end, location, missing_item)
+    except DatabaseUnavailable:
+        raise HTTPException(status_code=503, detail="Database not available")
+
+@app.get("/rules")
+async def get_rules():
+    """The dress code rules in effect, per location and day of the week"""
+    return rule_engine.describe()
+
+@app.post("/rules/reload")
+async def reload_rules():
+    """Re-read the requirements table now instead of waiting for the next check"""
+    changed = await run_in_threadpool(rule_engine.reload)
+    return {"success": True, "changed": changed, **rule_engine.describe()}
+
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy", "model_loaded": model is not None}
+    """Liveness check, answered as soon as the process is up whether or not the model has loaded"""
+    scheduler_stats = inference_scheduler.stats()
+    return {
+        "status": "healthy",
+        "model_loaded": inference_executor.is_ready,
+        "model_state": inference_executor.state,
+        "backend": {
+            "name": scheduler_stats['pool']['backend'],
+            "model_path": scheduler_stats['pool']['model_path'],
+            "warmup_ms_per_image": scheduler_stats['pool']['warmup_ms_per_image'],
+            "avg_image_ms": scheduler_stats['avg_image_ms']
+        },
+        "inference": scheduler_stats,
+        "result_cache": result_cache.stats(),
+        "violations": violation_writer.stats(),
+        "violation_stats_cache": stats_cache.stats(),
+        "roster": roster.stats(),
+        "rules": rule_engine.stats(),
+        "encoder": image_encoder.stats()
+    }
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness check: 200 once the model is loaded and warmed up, 503 before that or if loading failed"""
+    body = {
+        "ready": inference_executor.is_ready,
+        "model_state": inference_executor.state,
+        "load_error": inference_executor.load_error,
+        "warmup_ms_per_image": inference_executor.warmup_ms,
+        "pid": os.getpid()
+    }
+    return JSONResponse(status_code=200 if body["ready"] else 503, content=body)
+
+# Queue depths, drops and throughput are read from the components' own
+# counters when /metrics is scraped
+REGISTRY.gauge(
+    'dress_inference_pending_images', 'Images waiting to be batched',
+    lambda: [({}, inference_scheduler.stats()['pending'])]
+)
+REGISTRY.gauge(
+    'dress_inference_in_flight', 'Batches submitted to the inference pool and not finished',
+    lambda: [({}, inference_executor.stats()['in_flight'])]
+)
+REGISTRY.counter(
+    'dress_inference_rejected_total', 'Images refused because the inference queue was full',
+    lambda: [({}, inference_scheduler.stats()['rejected'])]
+)
+REGISTRY.gauge(
+    'dress_violation_buffer_rows', 'Violations waiting to be written to the database',
+    lambda: [({}, violation_writer.stats()['buffered'])]
+)
+REGISTRY.counter(
+    'dress_violation_rows_total', 'Violation rows by what happened to them',
+    lambda: [
+        ({'result': result}, count)
+        for result, count in violation_writer.stats().items()
+        if result in ('written', 'spilled', 'replayed', 'rejected', 'corrupt')
+    ]
+)
+REGISTRY.counter(
+    'dress_result_cache_lookups_total', 'Result cache lookups by outcome',
+    lambda: [
+        ({'result': 'hit'}, result_cache.hits),
+        ({'result': 'disk_hit'}, result_cache.disk_hits),
+        ({'result': 'miss'}, result_cache.misses)
+    ]
+)
+REGISTRY.gauge(
+    'dress_camera_fps', 'Frames processed per second by each camera',
+    lambda: [({'camera': camera.camera_id}, camera.processing_fps()) for camera in camera_manager.cameras()]
+)
+REGISTRY.counter(
+    'dress_camera_frames_total', 'Camera frames by what happened to them',
+    lambda: [
+        ({'camera': camera.camera_id, 'result': result}, count)
+        for camera in camera_manager.cameras()
+        for result, count in (
+            ('captured', camera.frames_captured),
+            ('processed', camera.frames_processed),
+            ('skipped', camera.frames_skipped),
+            ('idle', camera.motion_gate.stats()['skipped'] if camera.motion_gate is not None else 0)
+        )
+    ]
+)
+REGISTRY.gauge(
+    'dress_frame_ring_slots_in_use', 'Shared memory frame slots each camera has pinned',
+    lambda: [
+        ({'camera': camera.camera_id}, ring.stats()['in_use'])
+        for camera in camera_manager.cameras()
+        for ring in (camera.frame_ring,) if ring is not None
+    ]
+)
+REGISTRY.counter(
+    'dress_frame_ring_drops_total', 'Camera frames dropped because every shared memory slot was in use',
+    lambda: [
+        ({'camera': camera.camera_id}, ring.stats()['drops'])
+        for camera in camera_manager.cameras()
+        for ring in (camera.frame_ring,) if ring is not None
+    ]
+)
+REGISTRY.gauge(
+    'dress_encoder_pending', 'Frame encodes queued or running on the encoder pool',
+    lambda: [({}, image_encoder.stats()['pending'])]
+)
+REGISTRY.counter(
+    'dress_encodes_total', 'Images encoded for viewers and /detect by format',
+    lambda: [({'format': image_format}, count) for image_format, count in image_encoder.stats()['encodes'].items()]
+)
+REGISTRY.counter(
+    'dress_encode_reuses_total', 'Viewer frames served from an encode another viewer already started',
+    lambda: [({}, image_encoder.stats()['reused'])]
+)
+REGISTRY.counter(
+    'dress_viewer_dropped_frames_total', 'Frames connected viewers missed because they were too slow',
+    lambda: [({'camera': camera.camera_id}, camera.broadcaster.stats()['dropped']) for camera in camera_manager.cameras()]
+)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics in the text exposition format"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(app, host=SERVER_HOST, port=SERVER_PORT)
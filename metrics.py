@@ -0,0 +1,196 @@
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Latency buckets in seconds, from sub-millisecond post-processing up to slow CPU batches
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """Base for metrics with a fixed set of label names"""
+    metric_type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    metric_type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        lines = self.header()
+        for key, value in values:
+            lines.append(f"{self.name}{_format_labels(dict(zip(self.labelnames, key)))} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed cumulative buckets"""
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        lines = self.header()
+        for key, counts, total, count in series:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels({**labels, 'le': _format_value(bound)})
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """Counter or gauge read from existing stats when /metrics is scraped
+
+    The callback returns a list of (labels, value) pairs, which keeps counters
+    that components already track (queue depths, dropped frames, writer
+    totals) in one place instead of duplicating them here.
+    """
+
+    def __init__(self, name: str, documentation: str, metric_type: str,
+                 callback: Callable[[], List[Tuple[Dict[str, str], float]]]):
+        super().__init__(name, documentation)
+        self.metric_type = metric_type
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, value in self.callback():
+            if value is None:
+                continue
+            lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, documentation: str,
+              callback: Callable[[], List[Tuple[Dict[str, str], float]]]) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, 'gauge', callback))
+
+    def counter(self, name: str, documentation: str,
+                callback: Callable[[], List[Tuple[Dict[str, str], float]]]) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, 'counter', callback))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # One broken collector shouldn't take the whole endpoint down
+                print(f"Error collecting metric {metric.name}: {e}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'dress_stage_seconds', 'Time spent in each processing stage', ['pipeline', 'stage']
+))
+BATCH_SIZE = REGISTRY.register(Histogram(
+    'dress_inference_batch_size', 'Images per model call', buckets=(1, 2, 3, 4, 6, 8, 12, 16, 32)
+))
+DETECT_REQUESTS = REGISTRY.register(Counter(
+    'dress_detect_requests_total', 'POST /detect requests by outcome', ['outcome']
+))
+VIOLATIONS = REGISTRY.register(Counter(
+    'dress_violations_total', 'Violations queued for logging', ['location']
+))
+MODEL_PIXELS = REGISTRY.register(Counter(
+    'dress_model_pixels_total', 'Letterboxed pixels fed to the model', ['pipeline', 'mode']
+))
+DB_FLUSH_SECONDS = REGISTRY.register(Histogram(
+    'dress_db_flush_seconds', 'Time to write one batch of violations to the database'
+))
+
+
+def pipeline_for_source(source: str) -> str:
+    """Collapse scheduler sources into a small label set: upload, batch or camera"""
+    if source == 'upload':
+        return 'upload'
+    if source == 'batch-job':
+        return 'batch'
+    return 'camera'
+
+def observe_stages(pipeline: str, timing: Dict, stages: Optional[Iterable[str]] = None):
+    """Record the *_ms entries of a timing dict in the stage histogram"""
+    for key, value in timing.items():
+        if not key.endswith('_ms') or value is None:
+            continue
+        stage = key[:-3]
+        if stages is None or stage in stages:
+            STAGE_SECONDS.observe(value / 1000, pipeline=pipeline, stage=stage)
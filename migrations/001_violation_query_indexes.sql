@@ -0,0 +1,75 @@
+-- Indexes and daily rollups for the violations dashboard (GET /violations, GET /violations/stats)
+-- Brings a database created from an older dresstest_db.sql up to date:
+--   mysql -u root -p dresstest < migrations/001_violation_query_indexes.sql
+
+ALTER TABLE `violations`
+  ADD KEY `idx_violations_detected` (`detected_at`,`violation_id`),
+  ADD KEY `idx_violations_location_detected` (`location`,`detected_at`,`violation_id`),
+  ADD KEY `idx_violations_status_detected` (`status`,`detected_at`,`violation_id`),
+  ADD KEY `idx_violations_item_detected` (`missing_item`,`detected_at`,`violation_id`);
+
+CREATE TABLE IF NOT EXISTS `violation_daily_counts` (
+  `day` date NOT NULL,
+  `location` varchar(100) NOT NULL DEFAULT '',
+  `missing_item` varchar(100) NOT NULL,
+  `violation_count` int NOT NULL DEFAULT '0',
+  PRIMARY KEY (`day`,`location`,`missing_item`),
+  KEY `idx_daily_counts_location_day` (`location`,`day`),
+  KEY `idx_daily_counts_item_day` (`missing_item`,`day`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- Create the trigger and backfill under a table lock so no insert is counted twice or missed
+LOCK TABLES `violations` WRITE, `violation_daily_counts` WRITE;
+
+-- Rows without a detected_at are left out of the rollup, as they are from GET /violations.
+-- Deletes and updates that move a row to another day, location or item are counted too
+DROP TRIGGER IF EXISTS `violations_daily_count`;
+DROP TRIGGER IF EXISTS `violations_daily_uncount`;
+DROP TRIGGER IF EXISTS `violations_daily_recount`;
+DELIMITER ;;
+CREATE TRIGGER `violations_daily_count` AFTER INSERT ON `violations` FOR EACH ROW
+BEGIN
+  IF NEW.detected_at IS NOT NULL THEN
+    INSERT INTO violation_daily_counts (day, location, missing_item, violation_count)
+    VALUES (DATE(NEW.detected_at), COALESCE(NEW.location, ''), NEW.missing_item, 1)
+    ON DUPLICATE KEY UPDATE violation_count = violation_count + 1;
+  END IF;
+END;;
+CREATE TRIGGER `violations_daily_uncount` AFTER DELETE ON `violations` FOR EACH ROW
+BEGIN
+  IF OLD.detected_at IS NOT NULL THEN
+    UPDATE violation_daily_counts SET violation_count = violation_count - 1
+    WHERE day = DATE(OLD.detected_at) AND location = COALESCE(OLD.location, '') AND missing_item = OLD.missing_item;
+    DELETE FROM violation_daily_counts
+    WHERE day = DATE(OLD.detected_at) AND location = COALESCE(OLD.location, '') AND missing_item = OLD.missing_item
+      AND violation_count <= 0;
+  END IF;
+END;;
+CREATE TRIGGER `violations_daily_recount` AFTER UPDATE ON `violations` FOR EACH ROW
+BEGIN
+  IF NOT (DATE(OLD.detected_at) <=> DATE(NEW.detected_at) AND OLD.location <=> NEW.location
+          AND OLD.missing_item <=> NEW.missing_item) THEN
+    IF OLD.detected_at IS NOT NULL THEN
+      UPDATE violation_daily_counts SET violation_count = violation_count - 1
+      WHERE day = DATE(OLD.detected_at) AND location = COALESCE(OLD.location, '') AND missing_item = OLD.missing_item;
+      DELETE FROM violation_daily_counts
+      WHERE day = DATE(OLD.detected_at) AND location = COALESCE(OLD.location, '') AND missing_item = OLD.missing_item
+        AND violation_count <= 0;
+    END IF;
+    IF NEW.detected_at IS NOT NULL THEN
+      INSERT INTO violation_daily_counts (day, location, missing_item, violation_count)
+      VALUES (DATE(NEW.detected_at), COALESCE(NEW.location, ''), NEW.missing_item, 1)
+      ON DUPLICATE KEY UPDATE violation_count = violation_count + 1;
+    END IF;
+  END IF;
+END;;
+DELIMITER ;
+
+DELETE FROM `violation_daily_counts`;
+INSERT INTO `violation_daily_counts` (day, location, missing_item, violation_count)
+SELECT DATE(detected_at), COALESCE(location, ''), missing_item, COUNT(*)
+FROM `violations`
+WHERE detected_at IS NOT NULL
+GROUP BY DATE(detected_at), COALESCE(location, ''), missing_item;
+
+UNLOCK TABLES;
@@ -0,0 +1,5 @@
+-- Index for the roster's incremental refresh, which reads students created after the last one it saw
+--   mysql -u root -p dresstest < migrations/002_student_roster_index.sql
+
+ALTER TABLE `students`
+  ADD KEY `idx_students_created` (`created_at`,`student_id`);
@@ -0,0 +1,7 @@
+-- Per-location and per-weekday dress code rules
+-- Rows with NULL location and day_of_week are the everyday rules. day_of_week is 1 (Monday) to 7 (Sunday).
+--   mysql -u root -p dresstest < migrations/003_scoped_requirements.sql
+
+ALTER TABLE `requirements`
+  ADD COLUMN `location` varchar(100) DEFAULT NULL,
+  ADD COLUMN `day_of_week` tinyint DEFAULT NULL;
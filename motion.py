@@ -0,0 +1,79 @@
+import time
+from typing import Dict
+import cv2
+import numpy as np
+from config import (
+    MOTION_THRESHOLD, MOTION_PIXEL_DELTA, MOTION_HOLD_S, MOTION_REFRESH_S, MOTION_FRAME_WIDTH
+)
+
+
+class MotionGate:
+    """Cheap scene-change check that decides whether a frame needs inference
+
+    Frames are shrunk to a small blurred grayscale thumbnail and compared
+    with the thumbnail of the last frame that went through inference. A frame
+    is only sent on when enough pixels changed, or when refresh_s has passed
+    so slow changes and people standing still are still picked up. Comparing
+    against the last inferred frame rather than the previous frame means
+    gradual changes add up until they trigger.
+    """
+
+    def __init__(self, threshold: float = MOTION_THRESHOLD, pixel_delta: int = MOTION_PIXEL_DELTA,
+                 hold_s: float = MOTION_HOLD_S, refresh_s: float = MOTION_REFRESH_S,
+                 frame_width: int = MOTION_FRAME_WIDTH):
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.hold_s = hold_s
+        self.refresh_s = refresh_s
+        self.frame_width = frame_width
+        self.reset()
+
+    def reset(self):
+        self._reference = None
+        self._last_run = 0
+        self._last_motion = 0
+        self.checked = 0
+        self.skipped = 0
+        self.last_change = 0.0
+
+    def _thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        height, width = frame.shape[:2]
+        size = (self.frame_width, max(1, round(height * self.frame_width / width)))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def check(self, frame: np.ndarray) -> bool:
+        """Return True when the frame changed enough to run inference on it"""
+        now = time.time()
+        self.checked += 1
+        thumbnail = self._thumbnail(frame)
+
+        changed = self._reference is None or self._reference.shape != thumbnail.shape
+        if not changed:
+            diff = cv2.absdiff(thumbnail, self._reference)
+            self.last_change = float(np.count_nonzero(diff > self.pixel_delta)) / diff.size
+            changed = self.last_change >= self.threshold
+
+        if changed:
+            self._last_motion = now
+        elif now - self._last_run < self.refresh_s:
+            self.skipped += 1
+            return False
+
+        self._reference = thumbnail
+        self._last_run = now
+        return True
+
+    @property
+    def active(self) -> bool:
+        """Whether motion was seen recently enough to keep processing at full rate"""
+        return time.time() - self._last_motion < self.hold_s
+
+    def stats(self) -> Dict:
+        return {
+            'active': self.active,
+            'checked': self.checked,
+            'skipped': self.skipped,
+            'last_change': round(self.last_change, 4)
+        }
@@ -0,0 +1,79 @@
+from typing import Dict, List, Tuple
+import cv2
+import numpy as np
+from config import CONFIDENCE_THRESHOLD, CLASS_NAMES, DISPLAY_NAMES
+
+
+class Boxes:
+    """Detections above the confidence threshold for one image, as NumPy arrays
+
+    xyxy holds integer pixel corners (N, 4), conf the confidences (N,) and
+    cls the class ids (N,). labels and display_names are the matching class
+    names, looked up once per box.
+    """
+    __slots__ = ('xyxy', 'conf', 'cls', 'labels', 'display_names')
+
+    def __init__(self, xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+        self.labels = [CLASS_NAMES.get(class_id, f'class_{class_id}') for class_id in cls.tolist()]
+        self.display_names = [DISPLAY_NAMES.get(label, label) for label in self.labels]
+
+    def __len__(self) -> int:
+        return len(self.conf)
+
+
+_NO_BOXES = np.zeros((0, 6), dtype=np.float32)
+
+
+def extract_boxes(result, threshold: float = CONFIDENCE_THRESHOLD) -> Boxes:
+    """Pull one YOLO result's boxes off the device in a single copy and apply the threshold"""
+    boxes = result.boxes
+    data = boxes.data.cpu().numpy() if boxes is not None else _NO_BOXES
+    # Ultralytics keeps confidence and class in the last two columns, with or without track ids
+    data = data[data[:, -2] > threshold]
+    return Boxes(
+        data[:, :4].astype(np.int32),
+        data[:, -2].astype(np.float64),
+        data[:, -1].astype(np.int32)
+    )
+
+def build_detections(boxes: Boxes) -> Tuple[List[str], List[Dict]]:
+    """Return the detected class names and the per-box detection details"""
+    detection_details = [
+        {
+            'class': display_name,
+            'label': label,
+            'confidence': confidence,
+            'bbox': bbox
+        }
+        for display_name, label, confidence, bbox in zip(
+            boxes.display_names, boxes.labels, boxes.conf.tolist(), boxes.xyxy.tolist()
+        )
+    ]
+    return list(boxes.labels), detection_details
+
+def class_mask(boxes: Boxes) -> int:
+    """Bitmask with one bit set per detected class id"""
+    if not len(boxes):
+        return 0
+    return int(np.bitwise_or.reduce(np.left_shift(1, boxes.cls.astype(np.int64))))
+
+def draw_boxes(image: np.ndarray, boxes: Boxes) -> np.ndarray:
+    """Draw bounding boxes with "Name: confidence" labels on a copy of the image"""
+    annotated_image = image.copy()
+
+    for (x1, y1, x2, y2), confidence, display_name in zip(
+        boxes.xyxy.tolist(), boxes.conf.tolist(), boxes.display_names
+    ):
+        # Draw bounding box
+        cv2.rectangle(annotated_image, (x1, y1), (x2, y2), (0, 255, 0), 2)
+
+        # Draw label
+        label = f'{display_name}: {confidence:.2f}'
+        (label_width, label_height), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+        cv2.rectangle(annotated_image, (x1, y1 - label_height - 10), (x1 + label_width, y1), (0, 255, 0), -1)
+        cv2.putText(annotated_image, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
+
+    return annotated_image
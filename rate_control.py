@@ -0,0 +1,176 @@
+import asyncio
+import time
+from collections import deque
+from typing import Dict, Optional
+from config import CAMERA_JPEG_QUALITY, CAMERA_MAX_FPS, WS_MIN_FPS, WS_MAX_FPS, WS_MAX_UNACKED, WS_ACK_TIMEOUT
+
+# (JPEG quality, scale) from best to cheapest, stepped down when a viewer can't keep up
+QUALITY_LEVELS = (
+    (CAMERA_JPEG_QUALITY, 1.0),
+    (min(CAMERA_JPEG_QUALITY, 65), 1.0),
+    (min(CAMERA_JPEG_QUALITY, 60), 0.75),
+    (min(CAMERA_JPEG_QUALITY, 50), 0.5)
+)
+
+# Delivery slower than this fraction of the frame interval counts as congestion,
+# faster than CLEAR_RATIO as spare capacity
+CONGESTED_RATIO = 0.8
+CLEAR_RATIO = 0.4
+# Multiplicative decrease on congestion, at most once per DECREASE_HOLD_S
+DECREASE_FACTOR = 0.7
+DECREASE_HOLD_S = 0.5
+# Uncongested frames in a row before stepping quality or frame rate back up
+RECOVER_FRAMES = 10
+# Camera load above which the pipeline has no inference headroom left
+SOURCE_BUSY_LOAD = 0.8
+# Seconds of send timestamps used to report the effective frame rate
+FPS_WINDOW_S = 2
+
+
+class RateController:
+    """Per-viewer frame rate and image quality, adapted to how fast the viewer keeps up
+
+    Without acks, the time each send takes to complete is the signal: once
+    the socket buffer is full a slow client makes sends block. A client can
+    instead ack frames ({"type": "ack", "seq": N}, cumulative), after which
+    at most max_unacked frames are in flight and time spent waiting for
+    acks is the signal. Congestion cuts the frame rate and, once it falls
+    below half the starting rate, steps down JPEG quality and resolution.
+    Spare capacity restores quality first, then raises the rate by one
+    frame per second at a time, but only past the camera's own rate while
+    the camera has inference headroom to follow.
+    """
+
+    def __init__(self, start_fps: float = CAMERA_MAX_FPS, min_fps: float = WS_MIN_FPS,
+                 max_fps: float = WS_MAX_FPS, max_unacked: int = WS_MAX_UNACKED,
+                 ack_timeout: float = WS_ACK_TIMEOUT):
+        self.min_fps = min_fps
+        self.max_fps = max(min_fps, max_fps)
+        self.fps = min(max(start_fps, self.min_fps), self.max_fps)
+        self._quality_floor_fps = max(self.min_fps, self.fps / 2)
+        self.level = 0
+        self.max_unacked = max(1, max_unacked)
+        self.ack_timeout = ack_timeout
+        self.acks = False
+        self.delay = 0.0
+        self._in_flight = {}
+        self._ack_event = asyncio.Event()
+        self._next_at = 0.0
+        self._last_decrease = 0.0
+        self._clear_streak = 0
+        self._blocked = 0.0
+        self._source_fps = None
+        self._source_load = 0.0
+        self._sent_at = deque()
+        self.sent_frames = 0
+        self.ack_timeouts = 0
+
+    @property
+    def quality(self) -> int:
+        return QUALITY_LEVELS[self.level][0]
+
+    @property
+    def scale(self) -> float:
+        return QUALITY_LEVELS[self.level][1]
+
+    async def wait(self):
+        """Sleep until the next frame is due and, for acking viewers, one can be put in flight"""
+        delay = self._next_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self._blocked = 0.0
+        if not self.acks or len(self._in_flight) < self.max_unacked:
+            return
+
+        started = time.monotonic()
+        deadline = started + self.ack_timeout
+        while len(self._in_flight) >= self.max_unacked:
+            self._ack_event.clear()
+            try:
+                await asyncio.wait_for(self._ack_event.wait(), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                # Acks were lost or the client stopped sending them, don't stall the feed
+                self._in_flight.clear()
+                self.ack_timeouts += 1
+                break
+        self._blocked = time.monotonic() - started
+
+    def observe_source(self, fps: Optional[float], load: float):
+        """Latest frame rate and load of the camera feeding this viewer"""
+        self._source_fps = fps
+        self._source_load = load
+
+    def sent(self, seq: int, send_seconds: float):
+        """Record a frame whose send took send_seconds to complete"""
+        now = time.monotonic()
+        self._next_at = now - send_seconds + 1 / self.fps
+        self.sent_frames += 1
+        self._sent_at.append(now)
+        while self._sent_at[0] < now - FPS_WINDOW_S:
+            self._sent_at.popleft()
+
+        if self.acks:
+            self._in_flight[seq] = now
+            self._adapt(self._blocked, now)
+        else:
+            self._adapt(send_seconds, now)
+
+    def ack(self, seq: int):
+        """Handle a client ack, which also covers every earlier frame"""
+        now = time.monotonic()
+        self.acks = True
+        sent_at = self._in_flight.get(seq)
+        if sent_at is not None:
+            self.delay = now - sent_at
+        for in_flight in [s for s in self._in_flight if s <= seq]:
+            del self._in_flight[in_flight]
+        self._ack_event.set()
+
+    def _adapt(self, delay: float, now: float):
+        if not self.acks:
+            self.delay = delay
+        interval = 1 / self.fps
+        if delay > interval * CONGESTED_RATIO:
+            self._clear_streak = 0
+            if now - self._last_decrease >= DECREASE_HOLD_S:
+                self._last_decrease = now
+                self.fps = max(self.min_fps, self.fps * DECREASE_FACTOR)
+                if self.fps < self._quality_floor_fps and self.level < len(QUALITY_LEVELS) - 1:
+                    self.level += 1
+            return
+
+        if delay < interval * CLEAR_RATIO:
+            self._clear_streak += 1
+        if self._clear_streak < RECOVER_FRAMES:
+            return
+        self._clear_streak = 0
+        if self.level > 0:
+            self.level -= 1
+        elif self.fps < self._ceiling():
+            self.fps = min(self._ceiling(), self.fps + 1)
+
+    def _ceiling(self) -> float:
+        """Fastest rate worth asking for, given how fast the camera and the ack window can go"""
+        ceiling = self.max_fps
+        if self._source_fps is not None and self._source_load >= SOURCE_BUSY_LOAD:
+            # The camera is busy: nothing is gained by asking for more frames than it produces
+            ceiling = min(ceiling, self._source_fps)
+        if self.acks and self.delay > 0:
+            # max_unacked frames per round trip is all an acking client can receive
+            ceiling = min(ceiling, self.max_unacked / self.delay)
+        return max(self.min_fps, ceiling)
+
+    def effective_fps(self) -> float:
+        """Frames actually sent per second over the last FPS_WINDOW_S seconds"""
+        cutoff = time.monotonic() - FPS_WINDOW_S
+        return round(sum(1 for sent_at in list(self._sent_at) if sent_at >= cutoff) / FPS_WINDOW_S, 2)
+
+    def stats(self) -> Dict:
+        return {
+            'fps': self.effective_fps(),
+            'target_fps': round(self.fps, 2),
+            'quality': self.quality,
+            'scale': self.scale,
+            'acks': self.acks,
+            'delay_ms': round(self.delay * 1000, 2)
+        }
@@ -0,0 +1,362 @@
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional, Union
+import cv2
+from config import (
+    INFERENCE_TIMEOUT, CAMERA_DEFAULT_LOCATION, FRAME_RING_SLOTS, REPLAY_PREFETCH, REPLAY_MAX_IN_FLIGHT
+)
+from camera import Camera
+from frame_ring import FrameRing
+from inference import InferenceQueueFull, ModelNotReady
+
+# FourCC used for the annotated output video, by file extension
+VIDEO_CODECS = {'.mp4': 'mp4v', '.avi': 'MJPG', '.mkv': 'XVID'}
+
+
+def _discard_violation(student_id, missing_items, location):
+    """Stand-in for log_violation when a replay shouldn't write to the database"""
+
+
+class VideoPrefetcher:
+    """Decodes a video on its own thread into a bounded buffer ahead of inference
+
+    With stride > 1 only every stride-th frame is decoded and the others are
+    just grabbed, which skips their decode. The buffer holds at most size
+    frames, so reading ahead pauses when inference falls behind instead of
+    filling memory. With a ring, frames are decoded straight into its shared
+    memory slots, waiting for a free one rather than dropping frames. Items
+    are (frame index, position in seconds, frame), followed by None at the
+    end of the video.
+    """
+
+    def __init__(self, capture, stride: int = 1, size: int = REPLAY_PREFETCH, ring: Optional[FrameRing] = None):
+        self.capture = capture
+        self.ring = ring
+        self.stride = max(1, stride)
+        # Some containers and streams don't report a frame rate or length
+        self.fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.total_frames = frame_count if frame_count > 0 else None
+        self._buffer = queue.Queue(maxsize=max(1, size))
+        self._running = False
+        self._thread = None
+        self.frames_read = 0
+        self.frames_decoded = 0
+        self.error = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='replay-decode', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def get(self, timeout: float):
+        """Next buffered item, raising queue.Empty if the decoder hasn't caught up"""
+        return self._buffer.get(timeout=timeout)
+
+    def buffered(self) -> int:
+        return self._buffer.qsize()
+
+    def _put(self, item) -> bool:
+        while self._running:
+            try:
+                self._buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read(self):
+        if self.ring is None:
+            return self.capture.read()
+        buffer = None
+        while buffer is None:
+            if not self._running:
+                return False, None
+            buffer = self.ring.acquire(timeout=0.1)
+        ret, frame = self.capture.read(buffer)
+        if ret and frame is not buffer:
+            # The container reported a different frame size, decode normally from here on
+            self.ring = None
+        return ret, frame
+
+    def _run(self):
+        index = 0
+        try:
+            while self._running:
+                if index % self.stride:
+                    if not self.capture.grab():
+                        break
+                else:
+                    ret, frame = self._read()
+                    if not ret:
+                        break
+                    self.frames_decoded += 1
+                    if not self._put((index, index / self.fps, frame)):
+                        break
+                index += 1
+                self.frames_read = index
+        except cv2.error as e:
+            self.error = str(e)
+            print(f"Error decoding video: {e}")
+        finally:
+            self._put(None)
+
+
+class ReplayCamera(Camera):
+    """Runs a recorded video file or URL through the camera pipeline
+
+    Unlike a live camera no frame is dropped: a VideoPrefetcher reads ahead
+    and every stride-th frame is processed in order, so the same video always
+    gives the same timeline. At speed 1 frames are released at the video's
+    own rate, which exercises the live path without a webcam. With max_speed
+    up to max_in_flight frames wait on the inference scheduler at once so it
+    can fill whole batches, and the replay runs as fast as inference allows.
+    Motion gating is off, since its hold and refresh times are wall-clock
+    times.
+
+    Every processed frame is written to an NDJSON timeline, followed by a
+    summary record, and to an annotated output_video if one is given.
+    Violations go to the timeline and are only logged to the database with
+    log_violations=True. The replay stays registered after it ends so its
+    status can be read.
+    """
+
+    def __init__(self, camera_id: str, source: Union[int, str], scheduler, log_violation: Callable,
+                 location: str = CAMERA_DEFAULT_LOCATION, stride: int = 1, speed: float = 1.0,
+                 max_speed: bool = False, timeline_path: Optional[str] = None,
+                 output_video: Optional[str] = None, log_violations: bool = False,
+                 prefetch: int = REPLAY_PREFETCH, max_in_flight: int = REPLAY_MAX_IN_FLIGHT, roi=None):
+        super().__init__(camera_id, source, scheduler,
+                         log_violation if log_violations else _discard_violation, location=location, roi=roi)
+        self.motion_gate = None
+        self.stride = max(1, stride)
+        self.speed = speed if speed > 0 else 1.0
+        self.max_speed = max_speed
+        self.timeline_path = timeline_path
+        self.output_video = output_video
+        self.log_violations = log_violations
+        self.prefetch = prefetch
+        self.max_in_flight = max(1, max_in_flight) if max_speed else 1
+        self.prefetcher = None
+        self.state = 'pending'
+        self.error = None
+        self.frames_failed = 0
+        self.position_s = 0.0
+        self.started_at = None
+        self.finished_at = None
+        self._clock_start = None
+        self._published_seq = 0
+        self._timeline = None
+        self._writer = None
+        self._done = threading.Event()
+
+    def start(self):
+        """Open the video and start decoding and processing it"""
+        if self.is_active or self.state != 'pending':
+            return self.is_active
+
+        capture = cv2.VideoCapture(self.source)
+        if not capture.isOpened():
+            print(f"Error starting replay {self.camera_id}: could not open {self.source}")
+            capture.release()
+            return False
+        try:
+            if self.timeline_path:
+                self._timeline = open(self.timeline_path, 'w', encoding='utf-8')
+        except OSError as e:
+            print(f"Error starting replay {self.camera_id}: {e}")
+            capture.release()
+            return False
+
+        self.camera = capture
+        self.width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        if self.shared_memory and self.width and self.height:
+            # Room for the frames in flight and the published one, read-ahead gets whatever is left
+            self.frame_ring = self._create_ring((self.height, self.width, 3),
+                                                max(FRAME_RING_SLOTS, self.max_in_flight + 4))
+        self.prefetcher = VideoPrefetcher(capture, self.stride, self.prefetch, self.frame_ring)
+        self.fps = self.prefetcher.fps
+        self.is_active = True
+        self.state = 'running'
+        self.started_at = time.time()
+        self._clock_start = time.monotonic()
+        self.prefetcher.start()
+        self._threads = [
+            threading.Thread(target=self._pipeline_loop, name=f'replay-{self.camera_id}', daemon=True)
+        ]
+        self._threads[0].start()
+        return True
+
+    def stop(self):
+        """Stop the replay early, or release it once it has ended"""
+        self.is_active = False
+        if self.prefetcher is not None:
+            self.prefetcher.stop()
+        super().stop()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the replay to end, returning False on timeout"""
+        return self._done.wait(timeout)
+
+    @property
+    def frames_captured(self) -> int:
+        return self.prefetcher.frames_decoded if self.prefetcher is not None else 0
+
+    def _pace(self, position_s: float):
+        """At normal speed, hold a frame back until its time in the video comes up"""
+        if self.max_speed:
+            return
+        due = self._clock_start + position_s / self.speed
+        while self.is_active:
+            delay = due - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(min(delay, 0.1))
+
+    def _submit(self, frame, annotate: bool):
+        while True:
+            try:
+                return self.submit_frame(frame, annotate)
+            except InferenceQueueFull as e:
+                # Leave room for live traffic, or let the model finish loading, and try again shortly
+                if not self.is_active or isinstance(e, ModelNotReady) and e.error:
+                    raise
+                time.sleep(0.05)
+
+    def _pipeline_loop(self):
+        """Keep up to max_in_flight frames at the scheduler and handle the results in video order"""
+        pending = deque()
+        end_of_video = False
+        state = 'stopped'
+        try:
+            while self.is_active:
+                while not end_of_video and len(pending) < self.max_in_flight and self.is_active:
+                    try:
+                        item = self.prefetcher.get(timeout=0.5)
+                    except queue.Empty:
+                        # The decoder is behind, handle what is already in flight meanwhile
+                        break
+                    if item is None:
+                        end_of_video = True
+                        break
+                    index, position_s, frame = item
+                    self._pace(position_s)
+                    render_modes = self.broadcaster.render_modes()
+                    annotate = self.output_video is not None or 'server' in render_modes
+                    pending.append((index, position_s, frame, render_modes, self._submit(frame, annotate)))
+
+                if not pending:
+                    if end_of_video:
+                        state = 'failed' if self.prefetcher.error else 'completed'
+                        self.error = self.prefetcher.error
+                        break
+                    continue
+                self._handle_frame(*pending.popleft())
+        except Exception as e:
+            if self.is_active:
+                state = 'failed'
+                self.error = str(e)
+                print(f"Error in replay {self.camera_id}: {e}")
+        finally:
+            self._finish(state)
+
+    def _handle_frame(self, index: int, position_s: float, frame, render_modes: set, future):
+        try:
+            analysis, _ = future.result(timeout=INFERENCE_TIMEOUT)
+        except Exception as e:
+            # One failed frame doesn't end the replay, it is recorded and skipped
+            self.frames_failed += 1
+            self._write({'type': 'error', 'frame': index, 'time_s': round(position_s, 3),
+                         'error': str(e) or type(e).__name__})
+            return
+
+        result = self.handle_analysis(analysis, self.student_id)
+        self.position_s = position_s
+        self.frames_skipped = self.prefetcher.frames_read - self.prefetcher.frames_decoded
+        self._write({
+            'type': 'frame',
+            'frame': index,
+            'time_s': round(position_s, 3),
+            'detections': result['detections'],
+            'compliance': result['compliance'],
+            'tracks': result['tracks'],
+            'violations': result['violations']
+        })
+        if self.output_video is not None:
+            self._write_video(result['annotated_frame'])
+        self._published_seq += 1
+        self._publish(self._published_seq, frame, result, render_modes)
+
+    def _write(self, record: Dict):
+        if self._timeline is not None:
+            self._timeline.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+    def _write_video(self, image):
+        if self._writer is None:
+            extension = os.path.splitext(self.output_video)[1].lower()
+            fourcc = cv2.VideoWriter_fourcc(*VIDEO_CODECS.get(extension, 'mp4v'))
+            height, width = image.shape[:2]
+            self._writer = cv2.VideoWriter(self.output_video, fourcc,
+                                           max(1.0, self.prefetcher.fps / self.stride), (width, height))
+            if not self._writer.isOpened():
+                raise RuntimeError(f"Could not write video {self.output_video}")
+        self._writer.write(image)
+
+    def _finish(self, state: str):
+        self.prefetcher.stop()
+        if self.frame_ring is not None:
+            # Freed once the last published frame is released
+            self.frame_ring.retire()
+        self.state = state
+        self.finished_at = time.time()
+        if self._timeline is not None:
+            self._write({'type': 'summary', **self.progress()})
+            self._timeline.close()
+            self._timeline = None
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+        self.is_active = False
+        self.broadcaster.close()
+        self._done.set()
+        progress = self.progress()
+        print(f"Replay {self.camera_id} {state}: {progress['frames_processed']} frame(s) in "
+              f"{progress['elapsed_s']} s ({progress['realtime_factor']}x real time)")
+
+    def progress(self) -> Dict:
+        """How far the replay has got and how fast it is going"""
+        prefetcher = self.prefetcher
+        elapsed = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0
+        total_frames = prefetcher.total_frames if prefetcher is not None else None
+        return {
+            'state': self.state,
+            'error': self.error,
+            'frames_read': prefetcher.frames_read if prefetcher is not None else 0,
+            'total_frames': total_frames,
+            'frames_processed': self.frames_processed,
+            'frames_failed': self.frames_failed,
+            'buffered': prefetcher.buffered() if prefetcher is not None else 0,
+            'position_s': round(self.position_s, 3),
+            'duration_s': round(total_frames / prefetcher.fps, 3) if total_frames else None,
+            'violations': self.violation_count,
+            'elapsed_s': round(elapsed, 2),
+            'frames_per_s': round(self.frames_processed / elapsed, 2) if elapsed else 0,
+            'realtime_factor': round(self.position_s / elapsed, 2) if elapsed else 0,
+            'stride': self.stride,
+            'speed': 'max' if self.max_speed else self.speed,
+            'timeline': self.timeline_path,
+            'output_video': self.output_video
+        }
+
+    def status(self) -> Dict:
+        return {**super().status(), 'replay': self.progress()}
@@ -0,0 +1,70 @@
+"""Run dress code detection over a recorded video without going through the web server
+
+Usage:
+    python replay_video.py gate_cam.mp4 --timeline gate_cam.ndjson --max-speed
+    python replay_video.py gate_cam.mp4 --timeline gate_cam.ndjson --stride 5 --output-video annotated.mp4
+    python replay_video.py rtsp://camera/stream --timeline stream.ndjson --speed 1
+
+The timeline has one NDJSON record per processed frame with its detections,
+compliance, tracks and confirmed violations, and a summary at the end.
+"""
+import argparse
+import json
+import sys
+from config import CAMERA_DEFAULT_LOCATION, CAMERA_TWO_STAGE, REPLAY_PREFETCH, REPLAY_MAX_IN_FLIGHT
+from batching import BatchScheduler
+from inference import InferenceExecutor
+from replay import ReplayCamera
+from roi import PEOPLE
+
+# Seconds between progress lines
+PROGRESS_INTERVAL = 5
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check a recorded video for dress code compliance")
+    parser.add_argument('source', help="Video file or stream URL")
+    parser.add_argument('--timeline', required=True, help="NDJSON timeline file")
+    parser.add_argument('--output-video', help="Write an annotated copy of the processed frames here")
+    parser.add_argument('--stride', type=int, default=1, help="Process every Nth frame")
+    parser.add_argument('--speed', type=float, default=1.0, help="Playback rate relative to the recording")
+    parser.add_argument('--max-speed', action='store_true', help="Process frames as fast as inference allows")
+    parser.add_argument('--location', default=CAMERA_DEFAULT_LOCATION, help="Location used to pick dress code rules")
+    parser.add_argument('--prefetch', type=int, default=REPLAY_PREFETCH, help="Decoded frames buffered ahead")
+    parser.add_argument('--in-flight', type=int, default=REPLAY_MAX_IN_FLIGHT,
+                        help="Frames waiting on inference at once with --max-speed")
+    parser.add_argument('--two-stage', action='store_true', default=CAMERA_TWO_STAGE,
+                        help="Find people on a downscaled frame, then detect on full-resolution crops")
+    args = parser.parse_args()
+    if args.stride < 1 or args.speed <= 0:
+        parser.error("--stride must be at least 1 and --speed above 0")
+
+    executor = InferenceExecutor()
+    scheduler = BatchScheduler(executor)
+    scheduler.start()
+    executor.warmup()
+
+    replay = ReplayCamera(
+        'replay', args.source, scheduler, log_violation=None, location=args.location,
+        stride=args.stride, speed=args.speed, max_speed=args.max_speed,
+        timeline_path=args.timeline, output_video=args.output_video,
+        prefetch=args.prefetch, max_in_flight=args.in_flight, roi=PEOPLE if args.two_stage else None
+    )
+    try:
+        if not replay.start():
+            sys.exit(f"Could not open {args.source}")
+        while not replay.wait(PROGRESS_INTERVAL):
+            progress = replay.progress()
+            print(f"{progress['position_s']} s of {progress['duration_s'] or '?'} s, "
+                  f"{progress['frames_per_s']} frames/s, {progress['realtime_factor']}x real time",
+                  file=sys.stderr)
+        print(json.dumps(replay.progress()), file=sys.stderr)
+    except KeyboardInterrupt:
+        print("Stopping replay", file=sys.stderr)
+    finally:
+        replay.stop()
+        scheduler.shutdown()
+
+
+if __name__ == "__main__":
+    main()
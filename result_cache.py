@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from config import (
+    CONFIDENCE_THRESHOLD, RESULT_CACHE_ENABLED, RESULT_CACHE_TTL, RESULT_CACHE_MAX_BYTES,
+    RESULT_CACHE_SPILL_DIR, RESULT_CACHE_DISK_MAX_BYTES
+)
+from backends import model_version
+
+# Keys remembered as analyzed, independent of whether their results still fit in the cache
+MAX_ANALYZED_KEYS = 65536
+
+
+def _file_size(path: str) -> int:
+    """Size of a spill file, 0 if it was removed meanwhile"""
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+def _remove(path: str) -> bool:
+    """Delete a spill file, returning False if it was already gone"""
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+def _entry_size(value: Dict) -> int:
+    """Rough memory footprint of a cached analysis, dominated by the annotated image"""
+    return len(value.get('image') or '') + 200 * len(value['detections']) + 512
+
+
+class ResultCache:
+    """LRU cache of /detect results keyed by a hash of the uploaded bytes
+
+    The key also covers the model version and CONFIDENCE_THRESHOLD, so a new
+    model or threshold never serves stale results. Entries expire after ttl
+    seconds and the least recently used ones are evicted once the cache holds
+    more than max_bytes. With a spill_dir, evicted entries move to disk
+    (bounded by disk_max_bytes) instead of being dropped. Separately, every
+    key put in the last ttl seconds is remembered as analyzed, even once its
+    result is evicted or if it was too big to keep, so a re-submitted image
+    is never logged twice.
+    """
+
+    def __init__(self, max_bytes: int = RESULT_CACHE_MAX_BYTES, ttl: float = RESULT_CACHE_TTL,
+                 spill_dir: str = RESULT_CACHE_SPILL_DIR, disk_max_bytes: int = RESULT_CACHE_DISK_MAX_BYTES,
+                 enabled: bool = RESULT_CACHE_ENABLED):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.spill_dir = spill_dir or None
+        self.disk_max_bytes = disk_max_bytes
+        self.enabled = enabled
+        self._version = f"{model_version()}:{CONFIDENCE_THRESHOLD}".encode()
+        self._entries = OrderedDict()
+        self._analyzed = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._disk_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self.spilled = 0
+
+        if self.enabled and self.spill_dir:
+            self.use_spill_dir(self.spill_dir)
+
+    def use_spill_dir(self, spill_dir: str):
+        """Spill to another directory, e.g. one per server worker so workers never share spill files"""
+        os.makedirs(spill_dir, exist_ok=True)
+        with self._disk_lock:
+            self.spill_dir = spill_dir
+            self._disk_bytes = sum(_file_size(entry.path) for entry in os.scandir(spill_dir))
+
+    def key(self, contents: bytes) -> str:
+        """Hash the upload bytes together with the model version and threshold"""
+        digest = hashlib.blake2b(contents, digest_size=16)
+        digest.update(self._version)
+        return digest.hexdigest()
+
+    def lookup(self, contents: bytes, need_image: bool = False) -> Tuple[str, Optional[Dict]]:
+        """Hash an upload and return (key, cached analysis or None)"""
+        key = self.key(contents)
+        return key, self.get(key, need_image)
+
+    def get(self, key: str, need_image: bool = False) -> Optional[Dict]:
+        """Return the cached analysis, or None when it is missing, expired or lacks the annotated image"""
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, size, value = entry
+                if expires_at <= now:
+                    del self._entries[key]
+                    self._bytes -= size
+                    self.expired += 1
+                elif need_image and 'image' not in value:
+                    self.misses += 1
+                    return None
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+
+        spilled = self._load_spilled(key, now) if self.spill_dir else None
+        if spilled is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        # Bring it back into memory, it is likely to be asked for again, even
+        # if this request needs the annotated image the entry doesn't have
+        expires_at, value = spilled
+        self.put(key, value, expires_at)
+        with self._lock:
+            if need_image and 'image' not in value:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        return value
+
+    def analyzed(self, key: str) -> bool:
+        """Whether this key was analyzed within the last ttl seconds, whatever the cache still holds"""
+        if not self.enabled:
+            return False
+        with self._lock:
+            expires_at = self._analyzed.get(key)
+            return expires_at is not None and expires_at > time.time()
+
+    def put(self, key: str, value: Dict, expires_at: Optional[float] = None):
+        """Store an analysis, evicting least recently used entries past max_bytes"""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            if key not in self._analyzed:
+                self._analyzed[key] = expires_at or time.time() + self.ttl
+                while len(self._analyzed) > MAX_ANALYZED_KEYS:
+                    self._analyzed.popitem(last=False)
+        size = _entry_size(value)
+        if size > self.max_bytes:
+            return
+
+        evicted = []
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (expires_at or time.time() + self.ttl, size, value)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                evicted_key, (expires_at, evicted_size, evicted_value) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+                evicted.append((evicted_key, expires_at, evicted_value))
+
+        if self.spill_dir:
+            for evicted_key, expires_at, evicted_value in evicted:
+                self._spill(evicted_key, expires_at, evicted_value)
+
+    def _spill_path(self, key: str) -> str:
+        return os.path.join(self.spill_dir, f"{key}.json")
+
+    def _spill(self, key: str, expires_at: float, value: Dict):
+        if expires_at <= time.time():
+            return
+        data = json.dumps({'expires_at': expires_at, 'value': value}).encode('utf-8')
+        with self._disk_lock:
+            path = self._spill_path(key)
+            self._disk_bytes -= _file_size(path)
+            with open(path, 'wb') as spill_file:
+                spill_file.write(data)
+            self._disk_bytes += len(data)
+            self.spilled += 1
+            if self._disk_bytes > self.disk_max_bytes:
+                self._trim_disk()
+
+    def _trim_disk(self):
+        """Delete the oldest spilled entries until the spill directory fits its cap"""
+        entries = []
+        for entry in os.scandir(self.spill_dir):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        for _, size, path in sorted(entries):
+            if self._disk_bytes <= self.disk_max_bytes * 0.9:
+                break
+            if _remove(path):
+                self._disk_bytes -= size
+
+    def _load_spilled(self, key: str, now: float) -> Optional[Tuple[float, Dict]]:
+        path = self._spill_path(key)
+        with self._disk_lock:
+            try:
+                with open(path, 'rb') as spill_file:
+                    data = spill_file.read()
+            except FileNotFoundError:
+                return None
+            # Whatever we read, it is either moving back to memory or expired
+            if _remove(path):
+                self._disk_bytes -= len(data)
+
+        try:
+            entry = json.loads(data)
+        except json.JSONDecodeError:
+            return None
+        if entry['expires_at'] <= now:
+            with self._lock:
+                self.expired += 1
+            return None
+        return entry['expires_at'], entry['value']
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0,
+                'evictions': self.evictions,
+                'expired': self.expired,
+                'spilled': self.spilled,
+                'disk_bytes': self._disk_bytes if self.spill_dir else None
+            }
@@ -0,0 +1,194 @@
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+import cv2
+import numpy as np
+from config import MODEL_IMGSZ, ROI_DETECT_IMGSZ, ROI_DETECT_CONFIDENCE, ROI_CROP_IMGSZ, ROI_MARGIN
+from detection import build_analysis, letterbox_pixels, letterbox_shape
+from frame_ring import attach_frames
+from postprocess import Boxes, extract_boxes, build_detections
+from tracking import group_people, iou_matrix
+
+# roi setting that searches each frame for people instead of using fixed regions
+PEOPLE = 'people'
+
+# Height to width of person crops. Crops of one shape share a letterboxed batch without square padding
+PERSON_CROP_ASPECT = 2.0
+
+# Smallest crop width in pixels, so a stray tiny box still gives a usable crop
+MIN_CROP_WIDTH = 32
+
+# Overlap above which the same item found in two neighbouring crops is kept once
+CROP_NMS_IOU = 0.5
+
+Window = Tuple[int, int, int, int]
+
+
+def validate_roi(roi) -> Optional[object]:
+    """Check a camera's roi setting: None, PEOPLE or a list of polygons of at least 3 [x, y] points
+
+    Raises ValueError for anything else.
+    """
+    if roi is None or roi == PEOPLE:
+        return roi
+    if not isinstance(roi, (list, tuple)) or not roi:
+        raise ValueError(f"roi must be '{PEOPLE}' or a list of polygons")
+    polygons = []
+    for polygon in roi:
+        try:
+            points = [[int(x), int(y)] for x, y in polygon]
+        except (TypeError, ValueError):
+            raise ValueError("ROI polygon points must be [x, y] pairs") from None
+        if len(points) < 3:
+            raise ValueError("Each ROI polygon needs at least 3 points")
+        polygons.append(points)
+    return polygons
+
+def _fit_window(cx: float, cy: float, box_w: float, box_h: float, width: int, height: int) -> Window:
+    """A box_w x box_h window centred on (cx, cy), shifted to lie inside the frame"""
+    box_w = min(box_w, width)
+    box_h = min(box_h, height)
+    x1 = int(round(min(max(cx - box_w / 2, 0), width - box_w)))
+    y1 = int(round(min(max(cy - box_h / 2, 0), height - box_h)))
+    return x1, y1, min(width, x1 + int(round(box_w))), min(height, y1 + int(round(box_h)))
+
+def person_windows(detections: List[Dict], width: int, height: int, margin: float = ROI_MARGIN) -> List[Window]:
+    """Crop windows around the people found in a frame
+
+    Items are grouped into people the same way the tracker does it. Each
+    person box is grown by margin on every side, then its short side is
+    grown to PERSON_CROP_ASPECT so every crop has the same shape.
+    """
+    windows = []
+    for person in group_people(detections):
+        x1, y1, x2, y2 = person['bbox']
+        box_w = max((x2 - x1) * (1 + 2 * margin), MIN_CROP_WIDTH)
+        box_h = (y2 - y1) * (1 + 2 * margin)
+        box_h = max(box_h, box_w * PERSON_CROP_ASPECT)
+        box_w = max(box_w, box_h / PERSON_CROP_ASPECT)
+        windows.append(_fit_window((x1 + x2) / 2, (y1 + y2) / 2, box_w, box_h, width, height))
+    return windows
+
+def polygon_windows(polygons: Sequence, width: int, height: int) -> List[Window]:
+    """Bounding windows of static ROI polygons, clipped to the frame"""
+    windows = []
+    for polygon in polygons:
+        x, y, w, h = cv2.boundingRect(np.asarray(polygon, dtype=np.int32))
+        x1, y1 = max(0, x), max(0, y)
+        x2, y2 = min(width, x + w), min(height, y + h)
+        if x2 > x1 and y2 > y1:
+            windows.append((x1, y1, x2, y2))
+    return windows
+
+def _inside_polygons(xyxy: np.ndarray, polygons: Sequence) -> np.ndarray:
+    """Which boxes have their centre inside any of the polygons"""
+    centers = ((xyxy[:, 0:2] + xyxy[:, 2:4]) / 2).tolist()
+    contours = [np.asarray(polygon, dtype=np.float32) for polygon in polygons]
+    return np.array([
+        any(cv2.pointPolygonTest(contour, (float(cx), float(cy)), False) >= 0 for contour in contours)
+        for cx, cy in centers
+    ], dtype=bool)
+
+def merge_boxes(parts: List[Tuple[np.ndarray, np.ndarray, np.ndarray]], iou: float = CROP_NMS_IOU) -> Boxes:
+    """Combine boxes from overlapping crops, keeping the most confident of each duplicate"""
+    if not parts:
+        return Boxes(np.zeros((0, 4), dtype=np.int32), np.zeros(0), np.zeros(0, dtype=np.int32))
+    xyxy = np.concatenate([part[0] for part in parts])
+    conf = np.concatenate([part[1] for part in parts])
+    cls = np.concatenate([part[2] for part in parts])
+    if len(parts) > 1 and len(conf) > 1:
+        overlaps = iou_matrix(xyxy.astype(np.float32), xyxy.astype(np.float32))
+        suppressed = np.zeros(len(conf), dtype=bool)
+        keep = []
+        for index in np.argsort(-conf, kind='stable'):
+            if suppressed[index]:
+                continue
+            keep.append(index)
+            suppressed |= (overlaps[index] > iou) & (cls == cls[index])
+        keep = np.sort(keep)
+        xyxy, conf, cls = xyxy[keep], conf[keep], cls[keep]
+    return Boxes(xyxy, conf, cls)
+
+
+def analyze_roi_batch(model, items: List) -> List[Dict]:
+    """Two-stage analyze_batch for high-resolution cameras
+
+    Each item is (image, output, roi). With roi PEOPLE, stage one runs the
+    model on a copy of the frame letterboxed to ROI_DETECT_IMGSZ and groups
+    what it finds into people, which is enough to tell where people stand
+    even when small items are lost. With a list of polygons the polygons'
+    bounding boxes are used instead, and only detections centred inside a
+    polygon are kept. Stage two runs the model on full-resolution crops of
+    those windows at ROI_CROP_IMGSZ, batched by crop shape, and maps the
+    boxes back to frame coordinates. A frame whose crops would cost more
+    pixels than the frame itself (a crowd), or would be scaled down more
+    than the frame itself (someone filling the view, a large ROI), is run
+    whole at MODEL_IMGSZ instead. Analyses also carry the crop 'regions'.
+    """
+    items = attach_frames(items)
+    inference_ms = 0.0
+    model_pixels = [0] * len(items)
+    windows = [[] for _ in items]
+    polygons = [None if roi == PEOPLE else roi for _, _, roi in items]
+
+    # Stage one: find the people on downscaled frames, in one call
+    search = [index for index, (_, _, roi) in enumerate(items) if roi == PEOPLE]
+    if search:
+        inference_start = time.perf_counter()
+        results = model([items[index][0] for index in search], imgsz=ROI_DETECT_IMGSZ, verbose=False)
+        inference_ms += (time.perf_counter() - inference_start) * 1000
+        for index, result in zip(search, results):
+            height, width = items[index][0].shape[:2]
+            _, found = build_detections(extract_boxes(result, ROI_DETECT_CONFIDENCE))
+            windows[index] = person_windows(found, width, height)
+            model_pixels[index] += letterbox_pixels(height, width, ROI_DETECT_IMGSZ)
+    for index, (image, _, roi) in enumerate(items):
+        if polygons[index] is not None:
+            height, width = image.shape[:2]
+            windows[index] = polygon_windows(roi, width, height)
+
+    # Crop what is cheaper to crop and no coarser than the whole frame, run the rest whole
+    crops = {}
+    whole = []
+    for index, (image, _, _) in enumerate(items):
+        height, width = image.shape[:2]
+        crop_pixels = sum(letterbox_pixels(y2 - y1, x2 - x1, ROI_CROP_IMGSZ) for x1, y1, x2, y2 in windows[index])
+        frame_pixels = letterbox_pixels(height, width, MODEL_IMGSZ)
+        largest_side = max((max(x2 - x1, y2 - y1) for x1, y1, x2, y2 in windows[index]), default=0)
+        coarser = largest_side * MODEL_IMGSZ > max(height, width) * ROI_CROP_IMGSZ
+        if crop_pixels >= frame_pixels or coarser:
+            whole.append(index)
+            windows[index] = [(0, 0, width, height)]
+            model_pixels[index] += frame_pixels
+            continue
+        model_pixels[index] += crop_pixels
+        for x1, y1, x2, y2 in windows[index]:
+            shape = letterbox_shape(y2 - y1, x2 - x1, ROI_CROP_IMGSZ)
+            crops.setdefault(shape, []).append((index, x1, y1, image[y1:y2, x1:x2]))
+
+    # Stage two: one call per crop shape, plus one for the frames run whole
+    found_boxes = [[] for _ in items]
+    calls = [(group, ROI_CROP_IMGSZ) for group in crops.values()]
+    if whole:
+        calls.append(([(index, 0, 0, items[index][0]) for index in whole], MODEL_IMGSZ))
+    for group, imgsz in calls:
+        inference_start = time.perf_counter()
+        results = model([crop for _, _, _, crop in group], imgsz=imgsz, verbose=False)
+        inference_ms += (time.perf_counter() - inference_start) * 1000
+        for (index, x1, y1, _), result in zip(group, results):
+            boxes = extract_boxes(result)
+            if len(boxes):
+                found_boxes[index].append((boxes.xyxy + [x1, y1, x1, y1], boxes.conf, boxes.cls))
+
+    analyses = []
+    for index, (image, output, _) in enumerate(items):
+        postprocess_start = time.perf_counter()
+        boxes = merge_boxes(found_boxes[index])
+        if polygons[index] is not None and len(boxes):
+            inside = _inside_polygons(boxes.xyxy, polygons[index])
+            boxes = Boxes(boxes.xyxy[inside], boxes.conf[inside], boxes.cls[inside])
+        analysis = build_analysis(image, output, boxes, postprocess_start, inference_ms, len(items))
+        analysis['regions'] = [list(window) for window in windows[index]]
+        analysis['model_pixels'] = model_pixels[index]
+        analyses.append(analysis)
+
+    return analyses
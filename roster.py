@@ -0,0 +1,200 @@
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from mysql.connector import Error
+from config import ROSTER_REFRESH_INTERVAL, ROSTER_FULL_RELOAD_INTERVAL, ROSTER_MISS_REFRESH_INTERVAL
+from database import get_db_connection
+
+SELECT_STUDENTS = """
+SELECT student_id, rfid_tag, first_name, last_name, gender, course, year_level, created_at
+FROM students
+"""
+
+
+def normalize_tag(rfid_tag: str) -> str:
+    """Readers differ in case and padding, so tags are compared trimmed and upper-cased"""
+    return rfid_tag.strip().upper()
+
+
+class Student:
+    """One row of the students table"""
+    __slots__ = ('student_id', 'rfid_tag', 'first_name', 'last_name', 'gender', 'course', 'year_level')
+
+    def __init__(self, student_id: int, rfid_tag: str, first_name: str, last_name: str, gender: str,
+                 course: Optional[str] = None, year_level: Optional[int] = None):
+        self.student_id = student_id
+        self.rfid_tag = rfid_tag
+        self.first_name = first_name
+        self.last_name = last_name
+        self.gender = gender
+        self.course = course
+        self.year_level = year_level
+
+    def to_dict(self) -> Dict:
+        return {
+            'student_id': self.student_id,
+            'rfid_tag': self.rfid_tag,
+            'name': f"{self.first_name} {self.last_name}",
+            'gender': self.gender,
+            'course': self.course,
+            'year_level': self.year_level
+        }
+
+
+class Roster:
+    """In-memory index of students by RFID tag and student ID
+
+    Lookups never touch the database. A background thread picks up newly
+    registered students every refresh_interval seconds by querying past the
+    newest (created_at, student_id) seen so far, and reloads everything every
+    full_reload_interval seconds to catch edits and deletions. A lookup miss
+    asks for an early refresh, at most once per miss_refresh_interval, so a
+    student registered moments ago is found on their next scan.
+    """
+
+    def __init__(self, refresh_interval: float = ROSTER_REFRESH_INTERVAL,
+                 full_reload_interval: float = ROSTER_FULL_RELOAD_INTERVAL,
+                 miss_refresh_interval: float = ROSTER_MISS_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.full_reload_interval = full_reload_interval
+        self.miss_refresh_interval = miss_refresh_interval
+        self._by_tag = {}
+        self._by_id = {}
+        self._watermark = None
+        self._last_full_reload = 0.0
+        self._last_miss_refresh = 0.0
+        self._refresh_requested = False
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        self.loaded_at = None
+        self.lookups = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    def start(self):
+        """Load the roster and keep it fresh in the background"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name='roster-refresh', daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def by_rfid(self, rfid_tag: str) -> Optional[Student]:
+        """Look up a student by RFID tag"""
+        student = self._by_tag.get(normalize_tag(rfid_tag))
+        self._count_lookup(student)
+        return student
+
+    def by_id(self, student_id: int) -> Optional[Student]:
+        """Look up a student by ID"""
+        student = self._by_id.get(student_id)
+        self._count_lookup(student)
+        return student
+
+    def _count_lookup(self, student: Optional[Student]):
+        self.lookups += 1
+        if student is None:
+            self.misses += 1
+            self.request_refresh()
+
+    def request_refresh(self):
+        """Wake the refresh thread early, rate limited so bad scans can't hammer the database"""
+        now = time.time()
+        with self._cond:
+            if now - self._last_miss_refresh < self.miss_refresh_interval:
+                return
+            self._last_miss_refresh = now
+            self._refresh_requested = True
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            try:
+                full = time.time() - self._last_full_reload >= self.full_reload_interval
+                self.refresh(full=full)
+            except Error as e:
+                print(f"Error refreshing student roster: {e}")
+
+            with self._cond:
+                if not self._refresh_requested and self._running:
+                    self._cond.wait(self.refresh_interval)
+                self._refresh_requested = False
+                if not self._running:
+                    return
+
+    def refresh(self, full: bool = False) -> int:
+        """Load new students, or everyone with full=True, returning how many rows were read"""
+        connection = get_db_connection()
+        if not connection:
+            return 0
+
+        try:
+            cursor = connection.cursor(dictionary=True)
+            if full or self._watermark is None:
+                cursor.execute(SELECT_STUDENTS)
+            else:
+                created_at, student_id = self._watermark
+                cursor.execute(
+                    SELECT_STUDENTS + "WHERE created_at > %s OR (created_at = %s AND student_id > %s)\n"
+                    "ORDER BY created_at, student_id",
+                    (created_at, created_at, student_id)
+                )
+            rows = cursor.fetchall()
+            cursor.close()
+        finally:
+            connection.close()
+
+        if full or self._watermark is None:
+            self._replace(rows)
+        else:
+            self._merge(rows)
+        self.refreshes += 1
+        self.loaded_at = datetime.now()
+        return len(rows)
+
+    def _replace(self, rows: List[Dict]):
+        by_tag = {}
+        by_id = {}
+        self._index(rows, by_tag, by_id)
+        # Swap whole dicts so lookups never see a half-built index
+        self._by_tag, self._by_id = by_tag, by_id
+        self._last_full_reload = time.time()
+        print(f"Student roster loaded: {len(by_id)} student(s)")
+
+    def _merge(self, rows: List[Dict]):
+        if rows:
+            self._index(rows, self._by_tag, self._by_id)
+            print(f"Student roster updated: {len(rows)} new student(s)")
+
+    def _index(self, rows: List[Dict], by_tag: Dict, by_id: Dict):
+        for row in rows:
+            created_at = row.pop('created_at')
+            student = Student(**row)
+            previous = by_id.get(student.student_id)
+            if previous is not None and by_tag.get(normalize_tag(previous.rfid_tag)) is previous:
+                del by_tag[normalize_tag(previous.rfid_tag)]
+            by_id[student.student_id] = student
+            by_tag[normalize_tag(student.rfid_tag)] = student
+            if created_at is not None and (self._watermark is None or
+                                           (created_at, student.student_id) > self._watermark):
+                self._watermark = (created_at, student.student_id)
+
+    def stats(self) -> Dict:
+        return {
+            'students': len(self._by_id),
+            'loaded_at': self.loaded_at.isoformat() if self.loaded_at else None,
+            'refreshes': self.refreshes,
+            'lookups': self.lookups,
+            'misses': self.misses
+        }
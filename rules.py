@@ -0,0 +1,286 @@
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from mysql.connector import Error
+from config import (
+    CLASS_NAMES, DISPLAY_NAMES, DRESS_CODE_REQUIREMENTS, EQUIVALENT_ITEMS, GENDER_ITEMS,
+    RULES_REFRESH_INTERVAL
+)
+from database import get_db_connection
+
+SELECT_REQUIREMENTS = """
+SELECT gender, item_name, location, day_of_week
+FROM requirements
+ORDER BY requirement_id
+"""
+
+# Label of every class id, and the bit each label sets in a detection mask
+LABEL_BITS = {label: 1 << class_id for class_id, label in CLASS_NAMES.items()}
+
+# Coverage tables have one entry per possible mask, so they are only built for small models
+_MAX_TABLE_CLASSES = 16
+
+
+def _bit_count(mask: int) -> int:
+    return bin(mask).count('1')
+
+def labels_mask(labels: Iterable[str]) -> int:
+    """Bitmask of the classes among labels, one bit per CLASS_NAMES id"""
+    mask = 0
+    for label in labels:
+        mask |= LABEL_BITS.get(label, 0)
+    return mask
+
+def resolve_item(item_name: str) -> Optional[str]:
+    """Map a requirement's item name to a class label
+
+    Accepts the label itself ('polo_shirt'), a spaced version ('Polo Shirt')
+    or a display name ('Black Pants').
+    """
+    name = item_name.strip()
+    if name in LABEL_BITS:
+        return name
+    normalized = name.lower().replace(' ', '_')
+    if normalized in LABEL_BITS:
+        return normalized
+    for label in LABEL_BITS:
+        if DISPLAY_NAMES.get(label, '').lower() == name.lower():
+            return label
+    return None
+
+
+class CompiledRules:
+    """Requirements for one gender, compiled to bitmasks over class ids
+
+    required is the mask of required classes. Equivalent items (doll_shoes
+    for shoes) are folded in up front: covered[mask] is the detection mask
+    plus the bits of every requirement it satisfies through an equivalent,
+    so the check itself is required & ~covered[mask].
+    """
+
+    def __init__(self, gender: str, required_items: List[str], equivalents: Dict[str, List[str]]):
+        self.gender = gender
+        self.required_items = list(dict.fromkeys(required_items))
+        self.required = labels_mask(self.required_items)
+        self._equivalents = [
+            (LABEL_BITS[item], labels_mask(alternatives))
+            for item, alternatives in equivalents.items()
+            if item in LABEL_BITS and LABEL_BITS[item] & self.required
+        ]
+        self._covered = None
+        if max(CLASS_NAMES) < _MAX_TABLE_CLASSES:
+            self._covered = [self._cover(mask) for mask in range(1 << (max(CLASS_NAMES) + 1))]
+        self._missing_names = {}
+
+    def _cover(self, mask: int) -> int:
+        for item_bit, alternatives in self._equivalents:
+            if mask & alternatives:
+                mask |= item_bit
+        return mask
+
+    def missing_mask(self, mask: int) -> int:
+        covered = self._covered[mask] if self._covered is not None else self._cover(mask)
+        return self.required & ~covered
+
+    def missing_items(self, mask: int) -> List[str]:
+        """Display names of the required items missing from a detection mask, in requirement order"""
+        missing = self.missing_mask(mask)
+        names = self._missing_names.get(missing)
+        if names is None:
+            names = self._missing_names[missing] = [
+                DISPLAY_NAMES.get(item, item) for item in self.required_items if LABEL_BITS[item] & missing
+            ]
+        return list(names)
+
+    def to_dict(self) -> Dict:
+        return {'gender': self.gender, 'required_items': self.required_items}
+
+
+class RuleSet:
+    """Compiled rules for every gender, plus the masks used to guess a gender"""
+
+    def __init__(self, requirements: Dict[str, List[str]], equivalents: Dict[str, Dict[str, List[str]]],
+                 gender_items: Dict[str, List[str]]):
+        self.rules = {
+            gender: CompiledRules(gender, items, equivalents.get(gender, {}))
+            for gender, items in requirements.items()
+        }
+        self.gender_masks = {gender: labels_mask(items) for gender, items in gender_items.items()}
+
+    def guess_gender(self, mask: int) -> str:
+        """The gender whose typical items were detected most, Male when unclear"""
+        female = _bit_count(mask & self.gender_masks.get('Female', 0))
+        male = _bit_count(mask & self.gender_masks.get('Male', 0))
+        return 'Female' if female > male else 'Male'
+
+
+class RuleEngine:
+    """Dress code rules loaded from the requirements table, falling back to config.py
+
+    Each requirements row applies to a gender and optionally to one location
+    and/or one day of the week (1 = Monday ... 7 = Sunday, e.g. PE uniform
+    days). For a check at a given place and time, each gender uses the most
+    specific scope that has rows for it: location and day, then location,
+    then day, then the rows with neither. A background thread re-reads the
+    table every refresh_interval seconds and recompiles only when it changed,
+    so edits apply without a restart.
+    """
+
+    def __init__(self, refresh_interval: float = RULES_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.source = 'config'
+        self.loaded_at = None
+        self.reloads = 0
+        self._fingerprint = None
+        self._scopes = {}
+        self._resolved = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._compile(None, [])
+
+    def start(self):
+        """Load the rules from the database and watch them for changes"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name='rules-refresh', daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            self.reload()
+            with self._cond:
+                if self._running:
+                    self._cond.wait(self.refresh_interval)
+                if not self._running:
+                    return
+
+    def reload(self) -> bool:
+        """Re-read the requirements table, returning True if the rules changed
+
+        Keeps the current rules when the database is unavailable.
+        """
+        connection = get_db_connection()
+        if not connection:
+            return False
+        try:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(SELECT_REQUIREMENTS)
+            rows = cursor.fetchall()
+            cursor.close()
+        except Error as e:
+            print(f"Error loading dress code rules: {e}")
+            return False
+        finally:
+            connection.close()
+
+        fingerprint = tuple(
+            (row['gender'], row['item_name'], row['location'], row['day_of_week']) for row in rows
+        )
+        if fingerprint == self._fingerprint:
+            return False
+        self._compile(fingerprint, rows)
+        self.reloads += 1
+        print(f"Dress code rules loaded from {self.source}: {len(rows)} requirement(s), "
+              f"{len(self._scopes)} scope(s)")
+        return True
+
+    def _compile(self, fingerprint: Optional[Tuple], rows: List[Dict]):
+        scoped = {}
+        for row in rows:
+            label = resolve_item(row['item_name'])
+            if label is None:
+                print(f"Skipping requirement {row['item_name']!r}: not a class the model detects")
+                continue
+            scope = (row['location'] or None, row['day_of_week'] or None)
+            scoped.setdefault(scope, {}).setdefault(row['gender'], []).append(label)
+
+        source = 'database' if scoped else 'config'
+        # config.py fills in any gender the table has no everyday rows for
+        defaults = scoped.setdefault((None, None), {})
+        for gender, items in DRESS_CODE_REQUIREMENTS.items():
+            defaults.setdefault(gender, list(items))
+
+        scopes = {
+            scope: RuleSet(requirements, EQUIVALENT_ITEMS, GENDER_ITEMS)
+            for scope, requirements in scoped.items()
+        }
+        # Swap everything at once so a check never mixes old and new rules
+        self._scopes, self._resolved = scopes, {}
+        self._fingerprint = fingerprint
+        self.source = source
+        self.loaded_at = datetime.now()
+
+    def _rules_for(self, gender: str, location: Optional[str], weekday: Optional[int]) -> CompiledRules:
+        key = (gender, location, weekday)
+        resolved = self._resolved
+        rules = resolved.get(key)
+        if rules is None:
+            scopes = self._scopes
+            for scope in ((location, weekday), (location, None), (None, weekday), (None, None)):
+                rule_set = scopes.get(scope)
+                if rule_set is not None and gender in rule_set.rules:
+                    rules = rule_set.rules[gender]
+                    break
+            resolved[key] = rules
+        return rules
+
+    def evaluate(self, detected_items: List[str], gender: Optional[str] = None, location: Optional[str] = None,
+                 when: Optional[datetime] = None, mask: Optional[int] = None) -> Dict:
+        """Check dress code compliance for the detected class labels
+
+        gender is guessed from the items when not given. mask can be passed
+        when the caller already has the detection bitmask.
+        """
+        if mask is None:
+            mask = labels_mask(detected_items)
+        if gender is None:
+            gender = self._scopes[(None, None)].guess_gender(mask)
+        weekday = (when or datetime.now()).isoweekday()
+        rules = self._rules_for(gender, location, weekday)
+        missing_items = rules.missing_items(mask)
+        return {
+            'is_compliant': not missing_items,
+            'missing_items': missing_items,
+            'detected_items': [DISPLAY_NAMES.get(item, item) for item in detected_items],
+            'gender': gender
+        }
+
+    def guess_gender(self, detected_items: List[str]) -> str:
+        return self._scopes[(None, None)].guess_gender(labels_mask(detected_items))
+
+    def describe(self) -> Dict:
+        """The active rules, for inspection"""
+        return {
+            'source': self.source,
+            'loaded_at': self.loaded_at.isoformat() if self.loaded_at else None,
+            'scopes': [
+                {
+                    'location': location,
+                    'day_of_week': day_of_week,
+                    'rules': [rules.to_dict() for rules in rule_set.rules.values()]
+                }
+                for (location, day_of_week), rule_set in self._scopes.items()
+            ]
+        }
+
+    def stats(self) -> Dict:
+        return {
+            'source': self.source,
+            'loaded_at': self.loaded_at.isoformat() if self.loaded_at else None,
+            'scopes': len(self._scopes),
+            'reloads': self.reloads
+        }
+
+
+rule_engine = RuleEngine()
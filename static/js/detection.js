@@ -10,6 +10,11 @@ class DressCodeDetector {
         this.liveWebSocket = null;
         this.liveDetectionActive = false;
         this.violationCount = 0;
+        this.pendingFrameMeta = null;
+        this.liveFrameUrl = null;
+        this.liveStreamFps = null;
+        this.liveStatusMessage = '';
+        this.liveStatusType = 'info';
         this.init();
     }
 
@@ -271,7 +276,8 @@ class DressCodeDetector {
                 formData.append('student_id', studentId);
             }
 
-            const response = await fetch(CONFIG.DETECTION_ENDPOINT, {
+            const render = CONFIG.CLIENT_RENDER ? 'client' : 'server';
+            const response = await fetch(`${CONFIG.DETECTION_ENDPOINT}?render=${render}`, {
                 method: 'POST',
                 body: formData
             });
@@ -287,6 +293,10 @@ class DressCodeDetector {
             }
 
             const result = await response.json();
+            if (!result.image) {
+                // Client rendering: show the local preview and draw the boxes over it
+                result.image = document.getElementById('previewImg')?.src;
+            }
             this.displayResults(result);
 
         } catch (error) {
@@ -321,9 +331,15 @@ class DressCodeDetector {
 
     connectWebSocket() {
         const studentId = document.getElementById('studentId')?.value;
-        const wsUrl = `${CONFIG.WEBSOCKET_URL}${studentId ? `?student_id=${studentId}` : ''}`;
+        const params = new URLSearchParams({ render: CONFIG.CLIENT_RENDER ? 'client' : 'server' });
+        if (studentId) params.set('student_id', studentId);
+        const wsUrl = `${CONFIG.WEBSOCKET_URL}?${params}`;
         
-        this.liveWebSocket = new WebSocket(wsUrl);
+        // Ask for binary frames; without the subprotocol the server sends base64 JSON
+        this.liveWebSocket = new WebSocket(wsUrl, [CONFIG.WEBSOCKET_SUBPROTOCOL]);
+        this.liveWebSocket.binaryType = 'arraybuffer';
+        this.pendingFrameMeta = null;
+        this.liveStreamFps = null;
 
         this.liveWebSocket.onopen = () => {
             console.log('WebSocket connected');
@@ -331,9 +347,19 @@ class DressCodeDetector {
         };
 
         this.liveWebSocket.onmessage = (event) => {
+            if (event.data instanceof ArrayBuffer) {
+                this.handleBinaryFrame(event.data);
+                return;
+            }
+
             const data = JSON.parse(event.data);
             if (data.type === 'detection') {
-                this.handleLiveDetection(data);
+                if (data.seq !== undefined && !data.image) {
+                    // Binary protocol: the image follows in a binary message with the same seq
+                    this.pendingFrameMeta = data;
+                } else {
+                    this.handleLiveDetection(data);
+                }
             }
         };
 
@@ -360,18 +386,40 @@ class DressCodeDetector {
         };
     }
 
+    handleBinaryFrame(buffer) {
+        // First 4 bytes are the big-endian frame sequence number, the rest is the image
+        const seq = new DataView(buffer).getUint32(0);
+        const meta = this.pendingFrameMeta;
+        if (!meta || meta.seq !== seq) return;
+        this.pendingFrameMeta = null;
+
+        const blob = new Blob([new Uint8Array(buffer, 4)], { type: `image/${meta.format}` });
+        if (this.liveFrameUrl) URL.revokeObjectURL(this.liveFrameUrl);
+        this.liveFrameUrl = URL.createObjectURL(blob);
+
+        this.handleLiveDetection({ ...meta, image: this.liveFrameUrl });
+    }
+
     handleLiveDetection(data) {
-        // Update live video feed
+        // Update live video feed, acking the frame once it is shown so the server paces to this browser
         const liveFeed = document.getElementById('liveVideoFeed');
         if (liveFeed) {
+            liveFeed.onload = () => this.ackLiveFrame(data.seq);
             liveFeed.src = data.image;
             liveFeed.style.display = 'block';
+            this.renderOverlay(liveFeed, document.getElementById('liveOverlay'), data);
+        }
+        if (data.stream) {
+            this.liveStreamFps = data.stream.fps;
+            this.updateLiveStatus(this.liveStatusMessage, this.liveStatusType);
         }
 
         // Update detection results in real-time
         this.displayResults({
             success: true,
             image: data.image,
+            render: data.render,
+            frame: data.frame,
             detections: data.detections,
             compliance: data.compliance,
             message: data.compliance.is_compliant ? 'Compliant' : `Violation: Missing ${data.compliance.missing_items.join(', ')}`,
@@ -386,6 +434,12 @@ class DressCodeDetector {
         }
     }
 
+    ackLiveFrame(seq) {
+        if (seq !== undefined && this.liveWebSocket && this.liveWebSocket.readyState === WebSocket.OPEN) {
+            this.liveWebSocket.send(JSON.stringify({ type: 'ack', seq }));
+        }
+    }
+
     handleViolationAlert(compliance) {
         this.violationCount++;
         
@@ -419,6 +473,10 @@ class DressCodeDetector {
             this.liveWebSocket.close();
             this.liveWebSocket = null;
         }
+        if (this.liveFrameUrl) {
+            URL.revokeObjectURL(this.liveFrameUrl);
+            this.liveFrameUrl = null;
+        }
 
         // Stop camera on backend
         try {
@@ -452,6 +510,7 @@ class DressCodeDetector {
             if (stopBtn) stopBtn.style.display = 'none';
             if (liveFeed) liveFeed.style.display = 'none';
             if (placeholder) placeholder.style.display = 'block';
+            this.clearOverlay(document.getElementById('liveOverlay'));
             if (status) status.style.display = 'none';
             if (mainContainer) mainContainer.classList.remove('live-detection-active');
         }
@@ -460,9 +519,12 @@ class DressCodeDetector {
     updateLiveStatus(message, type = 'info') {
         const statusDiv = document.getElementById('liveStatus');
         const statusText = document.getElementById('liveStatusText');
+        this.liveStatusMessage = message;
+        this.liveStatusType = type;
         
         if (statusDiv && statusText) {
-            statusText.textContent = message;
+            // Frames per second this browser is actually being sent, from the server's stream stats
+            statusText.textContent = this.liveStreamFps !== null ? `${message} (${this.liveStreamFps} FPS)` : message;
             statusDiv.className = `alert alert-${type}`;
         }
     }
@@ -526,9 +588,61 @@ class DressCodeDetector {
         if (resultImage) {
             resultImage.src = result.image;
             resultImage.style.display = 'block';
+            this.renderOverlay(resultImage, document.getElementById('resultOverlay'), result);
         }
     }
 
+    renderOverlay(image, canvas, result) {
+        if (!canvas) return;
+        if (result.render !== 'client') {
+            this.clearOverlay(canvas);
+            return;
+        }
+
+        const draw = () => this.drawDetections(image, canvas, result);
+        if (image.complete && image.naturalWidth) {
+            draw();
+        } else {
+            image.addEventListener('load', draw, { once: true });
+        }
+    }
+
+    drawDetections(image, canvas, result) {
+        // Boxes are in frame pixels, so size the canvas like the frame and let CSS scale it
+        const frame = result.frame || { width: image.naturalWidth, height: image.naturalHeight };
+        canvas.width = frame.width;
+        canvas.height = frame.height;
+        canvas.style.width = `${image.clientWidth}px`;
+        canvas.style.height = `${image.clientHeight}px`;
+        canvas.style.display = 'block';
+
+        const context = canvas.getContext('2d');
+        context.clearRect(0, 0, canvas.width, canvas.height);
+        context.lineWidth = 2;
+        context.font = '14px sans-serif';
+        context.textBaseline = 'bottom';
+
+        (result.detections || []).forEach(detection => {
+            const [x1, y1, x2, y2] = detection.bbox;
+            const label = `${detection.class}: ${detection.confidence.toFixed(2)}`;
+
+            context.strokeStyle = '#00ff00';
+            context.strokeRect(x1, y1, x2 - x1, y2 - y1);
+
+            const labelWidth = context.measureText(label).width;
+            context.fillStyle = '#00ff00';
+            context.fillRect(x1, y1 - 20, labelWidth + 4, 20);
+            context.fillStyle = '#000000';
+            context.fillText(label, x1 + 2, y1 - 4);
+        });
+    }
+
+    clearOverlay(canvas) {
+        if (!canvas) return;
+        canvas.getContext('2d').clearRect(0, 0, canvas.width, canvas.height);
+        canvas.style.display = 'none';
+    }
+
     updateDetectedItems(result) {
         const container = document.getElementById('detectedItems');
         if (!container) return;
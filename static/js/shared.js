@@ -6,6 +6,9 @@
 const CONFIG = {
     API_BASE_URL: '',
     WEBSOCKET_URL: 'ws://localhost:8000/ws/camera',
+    WEBSOCKET_SUBPROTOCOL: 'dress.binary.v1',
+    // Draw detection boxes in the browser instead of downloading annotated images
+    CLIENT_RENDER: true,
     DETECTION_ENDPOINT: '/detect',
     CAMERA_START_ENDPOINT: '/camera/start',
     CAMERA_STOP_ENDPOINT: '/camera/stop',
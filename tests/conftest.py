@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The modules live at the repository root, and the stub backend keeps the tests
+# from needing best.pt or a GPU
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('INFERENCE_BACKEND', 'stub')
+os.environ.setdefault('RESULT_CACHE_SPILL_DIR', '')
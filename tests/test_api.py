@@ -0,0 +1,73 @@
+import time
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+import main
+
+
+@pytest.fixture(scope='module')
+def client():
+    with TestClient(main.app) as client:
+        deadline = time.monotonic() + 30
+        while client.get('/ready').status_code != 200:
+            assert time.monotonic() < deadline, "model never became ready"
+            time.sleep(0.1)
+        yield client
+
+
+@pytest.fixture
+def logged(monkeypatch):
+    logged = []
+    monkeypatch.setattr(main, 'log_violation', lambda *args, **kwargs: logged.append(args))
+    return logged
+
+
+def upload(seed, width=640, height=480):
+    image = np.random.default_rng(seed).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    return {'file': ('photo.jpg', cv2.imencode('.jpg', image)[1].tobytes(), 'image/jpeg')}
+
+
+def detect(client, files, render='server', **data):
+    response = client.post(f'/detect?render={render}', files=files, data=data)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_resubmitted_image_logged_once(client, logged):
+    files = upload(1)
+    responses = [detect(client, files, render) for render in ('client', 'server', 'server', 'client')]
+    assert not responses[0]['compliance']['is_compliant']
+    assert len(logged) == 1
+    assert [response['cached'] for response in responses] == [False, True, True, True]
+    # A result cached without the annotated image is analyzed again to draw it
+    assert [response['timing']['cache_hit'] for response in responses] == [False, False, True, True]
+    assert ['image' in response for response in responses] == [False, True, True, False]
+    assert all(response['detections'] == responses[0]['detections'] for response in responses)
+
+
+def test_reduced_decode_reports_both_sizes(client, logged):
+    response = detect(client, upload(2, width=2600, height=1400))
+    frame = response['frame']
+    assert (frame['width'], frame['height']) == (2600, 1400)
+    assert (frame['image_width'], frame['image_height']) == (650, 350)
+    for detection in response['detections']:
+        x1, y1, x2, y2 = detection['bbox']
+        assert 0 <= x1 <= x2 <= 2600 and 0 <= y1 <= y2 <= 1400
+
+
+def test_client_render_has_no_image(client, logged):
+    response = detect(client, upload(3), render='client')
+    assert 'image' not in response
+    assert 'image_width' not in response['frame']
+    assert (response['frame']['width'], response['frame']['height']) == (640, 480)
+
+
+@pytest.mark.parametrize('files, status', [
+    ({'file': ('notes.txt', b'hello', 'text/plain')}, 400),
+    ({'file': ('empty.jpg', b'', 'image/jpeg')}, 400),
+    ({'file': ('broken.jpg', b'not really a jpeg', 'image/jpeg')}, 400)
+])
+def test_bad_uploads_rejected(client, logged, files, status):
+    assert client.post('/detect', files=files).status_code == status
+    assert logged == []
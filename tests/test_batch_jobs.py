@@ -0,0 +1,110 @@
+import io
+import json
+import zipfile
+from concurrent.futures import Future
+import cv2
+import numpy as np
+import pytest
+from batch_jobs import (
+    MAX_ZIP_RATIO, check_zip_archive, iter_directory_images, iter_zip_images, read_checkpoint, safe_join,
+    score_images
+)
+
+
+def png(value=0):
+    return cv2.imencode('.png', np.full((8, 8, 3), value, dtype=np.uint8))[1].tobytes()
+
+
+def zip_archive(members, compression=zipfile.ZIP_STORED):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    buffer.seek(0)
+    return zipfile.ZipFile(buffer)
+
+
+class FakeScheduler:
+    """Answers every image at once with an analysis without detections"""
+
+    def __init__(self):
+        self.images = 0
+
+    def submit(self, image, output='array', source='upload'):
+        self.images += 1
+        height, width = image.shape[:2]
+        future = Future()
+        future.set_result(({'detections': [], 'class_mask': 0, 'width': width, 'height': height}, {}))
+        return future
+
+
+def test_safe_join_refuses_escapes(tmp_path):
+    assert safe_join(str(tmp_path), 'a/b.jpg') == str(tmp_path / 'a' / 'b.jpg')
+    for name in ('../x.jpg', '/etc/passwd', 'a/../../x.jpg'):
+        with pytest.raises(ValueError):
+            safe_join(str(tmp_path), name)
+
+
+def test_directory_images_in_stable_order(tmp_path):
+    (tmp_path / 'b').mkdir()
+    for name in ('b/2.jpg', 'b/1.PNG', 'a.jpeg', 'notes.txt'):
+        (tmp_path / name).write_bytes(name.encode())
+    images = list(iter_directory_images(str(tmp_path)))
+    assert [name for name, _ in images] == ['a.jpeg', 'b/1.PNG', 'b/2.jpg']
+    assert images[2][1]() == b'b/2.jpg'
+
+
+def test_zip_images_skip_directories_and_other_files():
+    archive = zip_archive({'x/a.jpg': b'a', 'x/readme.md': b'r', 'b.png': b'b'})
+    images = list(iter_zip_images(archive))
+    assert [name for name, _ in images] == ['x/a.jpg', 'b.png']
+    assert images[1][1]() == b'b'
+
+
+def test_zip_member_over_limit_refused():
+    archive = zip_archive({'big.jpg': b'x' * 1000})
+    (_, load), = iter_zip_images(archive, max_bytes=999)
+    with pytest.raises(ValueError):
+        load()
+
+
+def test_zip_bomb_refused_before_inflating():
+    archive = zip_archive({'bomb.bmp': b'\0' * (1024 * 1024)}, zipfile.ZIP_DEFLATED)
+    member = archive.getinfo('bomb.bmp')
+    assert member.file_size > MAX_ZIP_RATIO * member.compress_size
+    (_, load), = iter_zip_images(archive, max_bytes=10 * 1024 * 1024)
+    with pytest.raises(ValueError, match='zip bomb'):
+        load()
+
+
+def test_check_zip_archive_totals_images():
+    archive = zip_archive({'a.jpg': b'x' * 600, 'b.jpg': b'x' * 600, 'c.txt': b'x' * 5000})
+    check_zip_archive(archive, max_bytes=1200)
+    with pytest.raises(ValueError):
+        check_zip_archive(archive, max_bytes=1199)
+
+
+def test_score_images_checkpoints_and_resumes(tmp_path):
+    checkpoint = str(tmp_path / 'job.ndjson')
+    images = [('a.png', png), ('b.png', lambda: b'not an image'), ('c.png', lambda: png(255))]
+    scheduler = FakeScheduler()
+    records = list(score_images(scheduler, images, checkpoint_path=checkpoint, concurrency=2))
+    summary = records.pop()
+    assert sorted(record['name'] for record in records) == ['a.png', 'b.png', 'c.png']
+    assert {record['name']: record['type'] for record in records}['b.png'] == 'error'
+    assert (summary['scored'], summary['failed'], summary['violations']) == (2, 1, 2)
+    assert read_checkpoint(checkpoint) == {'a.png', 'c.png'}
+
+    # A line cut short by a crash doesn't stop the resume
+    with open(checkpoint, 'a') as checkpoint_file:
+        checkpoint_file.write('{"type": "res')
+    records = list(score_images(scheduler, images, checkpoint_path=checkpoint))
+    assert [record['name'] for record in records[:-1]] == ['b.png']
+    assert records[-1]['skipped'] == 2
+    assert scheduler.images == 2
+    with open(checkpoint) as checkpoint_file:
+        lines = checkpoint_file.read().splitlines()
+    # The resumed run starts on a fresh line instead of finishing the cut one
+    assert json.loads(lines[-1])['name'] == 'b.png'
+    result = [json.loads(line) for line in lines[:-2] if '"a.png"' in line][0]
+    assert (result['width'], result['height']) == (8, 8)
@@ -0,0 +1,85 @@
+import threading
+import numpy as np
+import pytest
+from batching import BatchScheduler, _Bucket, _PendingImage
+from inference import InferenceExecutor, InferenceQueueFull
+
+
+def image(seed, height=480, width=640):
+    return np.random.default_rng(seed).integers(0, 255, (height, width, 3), dtype=np.uint8)
+
+
+@pytest.fixture
+def make_scheduler():
+    schedulers = []
+
+    def make(**kwargs):
+        executor = InferenceExecutor(workers=1, mode='thread')
+        executor.warmup()
+        scheduler = BatchScheduler(executor, **kwargs)
+        scheduler.start()
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield make
+    for scheduler in schedulers:
+        scheduler.shutdown()
+
+
+def test_concurrent_images_share_a_batch(make_scheduler):
+    scheduler = make_scheduler(max_batch_size=4, max_wait_ms=500, max_pending=16)
+    futures = [scheduler.submit(image(seed), output='none') for seed in range(4)]
+    results = [future.result(timeout=5) for future in futures]
+    assert [timing['batch_size'] for _, timing in results] == [4] * 4
+    assert scheduler.stats()['batches'] == 1
+
+
+def test_batched_results_match_single_images(make_scheduler):
+    batched = make_scheduler(max_batch_size=4, max_wait_ms=500)
+    single = make_scheduler(max_batch_size=1, max_wait_ms=0)
+    images = [image(seed) for seed in range(4)]
+    batch_results = [future.result(timeout=5)[0] for future in
+                     [batched.submit(frame, output='none') for frame in images]]
+    for frame, analysis in zip(images, batch_results):
+        expected, timing = single.submit(frame, output='none').result(timeout=5)
+        assert timing['batch_size'] == 1
+        assert analysis['detections'] == expected['detections']
+        assert analysis['class_mask'] == expected['class_mask']
+
+
+def test_bucketing_keeps_aspect_ratios_apart(make_scheduler):
+    scheduler = make_scheduler(max_batch_size=4, max_wait_ms=300, bucketing=True)
+    futures = [scheduler.submit(image(0), output='none'), scheduler.submit(image(1, 640, 480), output='none'),
+               scheduler.submit(image(2), output='none')]
+    sizes = [future.result(timeout=5)[1]['batch_size'] for future in futures]
+    assert sizes == [2, 1, 2]
+
+
+def test_full_queue_refused(make_scheduler):
+    scheduler = make_scheduler(max_batch_size=8, max_wait_ms=1000, max_pending=2)
+    scheduler.submit(image(0), output='none')
+    scheduler.submit(image(1), output='none')
+    with pytest.raises(InferenceQueueFull):
+        scheduler.submit(image(2), output='none')
+    assert scheduler.stats()['rejected'] == 1
+
+
+def test_shutdown_fails_waiting_images():
+    executor = InferenceExecutor(workers=1, mode='thread')
+    executor.warmup()
+    scheduler = BatchScheduler(executor, max_batch_size=8, max_wait_ms=10_000)
+    scheduler.start()
+    future = scheduler.submit(image(0), output='none')
+    threading.Timer(0.05, scheduler.shutdown).start()
+    with pytest.raises(RuntimeError):
+        future.result(timeout=5)
+
+
+def test_bucket_takes_sources_in_turn():
+    bucket = _Bucket()
+    for source, count in (('camera-1', 3), ('upload', 1), ('camera-2', 2)):
+        for _ in range(count):
+            bucket.append(source, _PendingImage(None, 'none', source))
+    assert [item.source for item in bucket.take(4)] == ['camera-1', 'upload', 'camera-2', 'camera-1']
+    assert [item.source for item in bucket.take(4)] == ['camera-2', 'camera-1']
+    assert bucket.size == 0
@@ -0,0 +1,59 @@
+import pytest
+from mysql.connector import errors
+import database
+from database import SHARED_POOL, WRITER_POOL, get_db_connection
+
+
+class FakePool:
+    """A pool whose first busy_attempts get_connection calls find every connection lent out"""
+    busy_attempts = 0
+    created = []
+
+    def __init__(self, pool_name, pool_size, **kwargs):
+        self.pool_name = pool_name
+        self.pool_size = pool_size
+        self.attempts = 0
+        FakePool.created.append(self)
+
+    def get_connection(self):
+        self.attempts += 1
+        if self.attempts <= FakePool.busy_attempts:
+            raise errors.PoolError(msg="Failed getting connection; pool exhausted")
+        return f"{self.pool_name} connection"
+
+
+@pytest.fixture(autouse=True)
+def pools(monkeypatch):
+    monkeypatch.setattr(database, '_pools', {})
+    monkeypatch.setattr(database.pooling, 'MySQLConnectionPool', FakePool)
+    monkeypatch.setattr(database, 'POOL_RETRY_INTERVAL', 0.001)
+    monkeypatch.setattr(FakePool, 'busy_attempts', 0)
+    monkeypatch.setattr(FakePool, 'created', [])
+
+
+def test_writer_has_its_own_pool():
+    assert get_db_connection() == f"{SHARED_POOL} connection"
+    assert get_db_connection(WRITER_POOL) == f"{WRITER_POOL} connection"
+    get_db_connection()
+    assert [(pool.pool_name, pool.pool_size) for pool in FakePool.created] == [
+        (SHARED_POOL, database.POOL_SIZES[SHARED_POOL]), (WRITER_POOL, 1)
+    ]
+
+
+def test_busy_pool_waits_for_a_connection():
+    FakePool.busy_attempts = 3
+    assert get_db_connection(timeout=1) == f"{SHARED_POOL} connection"
+    assert FakePool.created[0].attempts == 4
+
+
+def test_busy_pool_gives_up_after_timeout():
+    FakePool.busy_attempts = 10 ** 6
+    assert get_db_connection(timeout=0.02) is None
+
+
+def test_unreachable_database(monkeypatch):
+    def refuse(**kwargs):
+        raise errors.InterfaceError(msg="Can't connect to MySQL server")
+
+    monkeypatch.setattr(database.pooling, 'MySQLConnectionPool', refuse)
+    assert get_db_connection() is None
@@ -0,0 +1,72 @@
+import threading
+import cv2
+import numpy as np
+import pytest
+import camera
+import encoder
+from camera import PublishedFrame
+from encoder import ImageEncoder
+
+
+def frame(seed=0):
+    return np.random.default_rng(seed).integers(0, 255, (120, 160, 3), dtype=np.uint8)
+
+
+def decode(data):
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+
+@pytest.fixture
+def image_encoder(monkeypatch):
+    image_encoder = ImageEncoder(threads=2, backend='opencv')
+    # PublishedFrame encodes on the module's shared encoder
+    monkeypatch.setattr(camera, 'image_encoder', image_encoder)
+    yield image_encoder
+    image_encoder.shutdown()
+
+
+@pytest.mark.parametrize('image_format, magic', [('jpeg', b'\xff\xd8'), ('webp', b'RIFF')])
+def test_encode_formats(image_encoder, image_format, magic):
+    data = image_encoder.encode(frame(), image_format)
+    assert data.startswith(magic)
+    assert decode(data).shape == (120, 160, 3)
+    assert image_encoder.stats()['encodes'] == {image_format: 1}
+
+
+def test_encode_scales_first(image_encoder):
+    assert decode(image_encoder.submit(frame(), scale=0.5).result()).shape == (60, 80, 3)
+    assert image_encoder.stats()['pending'] == 0
+
+
+def test_unknown_format_and_backend_refused(image_encoder):
+    with pytest.raises(ValueError):
+        image_encoder.submit(frame(), 'png')
+    with pytest.raises(ValueError):
+        ImageEncoder(backend='libjpeg')
+
+
+def test_auto_falls_back_to_opencv(monkeypatch):
+    monkeypatch.setattr(encoder, '_load_turbojpeg', lambda: None)
+    image_encoder = ImageEncoder(backend='auto')
+    assert image_encoder.backend == 'opencv'
+    assert decode(image_encoder.encode(frame())).shape == (120, 160, 3)
+
+
+def test_viewers_share_one_encode_per_variant(image_encoder):
+    published = PublishedFrame(1, frame(0), frame(1), [], {}, 'now')
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(published.encoded('jpeg', True, 70)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(results)) == 1
+    assert image_encoder.stats()['encodes'] == {'jpeg': 1}
+    assert image_encoder.stats()['reused'] == 7
+
+    raw = published.encoded('jpeg', False, 70)
+    assert raw != results[0]
+    published.encoded('webp', True, 70, 0.5)
+    assert image_encoder.stats()['encodes'] == {'jpeg': 2, 'webp': 1}
+    assert published.cached('webp', True, 70, 0.5) is not None
@@ -0,0 +1,108 @@
+import gc
+import pickle
+import threading
+import numpy as np
+import pytest
+from frame_ring import FrameRef, FrameRing, StaleFrameError, attach_frame, attach_frames
+
+SHAPE = (4, 6, 3)
+
+
+@pytest.fixture
+def ring():
+    ring = FrameRing(SHAPE, slots=3)
+    yield ring
+    ring.retire()
+
+
+def test_slots_pinned_until_frames_released(ring):
+    frames = [ring.acquire() for _ in range(3)]
+    assert [frame.ref.slot for frame in frames] == [0, 1, 2]
+    assert ring.stats()['in_use'] == 3
+    assert ring.acquire() is None
+    assert ring.stats()['drops'] == 1
+
+    del frames[1]
+    gc.collect()
+    assert ring.stats()['in_use'] == 2
+    frame = ring.acquire()
+    assert frame.ref.slot == 1
+
+
+def test_views_keep_slot_pinned(ring):
+    frame = ring.acquire()
+    view = frame[1:3]
+    del frame
+    gc.collect()
+    assert ring.stats()['in_use'] == 1
+    del view
+    gc.collect()
+    assert ring.stats()['in_use'] == 0
+
+
+def test_copies_are_plain_frames(ring):
+    frame = ring.acquire()
+    copy = frame.copy()
+    assert copy.ref is None
+    assert type(pickle.loads(pickle.dumps(copy))) is not FrameRef
+
+
+def test_pickled_frame_attaches_to_same_memory(ring):
+    frame = ring.acquire()
+    frame[:] = 7
+    ref = pickle.loads(pickle.dumps(frame))
+    assert isinstance(ref, FrameRef)
+    attached = attach_frame(ref)
+    assert attached.shape == SHAPE
+    assert (attached == 7).all()
+    assert not attached.flags.writeable
+    frame[0, 0, 0] = 9
+    assert attached[0, 0, 0] == 9
+
+
+def test_reused_slot_is_detected(ring):
+    frame = ring.acquire()
+    ref = pickle.loads(pickle.dumps(frame))
+    del frame
+    gc.collect()
+    for _ in range(3):
+        ring.acquire()
+    with pytest.raises(StaleFrameError):
+        attach_frame(ref)
+
+
+def test_attach_frames_only_touches_refs(ring):
+    frame = ring.acquire()
+    frame[:] = 3
+    plain = np.zeros(SHAPE, dtype=np.uint8)
+    items = attach_frames([(pickle.loads(pickle.dumps(frame)), 'none'), (plain, 'base64')])
+    assert (items[0][0] == 3).all() and items[0][1] == 'none'
+    assert items[1][0] is plain
+
+
+def test_acquire_with_timeout_waits_for_release(ring):
+    frames = [ring.acquire() for _ in range(3)]
+    assert ring.acquire(timeout=0.01) is None
+    assert ring.stats()['drops'] == 0
+
+    def release():
+        frames.pop()
+        gc.collect()
+
+    timer = threading.Timer(0.05, release)
+    timer.start()
+    frame = ring.acquire(timeout=2)
+    timer.join()
+    assert frame is not None
+
+
+def test_retire_waits_for_pinned_frames():
+    ring = FrameRing(SHAPE, slots=2)
+    frame = ring.acquire()
+    frame[:] = 1
+    ring.retire()
+    # Still readable by whoever holds it
+    assert (frame == 1).all()
+    del frame
+    gc.collect()
+    assert ring._frames is None
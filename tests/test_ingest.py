@@ -0,0 +1,96 @@
+import asyncio
+import cv2
+import numpy as np
+import pytest
+from detection import InvalidImageError
+from ingest import (
+    UploadTooLarge, decode_upload, jpeg_dimensions, read_upload, reduction_factor, restore_original_size
+)
+
+
+def jpeg(width, height, progressive=False):
+    image = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    params = [cv2.IMWRITE_JPEG_PROGRESSIVE, 1] if progressive else []
+    return cv2.imencode('.jpg', image, params)[1].tobytes()
+
+
+class FakeUpload:
+    def __init__(self, data, size=None):
+        self.data = data
+        self.size = size
+
+    async def read(self, size):
+        chunk, self.data = self.data[:size], self.data[size:]
+        return chunk
+
+
+@pytest.mark.parametrize('progressive', [False, True])
+def test_jpeg_dimensions_reads_header(progressive):
+    assert jpeg_dimensions(jpeg(1234, 567, progressive)) == (1234, 567)
+
+
+def test_jpeg_dimensions_rejects_other_formats():
+    png = cv2.imencode('.png', np.zeros((10, 20, 3), dtype=np.uint8))[1].tobytes()
+    assert jpeg_dimensions(png) is None
+    assert jpeg_dimensions(b'') is None
+    # Truncated before the frame header
+    assert jpeg_dimensions(jpeg(100, 100)[:20]) is None
+
+
+@pytest.mark.parametrize('width, height, factor', [
+    (4032, 3024, 4),
+    (5120, 100, 8),
+    (1280, 960, 2),
+    (1279, 960, 1),
+    (640, 480, 1),
+    (300, 200, 1)
+])
+def test_reduction_factor_keeps_long_side_at_model_size(width, height, factor):
+    assert reduction_factor(width, height, target=640) == factor
+
+
+def test_decode_upload_reduces_large_jpegs():
+    image, original_size = decode_upload(jpeg(2600, 1400), reduce=True)
+    assert original_size == (2600, 1400)
+    assert image.shape[:2] == (350, 650)
+
+    image, original_size = decode_upload(jpeg(2600, 1400), reduce=False)
+    assert original_size == (2600, 1400)
+    assert image.shape[:2] == (1400, 2600)
+
+
+def test_decode_upload_rejects_garbage():
+    with pytest.raises(InvalidImageError):
+        decode_upload(b'not an image')
+
+
+def test_restore_original_size_scales_boxes_and_keeps_image_size():
+    analysis = {
+        'width': 650, 'height': 350, 'image': 'encoded',
+        'detections': [{'label': 'shoes', 'bbox': [10, 20, 30, 40]}]
+    }
+    restore_original_size(analysis, (2600, 1400))
+    assert analysis['detections'][0]['bbox'] == [40, 80, 120, 160]
+    assert (analysis['width'], analysis['height']) == (2600, 1400)
+    assert (analysis['image_width'], analysis['image_height']) == (650, 350)
+
+
+def test_restore_original_size_without_image():
+    analysis = {'width': 100, 'height': 100, 'detections': []}
+    restore_original_size(analysis, (100, 100))
+    assert 'image_width' not in analysis
+
+
+def test_read_upload_in_chunks():
+    data = bytes(range(256)) * 10
+    assert asyncio.run(read_upload(FakeUpload(data), max_bytes=len(data), chunk_size=100)) == data
+
+
+def test_read_upload_stops_past_limit():
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(read_upload(FakeUpload(b'x' * 101), max_bytes=100, chunk_size=30))
+    # A declared size over the limit is refused before reading anything
+    upload = FakeUpload(b'x' * 10, size=1000)
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(read_upload(upload, max_bytes=100))
+    assert upload.data == b'x' * 10
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+import motion
+from motion import MotionGate
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(motion.time, 'time', clock)
+    return clock
+
+
+def frame(brightness=100, patch=0):
+    """A flat frame with a bright square covering patch of its width"""
+    image = np.full((240, 320, 3), brightness, dtype=np.uint8)
+    if patch:
+        side = int(320 * patch)
+        image[:side, :side] = 255
+    return image
+
+
+def test_first_frame_runs_and_still_frames_skip(clock):
+    gate = MotionGate(threshold=0.02, pixel_delta=25, hold_s=2, refresh_s=10)
+    assert gate.check(frame())
+    clock.now += 0.1
+    assert not gate.check(frame())
+    assert gate.stats()['skipped'] == 1
+
+
+def test_motion_runs_and_stays_active_for_hold(clock):
+    gate = MotionGate(threshold=0.02, pixel_delta=25, hold_s=2, refresh_s=10)
+    gate.check(frame())
+    clock.now += 5
+    assert not gate.active
+    assert gate.check(frame(patch=0.4))
+    assert gate.last_change > 0.02
+    assert gate.active
+    clock.now += 2.5
+    assert not gate.active
+
+
+def test_refresh_runs_unchanged_scene(clock):
+    gate = MotionGate(threshold=0.02, pixel_delta=25, hold_s=2, refresh_s=10)
+    gate.check(frame())
+    clock.now += 9
+    assert not gate.check(frame())
+    clock.now += 1
+    assert gate.check(frame())
+
+
+def test_gradual_change_adds_up(clock):
+    gate = MotionGate(threshold=0.02, pixel_delta=25, hold_s=2, refresh_s=100)
+    gate.check(frame(100))
+    # Each step is below pixel_delta, but compared with the last inferred frame they add up
+    results = []
+    for brightness in (110, 120, 130):
+        clock.now += 0.1
+        results.append(gate.check(frame(brightness)))
+    assert results == [False, False, True]
+
+
+def test_new_resolution_always_runs(clock):
+    gate = MotionGate()
+    gate.check(frame())
+    assert gate.check(np.full((480, 320, 3), 100, dtype=np.uint8))
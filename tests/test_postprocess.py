@@ -0,0 +1,85 @@
+import numpy as np
+from backends import StubModel, _StubResult
+from config import CLASS_NAMES, CONFIDENCE_THRESHOLD, DISPLAY_NAMES
+from postprocess import build_detections, class_mask, draw_boxes, extract_boxes
+
+
+def per_box_detections(data: np.ndarray):
+    """The per-box loop extract_boxes replaced, over the same rows"""
+    detected_items = []
+    detection_details = []
+    for row in data:
+        cls = int(row[5])
+        conf = float(row[4])
+        if conf > CONFIDENCE_THRESHOLD:
+            class_name = CLASS_NAMES.get(cls, f'class_{cls}')
+            detected_items.append(class_name)
+            x1, y1, x2, y2 = map(int, row[:4])
+            detection_details.append({
+                'class': DISPLAY_NAMES.get(class_name, class_name),
+                'label': class_name,
+                'confidence': conf,
+                'bbox': [x1, y1, x2, y2]
+            })
+    return detected_items, detection_details
+
+
+def test_extract_boxes_matches_per_box_loop():
+    model = StubModel(boxes=200)
+    for seed in range(5):
+        image = np.random.default_rng(seed).integers(0, 255, (480, 640, 3), dtype=np.uint8)
+        data = model.predict_boxes(image)
+        assert build_detections(extract_boxes(_StubResult(data))) == per_box_detections(data)
+
+
+def test_extract_boxes_threshold_is_exclusive():
+    data = np.array([
+        [0, 0, 10, 10, CONFIDENCE_THRESHOLD, 0],
+        [0, 0, 10, 10, 0.9, 4]
+    ], dtype=np.float32)
+    boxes = extract_boxes(_StubResult(data))
+    assert len(boxes) == 1
+    assert boxes.labels == ['polo_shirt']
+    assert boxes.display_names == ['Polo Shirt']
+    assert boxes.xyxy.dtype == np.int32
+
+
+def test_extract_boxes_without_boxes():
+    result = _StubResult(np.zeros((0, 6), dtype=np.float32))
+    result.boxes = None
+    boxes = extract_boxes(result)
+    assert len(boxes) == 0
+    assert build_detections(boxes) == ([], [])
+    assert class_mask(boxes) == 0
+
+
+def test_extract_boxes_ignores_track_ids():
+    # Tracking results have an id column before confidence and class
+    data = np.array([[5, 5, 50, 60, 7, 0.8, 3]], dtype=np.float32)
+    boxes = extract_boxes(_StubResult(data))
+    assert boxes.xyxy.tolist() == [[5, 5, 50, 60]]
+    assert boxes.labels == ['pants']
+
+
+def test_unknown_class_keeps_placeholder_label():
+    data = np.array([[0, 0, 10, 10, 0.9, 42]], dtype=np.float32)
+    labels, details = build_detections(extract_boxes(_StubResult(data)))
+    assert labels == ['class_42']
+    assert details[0]['class'] == 'class_42'
+
+
+def test_class_mask_sets_one_bit_per_class():
+    data = np.array([
+        [0, 0, 10, 10, 0.9, 0],
+        [0, 0, 10, 10, 0.9, 5],
+        [0, 0, 10, 10, 0.9, 5]
+    ], dtype=np.float32)
+    assert class_mask(extract_boxes(_StubResult(data))) == 0b100001
+
+
+def test_draw_boxes_leaves_input_untouched():
+    image = np.zeros((100, 100, 3), dtype=np.uint8)
+    data = np.array([[20, 30, 60, 90, 0.9, 4]], dtype=np.float32)
+    annotated = draw_boxes(image, extract_boxes(_StubResult(data)))
+    assert not image.any()
+    assert tuple(annotated[60, 20]) == (0, 255, 0)
@@ -0,0 +1,149 @@
+import asyncio
+import pytest
+import rate_control
+from rate_control import (
+    CLEAR_RATIO, CONGESTED_RATIO, DECREASE_FACTOR, DECREASE_HOLD_S, QUALITY_LEVELS, RECOVER_FRAMES,
+    RateController
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_control.time, 'monotonic', clock)
+    return clock
+
+
+def congested(controller):
+    return 1 / controller.fps * CONGESTED_RATIO * 1.5
+
+
+def clear(controller):
+    return 1 / controller.fps * CLEAR_RATIO / 2
+
+
+def test_congestion_cuts_rate_once_per_hold(clock):
+    controller = RateController(start_fps=10, min_fps=1, max_fps=30)
+    controller.sent(1, congested(controller))
+    assert controller.fps == pytest.approx(10 * DECREASE_FACTOR)
+    assert controller.level == 0
+    clock.now += DECREASE_HOLD_S / 2
+    controller.sent(2, congested(controller))
+    assert controller.fps == pytest.approx(10 * DECREASE_FACTOR)
+    clock.now += DECREASE_HOLD_S
+    controller.sent(3, congested(controller))
+    assert controller.fps == pytest.approx(10 * DECREASE_FACTOR ** 2)
+    # Now below half the starting rate
+    assert controller.level == 1
+
+
+def test_quality_steps_down_below_half_rate_and_rate_never_below_min(clock):
+    controller = RateController(start_fps=10, min_fps=2, max_fps=30)
+    for seq in range(20):
+        clock.now += DECREASE_HOLD_S
+        controller.sent(seq, congested(controller))
+    assert controller.fps == 2
+    assert controller.level == len(QUALITY_LEVELS) - 1
+    assert (controller.quality, controller.scale) == QUALITY_LEVELS[-1]
+
+
+def test_recovers_quality_before_rate(clock):
+    controller = RateController(start_fps=10, min_fps=1, max_fps=30)
+    controller.fps = 5
+    controller.level = 2
+    for expected_level in (1, 0):
+        for seq in range(RECOVER_FRAMES):
+            clock.now += 0.01
+            controller.sent(seq, clear(controller))
+        assert controller.level == expected_level
+        assert controller.fps == 5
+    for seq in range(RECOVER_FRAMES):
+        controller.sent(seq, clear(controller))
+    assert controller.fps == 6
+
+
+def test_busy_source_caps_rate(clock):
+    controller = RateController(start_fps=10, min_fps=1, max_fps=30)
+    controller.observe_source(10, load=0.95)
+    for seq in range(RECOVER_FRAMES * 5):
+        controller.sent(seq, clear(controller))
+    assert controller.fps == 10
+
+    controller.observe_source(10, load=0.2)
+    for seq in range(RECOVER_FRAMES * 5):
+        controller.sent(seq, clear(controller))
+    assert controller.fps == 15
+
+
+def test_rate_capped_at_max_fps(clock):
+    controller = RateController(start_fps=50, min_fps=1, max_fps=12)
+    assert controller.fps == 12
+    for seq in range(RECOVER_FRAMES * 5):
+        controller.sent(seq, clear(controller))
+    assert controller.fps == 12
+
+
+def test_ack_window_caps_rate(clock):
+    controller = RateController(start_fps=10, min_fps=1, max_fps=30, max_unacked=2)
+    for seq in range(RECOVER_FRAMES * 20):
+        controller.sent(seq, 0)
+        clock.now += 0.1
+        controller.ack(seq)
+    # Two frames per 0.1 s round trip
+    assert controller.acks
+    assert controller.delay == pytest.approx(0.1)
+    assert controller.fps == pytest.approx(20)
+
+
+def test_cumulative_ack_clears_earlier_frames(clock):
+    controller = RateController(max_unacked=3)
+    controller.acks = True
+    for seq in (1, 2, 3):
+        controller.sent(seq, 0)
+    controller.ack(2)
+    assert list(controller._in_flight) == [3]
+
+
+def test_wait_blocks_on_full_window_until_ack():
+    async def run():
+        controller = RateController(start_fps=1000, max_fps=1000, max_unacked=1, ack_timeout=5)
+        controller.ack(0)
+        controller.sent(1, 0)
+        waiter = asyncio.create_task(controller.wait())
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        controller.ack(1)
+        await asyncio.wait_for(waiter, 1)
+        assert controller.ack_timeouts == 0
+
+    asyncio.run(run())
+
+
+def test_wait_gives_up_after_ack_timeout():
+    async def run():
+        controller = RateController(start_fps=1000, max_fps=1000, max_unacked=1, ack_timeout=0.05)
+        controller.ack(0)
+        controller.sent(1, 0)
+        await asyncio.wait_for(controller.wait(), 1)
+        assert controller.ack_timeouts == 1
+        assert not controller._in_flight
+
+    asyncio.run(run())
+
+
+def test_effective_fps_counts_recent_sends(clock):
+    controller = RateController()
+    for seq in range(10):
+        controller.sent(seq, 0)
+        clock.now += 0.1
+    assert controller.effective_fps() == 5
+    clock.now += rate_control.FPS_WINDOW_S
+    assert controller.effective_fps() == 0
@@ -0,0 +1,146 @@
+import os
+import time
+import result_cache
+from result_cache import ResultCache, _entry_size
+
+
+def analysis(image=None, detections=0):
+    value = {'detections': [{'label': 'shoes'}] * detections}
+    if image is not None:
+        value['image'] = image
+    return value
+
+
+def cache(**kwargs):
+    kwargs.setdefault('max_bytes', 10_000)
+    kwargs.setdefault('ttl', 60)
+    kwargs.setdefault('spill_dir', '')
+    kwargs.setdefault('enabled', True)
+    return ResultCache(**kwargs)
+
+
+def test_key_covers_contents():
+    results = cache()
+    assert results.key(b'a') == results.key(b'a')
+    assert results.key(b'a') != results.key(b'b')
+
+
+def test_hit_and_miss():
+    results = cache()
+    key, value = results.lookup(b'image')
+    assert value is None
+    results.put(key, analysis())
+    assert results.get(key) == analysis()
+    stats = results.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+
+def test_need_image():
+    results = cache()
+    results.put('plain', analysis())
+    results.put('annotated', analysis(image='x' * 10))
+    assert results.get('plain', need_image=True) is None
+    assert results.get('plain') is not None
+    assert results.get('annotated', need_image=True)['image'] == 'x' * 10
+
+
+def test_entries_expire_after_ttl():
+    results = cache()
+    results.put('old', analysis(), expires_at=time.time() - 1)
+    assert results.get('old') is None
+    assert results.stats()['expired'] == 1
+    assert not results.analyzed('old')
+
+
+def test_least_recently_used_evicted_first():
+    size = _entry_size(analysis(image='x' * 1000))
+    results = cache(max_bytes=size * 2)
+    results.put('a', analysis(image='x' * 1000))
+    results.put('b', analysis(image='x' * 1000))
+    results.get('a')
+    results.put('c', analysis(image='x' * 1000))
+    assert results.get('b') is None
+    assert results.get('a') is not None
+    assert results.get('c') is not None
+    assert results.stats()['evictions'] == 1
+    assert results.stats()['bytes'] == size * 2
+
+
+def test_analyzed_outlives_eviction_and_size_cap():
+    results = cache(max_bytes=1000)
+    results.put('huge', analysis(image='x' * 5000))
+    assert results.get('huge') is None
+    assert results.analyzed('huge')
+    assert not results.analyzed('never')
+
+
+def test_analyzed_keys_are_bounded(monkeypatch):
+    monkeypatch.setattr(result_cache, 'MAX_ANALYZED_KEYS', 3)
+    results = cache()
+    for key in 'abcd':
+        results.put(key, analysis())
+    assert not results.analyzed('a')
+    assert results.analyzed('d')
+
+
+def test_disabled_cache_stores_nothing():
+    results = cache(enabled=False)
+    results.put('a', analysis())
+    assert results.get('a') is None
+    assert not results.analyzed('a')
+
+
+def test_evicted_entries_spill_to_disk_and_come_back(tmp_path):
+    size = _entry_size(analysis(image='x' * 1000))
+    results = cache(max_bytes=size, spill_dir=str(tmp_path))
+    results.put('a', analysis(image='x' * 1000))
+    results.put('b', analysis(image='y' * 1000))
+    assert os.listdir(tmp_path) == ['a.json']
+    assert results.stats()['spilled'] == 1
+
+    assert results.get('a')['image'] == 'x' * 1000
+    assert results.stats()['disk_hits'] == 1
+    # Loading it back evicted b to disk in turn
+    assert os.listdir(tmp_path) == ['b.json']
+    assert results.stats()['disk_bytes'] == os.path.getsize(tmp_path / 'b.json')
+
+
+def test_spilled_entry_without_image_is_kept(tmp_path):
+    results = cache(max_bytes=_entry_size(analysis()), spill_dir=str(tmp_path))
+    results.put('a', analysis())
+    results.put('b', analysis())
+    assert results.get('a', need_image=True) is None
+    # Still cached for requests that don't need the image
+    assert results.get('a') == analysis()
+
+
+def test_expired_spill_is_discarded(tmp_path):
+    results = cache(max_bytes=_entry_size(analysis()), spill_dir=str(tmp_path))
+    results.put('a', analysis(), expires_at=time.time() + 0.05)
+    results.put('b', analysis())
+    time.sleep(0.1)
+    assert results.get('a') is None
+    assert os.listdir(tmp_path) == []
+    assert results.stats()['disk_bytes'] == 0
+
+
+def test_spill_dir_trimmed_to_cap(tmp_path):
+    entry = analysis(image='x' * 1000)
+    results = cache(max_bytes=_entry_size(entry), spill_dir=str(tmp_path), disk_max_bytes=3000)
+    for key in 'abcdef':
+        results.put(key, entry)
+        time.sleep(0.01)
+    assert results.stats()['disk_bytes'] <= 3000
+    assert sum(os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path)) == results.stats()['disk_bytes']
+    assert 'e.json' in os.listdir(tmp_path)
+    assert 'a.json' not in os.listdir(tmp_path)
+
+
+def test_spill_file_removed_meanwhile(tmp_path):
+    results = cache(max_bytes=_entry_size(analysis()), spill_dir=str(tmp_path))
+    results.put('a', analysis())
+    results.put('b', analysis())
+    os.remove(tmp_path / 'a.json')
+    assert results.get('a') is None
+    results.use_spill_dir(str(tmp_path))
+    assert results.stats()['disk_bytes'] == 0
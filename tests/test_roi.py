@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+from backends import _StubResult
+from config import MODEL_IMGSZ, ROI_CROP_IMGSZ, ROI_DETECT_IMGSZ
+from roi import (
+    PEOPLE, PERSON_CROP_ASPECT, analyze_roi_batch, merge_boxes, person_windows, polygon_windows, validate_roi
+)
+
+
+def part(rows):
+    rows = np.array(rows, dtype=np.float64).reshape(-1, 6)
+    return rows[:, :4].astype(np.int32), rows[:, 4], rows[:, 5].astype(np.int32)
+
+
+class FakeModel:
+    """Answers the people search with search_boxes and every other call with crop_boxes, in input coordinates"""
+
+    def __init__(self, search_boxes, crop_boxes):
+        self.search_boxes = np.array(search_boxes, dtype=np.float32).reshape(-1, 6)
+        self.crop_boxes = np.array(crop_boxes, dtype=np.float32).reshape(-1, 6)
+        self.calls = []
+
+    def __call__(self, images, imgsz, verbose=False):
+        self.calls.append((imgsz, [image.shape[:2] for image in images]))
+        data = self.search_boxes if imgsz == ROI_DETECT_IMGSZ else self.crop_boxes
+        return [_StubResult(data) for _ in images]
+
+
+def test_merge_boxes_keeps_most_confident_duplicate():
+    boxes = merge_boxes([
+        part([[0, 0, 100, 100, 0.6, 5], [300, 0, 400, 100, 0.9, 4]]),
+        part([[2, 2, 100, 100, 0.8, 5], [0, 0, 100, 100, 0.7, 3]])
+    ])
+    assert sorted(zip(boxes.xyxy.tolist(), boxes.conf.tolist(), boxes.cls.tolist())) == [
+        ([0, 0, 100, 100], 0.7, 3),
+        ([2, 2, 100, 100], 0.8, 5),
+        ([300, 0, 400, 100], 0.9, 4)
+    ]
+
+
+def test_merge_boxes_leaves_single_crop_alone():
+    boxes = merge_boxes([part([[0, 0, 100, 100, 0.6, 5], [0, 0, 100, 100, 0.8, 5]])])
+    assert len(boxes) == 2
+    assert len(merge_boxes([])) == 0
+
+
+@pytest.mark.parametrize('roi', [None, PEOPLE])
+def test_validate_roi_passes_modes_through(roi):
+    assert validate_roi(roi) == roi
+
+
+def test_validate_roi_normalizes_polygons():
+    assert validate_roi([[(0, 0), ('10', 0), (10.5, 10)]]) == [[[0, 0], [10, 0], [10, 10]]]
+
+
+@pytest.mark.parametrize('roi', ['everything', [], [[[0, 0], [1, 1]]], [[[0, 0], [1], [2, 2]]], [['a', 'b', 'c']]])
+def test_validate_roi_rejects(roi):
+    with pytest.raises(ValueError):
+        validate_roi(roi)
+
+
+def test_person_windows_share_one_shape_inside_the_frame():
+    detections = [
+        {'label': 'polo_shirt', 'bbox': [100, 100, 200, 200]},
+        {'label': 'pants', 'bbox': [110, 200, 190, 400]},
+        {'label': 'shoes', 'bbox': [1880, 1000, 1900, 1010]}
+    ]
+    windows = person_windows(detections, 1920, 1080, margin=0.1)
+    assert len(windows) == 2
+    for x1, y1, x2, y2 in windows:
+        assert 0 <= x1 < x2 <= 1920 and 0 <= y1 < y2 <= 1080
+        assert (y2 - y1) == pytest.approx((x2 - x1) * PERSON_CROP_ASPECT, abs=1)
+    x1, y1, x2, y2 = windows[0]
+    assert x1 <= 100 and y1 <= 100 and x2 >= 200 and y2 >= 400
+
+
+def test_polygon_windows_clipped_to_frame():
+    polygons = [[[-50, -50], [100, 0], [100, 80]], [[2000, 2000], [2100, 2000], [2100, 2100]]]
+    assert polygon_windows(polygons, 1920, 1080) == [(0, 0, 101, 81)]
+
+
+def test_people_found_on_downscaled_frame_are_cropped_at_full_resolution():
+    frame = np.zeros((2160, 3840, 3), dtype=np.uint8)
+    model = FakeModel(
+        search_boxes=[[1000, 800, 1100, 1000, 0.4, 4], [1010, 1000, 1090, 1200, 0.4, 3]],
+        crop_boxes=[[10, 20, 60, 80, 0.9, 5]]
+    )
+    analysis, = analyze_roi_batch(model, [(frame, 'none', PEOPLE)])
+    (x1, y1, x2, y2), = analysis['regions']
+    assert [detection['bbox'] for detection in analysis['detections']] == [[x1 + 10, y1 + 20, x1 + 60, y1 + 80]]
+    assert (analysis['width'], analysis['height']) == (3840, 2160)
+    assert [imgsz for imgsz, _ in model.calls] == [ROI_DETECT_IMGSZ, ROI_CROP_IMGSZ]
+    assert model.calls[1][1] == [(y2 - y1, x2 - x1)]
+
+
+def test_frame_filled_by_a_person_runs_whole():
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    model = FakeModel(
+        search_boxes=[[400, 0, 1500, 600, 0.4, 4], [420, 600, 1480, 1080, 0.4, 3]],
+        crop_boxes=[[10, 20, 60, 80, 0.9, 5]]
+    )
+    analysis, = analyze_roi_batch(model, [(frame, 'none', PEOPLE)])
+    assert analysis['regions'] == [[0, 0, 1920, 1080]]
+    assert [imgsz for imgsz, _ in model.calls] == [ROI_DETECT_IMGSZ, MODEL_IMGSZ]
+    assert analysis['detections'][0]['bbox'] == [10, 20, 60, 80]
+
+
+def test_polygon_roi_keeps_only_detections_inside():
+    frame = np.zeros((2160, 3840, 3), dtype=np.uint8)
+    polygon = [[1000, 1000], [1400, 1000], [1000, 1800]]
+    model = FakeModel(search_boxes=[], crop_boxes=[[10, 10, 50, 50, 0.9, 5], [350, 700, 390, 760, 0.9, 0]])
+    analysis, = analyze_roi_batch(model, [(frame, 'none', [polygon])])
+    assert analysis['regions'] == [[1000, 1000, 1401, 1801]]
+    # The second box is inside the polygon's bounding window but not the triangle itself
+    assert [detection['bbox'] for detection in analysis['detections']] == [[1010, 1010, 1050, 1050]]
+    assert [imgsz for imgsz, _ in model.calls] == [ROI_CROP_IMGSZ]
@@ -0,0 +1,96 @@
+from datetime import datetime
+import pytest
+import roster as roster_module
+from roster import Roster
+
+
+def student(student_id, rfid_tag, created_at, gender='Female'):
+    return {
+        'student_id': student_id, 'rfid_tag': rfid_tag, 'first_name': 'Ana', 'last_name': f'S{student_id}',
+        'gender': gender, 'course': 'BSIT', 'year_level': 1, 'created_at': created_at
+    }
+
+
+class FakeStudentsTable:
+    """Answers the roster's queries from a list of rows, filtering on the incremental watermark"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def connect(self):
+        return self
+
+    def cursor(self, dictionary=False):
+        return self
+
+    def execute(self, query, params=None):
+        self.queries.append(params)
+        rows = self.rows
+        if params:
+            created_at, _, student_id = params
+            rows = [row for row in rows if (row['created_at'], row['student_id']) > (created_at, student_id)]
+        self.result = [dict(row) for row in rows]
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def table(monkeypatch):
+    table = FakeStudentsTable([
+        student(1, 'ab12', datetime(2024, 1, 1)),
+        student(2, 'CD34', datetime(2024, 1, 2), gender='Male')
+    ])
+    monkeypatch.setattr(roster_module, 'get_db_connection', table.connect)
+    return table
+
+
+def test_lookups_by_tag_and_id(table):
+    roster = Roster(miss_refresh_interval=60)
+    assert roster.refresh() == 2
+    assert roster.by_rfid(' AB12 ').student_id == 1
+    assert roster.by_rfid('cd34').gender == 'Male'
+    assert roster.by_id(2).to_dict()['name'] == 'Ana S2'
+    assert roster.by_rfid('zz99') is None
+    assert roster.stats()['misses'] == 1
+
+
+def test_incremental_refresh_reads_only_new_students(table):
+    roster = Roster()
+    roster.refresh()
+    table.rows.append(student(3, 'EF56', datetime(2024, 1, 2)))
+    assert roster.refresh() == 1
+    assert table.queries[-1] == (datetime(2024, 1, 2), datetime(2024, 1, 2), 2)
+    assert roster.by_rfid('ef56').student_id == 3
+    assert roster.by_rfid('ab12') is not None
+
+
+def test_full_reload_drops_deleted_and_moves_retagged(table):
+    roster = Roster()
+    roster.refresh()
+    table.rows = [student(1, 'NEW1', datetime(2024, 1, 1))]
+    roster.refresh(full=True)
+    assert roster.by_id(2) is None
+    assert roster.by_rfid('ab12') is None
+    assert roster.by_rfid('new1').student_id == 1
+
+
+def test_misses_ask_for_refresh_at_most_once_per_interval(table):
+    roster = Roster(miss_refresh_interval=60)
+    roster.by_rfid('zz99')
+    assert roster._refresh_requested
+    roster._refresh_requested = False
+    roster.by_rfid('zz98')
+    assert not roster._refresh_requested
+
+
+def test_database_down_keeps_roster(table, monkeypatch):
+    roster = Roster()
+    roster.refresh()
+    monkeypatch.setattr(roster_module, 'get_db_connection', lambda: None)
+    assert roster.refresh(full=True) == 0
+    assert roster.by_id(1) is not None
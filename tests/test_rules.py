@@ -0,0 +1,104 @@
+from datetime import datetime
+from itertools import combinations
+import pytest
+from config import CLASS_NAMES, DISPLAY_NAMES, DRESS_CODE_REQUIREMENTS
+from rules import RuleEngine, labels_mask, resolve_item
+
+LABELS = list(CLASS_NAMES.values())
+
+# A Monday and a Wednesday
+MONDAY = datetime(2024, 5, 6, 9)
+WEDNESDAY = datetime(2024, 5, 8, 9)
+
+
+def hardcoded_compliance(detected_items, gender):
+    """The check the rule engine replaced, with doll shoes accepted as shoes for female students"""
+    detected_set = set(detected_items)
+    if gender == 'Female' and 'doll_shoes' in detected_set:
+        detected_set.add('shoes')
+    missing_items = [DISPLAY_NAMES[item] for item in DRESS_CODE_REQUIREMENTS[gender] if item not in detected_set]
+    return {
+        'is_compliant': not missing_items,
+        'missing_items': missing_items,
+        'detected_items': [DISPLAY_NAMES.get(item, item) for item in detected_items],
+        'gender': gender
+    }
+
+
+def hardcoded_gender(detected_items):
+    female = len(set(detected_items) & {'blouse', 'skirt', 'doll_shoes'})
+    male = len(set(detected_items) & {'polo_shirt', 'pants', 'shoes'})
+    return 'Female' if female > male else 'Male'
+
+
+def every_combination():
+    for size in range(len(LABELS) + 1):
+        yield from (list(items) for items in combinations(LABELS, size))
+
+
+def requirement(gender, item_name, location=None, day_of_week=None):
+    return {'gender': gender, 'item_name': item_name, 'location': location, 'day_of_week': day_of_week}
+
+
+def test_config_rules_match_hardcoded_check_for_every_combination():
+    engine = RuleEngine()
+    for items in every_combination():
+        for gender in ('Male', 'Female'):
+            assert engine.evaluate(items, gender) == hardcoded_compliance(items, gender), (items, gender)
+        assert engine.guess_gender(items) == hardcoded_gender(items), items
+        assert engine.evaluate(items) == hardcoded_compliance(items, hardcoded_gender(items)), items
+
+
+def test_precomputed_mask_gives_same_result():
+    engine = RuleEngine()
+    for items in every_combination():
+        assert engine.evaluate(items, 'Female', mask=labels_mask(items)) == engine.evaluate(items, 'Female')
+
+
+@pytest.mark.parametrize('name, label', [
+    ('polo_shirt', 'polo_shirt'),
+    ('Polo Shirt', 'polo_shirt'),
+    (' doll shoes ', 'doll_shoes'),
+    ('Black Pants', 'pants'),
+    ('Student ID', 'id_student'),
+    ('Necktie', None)
+])
+def test_resolve_item(name, label):
+    assert resolve_item(name) == label
+
+
+def test_table_rules_with_location_and_day_scopes():
+    engine = RuleEngine()
+    engine._compile(('v1',), [
+        requirement('Male', 'Polo Shirt'),
+        requirement('Male', 'Black Pants'),
+        requirement('Male', 'Student ID', location='Library'),
+        requirement('Male', 'Shoes', day_of_week=1),
+        requirement('Male', 'Student ID', location='Library', day_of_week=1),
+        requirement('Male', 'Necktie')
+    ])
+    assert engine.source == 'database'
+    outfit = ['polo_shirt', 'pants']
+    assert engine.evaluate(outfit, 'Male', when=WEDNESDAY)['is_compliant']
+    assert engine.evaluate(outfit, 'Male', when=MONDAY)['missing_items'] == ['Shoes']
+    # The most specific scope wins outright rather than adding to the everyday rows
+    assert engine.evaluate(outfit, 'Male', 'Library', WEDNESDAY)['missing_items'] == ['Student ID']
+    assert engine.evaluate(['id_student'], 'Male', 'Library', MONDAY)['is_compliant']
+    # Genders without table rows keep config.py's rules
+    assert engine.evaluate([], 'Female', when=WEDNESDAY)['missing_items'] == ['Blouse', 'Skirt', 'Shoes']
+
+
+def test_recompile_replaces_resolved_rules():
+    engine = RuleEngine()
+    assert engine.evaluate([], 'Male', when=MONDAY)['missing_items'] == ['Polo Shirt', 'Black Pants', 'Shoes']
+    engine._compile(('v2',), [requirement('Male', 'shoes')])
+    assert engine.evaluate([], 'Male', when=MONDAY)['missing_items'] == ['Shoes']
+    engine._compile(None, [])
+    assert engine.source == 'config'
+    assert engine.evaluate([], 'Male', when=MONDAY)['missing_items'] == ['Polo Shirt', 'Black Pants', 'Shoes']
+
+
+def test_equivalent_item_only_counts_where_configured():
+    engine = RuleEngine()
+    assert engine.evaluate(['blouse', 'skirt', 'doll_shoes'], 'Female')['is_compliant']
+    assert engine.evaluate(['polo_shirt', 'pants', 'doll_shoes'], 'Male')['missing_items'] == ['Shoes']
@@ -0,0 +1,97 @@
+import numpy as np
+from tracking import ComplianceTracker, Track, group_people, iou_matrix
+
+
+def item(label, bbox):
+    return {'label': label, 'bbox': bbox}
+
+
+def male_outfit(x, shoes=True):
+    """A polo shirt over pants, with or without shoes, in a column starting at x"""
+    items = [item('polo_shirt', [x, 0, x + 100, 100]), item('pants', [x + 10, 100, x + 90, 250])]
+    if shoes:
+        items.append(item('shoes', [x + 20, 250, x + 80, 280]))
+    return items
+
+
+def test_iou_matrix():
+    ious = iou_matrix(
+        np.array([[0, 0, 10, 10], [0, 0, 10, 10]], dtype=float),
+        np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]], dtype=float)
+    )
+    assert ious.shape == (2, 3)
+    assert ious[0, 0] == 1
+    assert abs(ious[0, 1] - 50 / 150) < 1e-9
+    assert ious[0, 2] == 0
+
+
+def test_group_people_joins_stacked_items():
+    people = group_people(male_outfit(0) + male_outfit(500))
+    assert len(people) == 2
+    assert sorted(person['bbox'] for person in people) == [[0, 0, 100, 280], [500, 0, 600, 280]]
+    assert all(sorted(person['items']) == ['pants', 'polo_shirt', 'shoes'] for person in people)
+
+
+def test_group_people_keeps_side_by_side_items_apart():
+    people = group_people([item('shoes', [0, 0, 100, 20]), item('shoes', [60, 0, 160, 20])])
+    assert len(people) == 2
+    assert group_people([]) == []
+
+
+def test_violation_confirmed_once_after_streak():
+    tracker = ComplianceTracker(confirm_frames=3)
+    frames = [tracker.update(male_outfit(0, shoes=False)) for _ in range(5)]
+    assert [len(violations) for violations in frames] == [0, 0, 1, 0, 0]
+    violation = frames[2][0]
+    assert violation['missing_items'] == ['Shoes']
+    assert violation['track_id'] == 1
+    assert tracker.stats()['violations'] == 1
+
+
+def test_compliant_frame_resets_streak():
+    tracker = ComplianceTracker(confirm_frames=2)
+    assert tracker.update(male_outfit(0, shoes=False)) == []
+    assert tracker.update(male_outfit(0)) == []
+    assert tracker.update(male_outfit(0, shoes=False)) == []
+    assert len(tracker.update(male_outfit(0, shoes=False))) == 1
+
+
+def test_only_items_missing_for_the_whole_streak_are_reported():
+    tracker = ComplianceTracker(confirm_frames=2)
+    # No pants and no shoes, then only the shoes missing
+    tracker.update([item('polo_shirt', [0, 0, 100, 100])])
+    violations = tracker.update([item('polo_shirt', [0, 0, 100, 100]), item('pants', [10, 100, 90, 250])])
+    assert violations[0]['missing_items'] == ['Shoes']
+
+
+def test_missing_items_in_requirement_order():
+    track = Track(1, [0, 0, 100, 100])
+    for _ in range(2):
+        confirmed = track.update([0, 0, 100, 100], ['id_student'], confirm_frames=2)
+    # Male requirements are polo shirt, pants, shoes, which isn't alphabetical
+    assert confirmed['missing_items'] == ['Polo Shirt', 'Black Pants', 'Shoes']
+    assert track.to_dict()['missing_items'] == ['Polo Shirt', 'Black Pants', 'Shoes']
+
+
+def test_track_dropped_after_max_missed_reports_again():
+    tracker = ComplianceTracker(confirm_frames=1, max_missed=1)
+    assert len(tracker.update(male_outfit(0, shoes=False))) == 1
+    tracker.update([])
+    tracker.update([])
+    assert tracker.tracks == []
+    violations = tracker.update(male_outfit(0, shoes=False))
+    assert len(violations) == 1
+    assert violations[0]['track_id'] == 2
+
+
+def test_bind_uses_student_gender():
+    tracker = ComplianceTracker(confirm_frames=2)
+    tracker.update(male_outfit(0))
+    assert tracker.bind(42, 'Female') == 1
+    violations = tracker.update(male_outfit(0))
+    violations += tracker.update(male_outfit(0))
+    assert len(violations) == 1
+    assert violations[0]['student_id'] == 42
+    assert violations[0]['gender'] == 'Female'
+    assert violations[0]['missing_items'] == ['Blouse', 'Skirt']
+    assert tracker.bind(43) is None
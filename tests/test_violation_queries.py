@@ -0,0 +1,124 @@
+import sqlite3
+from datetime import date, datetime, timedelta
+import pytest
+import violation_queries
+from violation_queries import StatsCache, decode_cursor, encode_cursor, list_violations, violation_stats
+
+
+@pytest.fixture
+def violations_db(monkeypatch):
+    """The listing queries run against an in-memory SQLite copy of the violations table"""
+    sqlite3.register_adapter(datetime, datetime.isoformat)
+    sqlite3.register_converter('datetime', lambda value: datetime.fromisoformat(value.decode()))
+    connection = sqlite3.connect(':memory:', detect_types=sqlite3.PARSE_DECLTYPES)
+    connection.row_factory = sqlite3.Row
+    connection.execute("""
+        CREATE TABLE violations (
+            violation_id INTEGER PRIMARY KEY, student_id INTEGER, missing_item TEXT,
+            detected_at datetime, location TEXT, status TEXT
+        )
+    """)
+
+    def run_query(query, params):
+        return [dict(row) for row in connection.execute(query.replace('%s', '?'), params)]
+
+    monkeypatch.setattr(violation_queries, '_run_query', run_query)
+    return connection
+
+
+def add_violations(connection, rows):
+    connection.executemany(
+        "INSERT INTO violations (violation_id, student_id, missing_item, detected_at, location, status) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        rows
+    )
+
+
+def test_cursor_round_trip():
+    detected_at = datetime(2024, 3, 5, 14, 7, 9, 123456)
+    cursor = encode_cursor(detected_at, 987)
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == (detected_at, 987)
+
+
+@pytest.mark.parametrize('cursor', ['', 'not a cursor', '!!!', encode_cursor(datetime(2024, 1, 1), 1)[:-3]])
+def test_decode_cursor_rejects_garbage(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def ids(page):
+    return [row['violation_id'] for row in page['violations']]
+
+
+def test_pages_cover_every_row_once(violations_db):
+    base = datetime(2024, 5, 1, 8)
+    # Pairs of rows share a timestamp, so pages have to break ties on violation_id
+    add_violations(violations_db, [
+        (violation_id, 1, 'Shoes', base + timedelta(minutes=violation_id // 2), 'Gate', 'Pending')
+        for violation_id in range(1, 24)
+    ])
+    add_violations(violations_db, [(100, 1, 'Shoes', None, 'Gate', 'Pending')])
+
+    seen = []
+    cursor = None
+    while True:
+        page = list_violations(limit=5, cursor=cursor)
+        seen.extend(ids(page))
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert seen == list(range(23, 0, -1))
+
+
+def test_filters_and_range(violations_db):
+    base = datetime(2024, 5, 1, 8)
+    add_violations(violations_db, [
+        (1, 1, 'Shoes', base, 'Gate', 'Pending'),
+        (2, 2, 'Skirt', base + timedelta(days=1), 'Gate', 'Resolved'),
+        (3, 1, 'Shoes', base + timedelta(days=2), 'Library', 'Pending')
+    ])
+    assert ids(list_violations(location='Gate')) == [2, 1]
+    assert ids(list_violations(student_id=1, status='Pending')) == [3, 1]
+    assert ids(list_violations(start=base + timedelta(hours=1), end=base + timedelta(days=2))) == [2]
+    assert list_violations(missing_item='Shoes', limit=1)['next_cursor'] is not None
+    assert list_violations(location='Gate')['violations'][0]['detected_at'] == '2024-05-02T08:00:00'
+
+
+def test_unknown_status_rejected():
+    with pytest.raises(ValueError):
+        list_violations(status='Closed')
+
+
+def test_stats_totals_and_cache(monkeypatch):
+    monkeypatch.setattr(violation_queries, 'stats_cache', StatsCache(ttl=60))
+    queries = []
+
+    def run_query(query, params):
+        queries.append((query, params))
+        return [
+            {'day': date(2024, 5, 1), 'location': 'Gate', 'missing_item': 'Shoes', 'violation_count': 3},
+            {'day': date(2024, 5, 1), 'location': '', 'missing_item': 'Skirt', 'violation_count': 1},
+            {'day': date(2024, 5, 2), 'location': 'Gate', 'missing_item': 'Shoes', 'violation_count': 2}
+        ]
+
+    monkeypatch.setattr(violation_queries, '_run_query', run_query)
+    stats = violation_stats(start=date(2024, 5, 1), location='Gate')
+    assert stats['total'] == 6
+    assert stats['by_day'] == [{'day': '2024-05-01', 'count': 4}, {'day': '2024-05-02', 'count': 2}]
+    assert stats['by_location'] == [{'location': 'Gate', 'count': 5}, {'location': None, 'count': 1}]
+    assert stats['by_item'][0] == {'missing_item': 'Shoes', 'count': 5}
+    assert not stats['cached']
+    assert queries[0][1] == [date(2024, 5, 1), 'Gate']
+
+    assert violation_stats(start=date(2024, 5, 1), location='Gate')['cached']
+    assert len(queries) == 1
+    violation_stats()
+    assert len(queries) == 2
+
+
+def test_stats_cache_expires():
+    cache = StatsCache(ttl=-1)
+    cache.put(('key',), {'total': 1})
+    assert cache.get(('key',)) is None
+    assert cache.stats()['entries'] == 0
@@ -0,0 +1,151 @@
+import json
+import time
+import pytest
+from mysql.connector import errors
+import violation_writer
+from violation_writer import ViolationWriter
+
+
+class FakeDatabase:
+    """Stands in for the writer pool; student IDs in bad_students fail like a foreign key would"""
+
+    def __init__(self, bad_students=()):
+        self.up = True
+        self.bad_students = set(bad_students)
+        self.rows = []
+        self.connections = 0
+
+    def connect(self, pool_name=None):
+        if not self.up:
+            return None
+        self.connections += 1
+        return FakeConnection(self)
+
+
+class FakeConnection:
+    def __init__(self, database):
+        self.database = database
+        self.pending = []
+
+    def cursor(self):
+        return self
+
+    def executemany(self, query, rows):
+        for row in rows:
+            self.execute(query, row)
+
+    def execute(self, query, row):
+        if row[0] in self.database.bad_students:
+            raise errors.IntegrityError(msg=f"Unknown student {row[0]}")
+        self.pending.append(tuple(row))
+
+    def commit(self):
+        self.database.rows.extend(self.pending)
+        self.pending = []
+
+    def rollback(self):
+        self.pending = []
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(violation_writer, 'get_db_connection', database.connect)
+    return database
+
+
+@pytest.fixture
+def writer(tmp_path):
+    writer = ViolationWriter(flush_size=100, flush_interval=60, spill_path=str(tmp_path / 'spill.ndjson'))
+    yield writer
+    writer.shutdown()
+
+
+def logged(database):
+    return sorted((row[0], row[1]) for row in database.rows)
+
+
+def test_rows_written_in_batches(database, writer):
+    writer.log(1, ['Shoes', 'Skirt'], 'Gate')
+    writer.log(2, ['Blouse'], 'Gate')
+    writer.shutdown()
+    assert logged(database) == [(1, 'Shoes'), (1, 'Skirt'), (2, 'Blouse')]
+    assert database.connections == 1
+    assert writer.stats()['written'] == 3
+
+
+def test_outage_spills_and_replays(database, writer):
+    database.up = False
+    writer._flush([(1, 'Shoes', 'Gate', '2024-05-01 08:00:00')])
+    assert writer.stats()['spill_pending']
+    assert writer.spilled == 1
+
+    database.up = True
+    writer._db_down_until = 0
+    writer._flush([(2, 'Skirt', 'Gate', '2024-05-01 08:01:00')])
+    assert logged(database) == [(1, 'Shoes'), (2, 'Skirt')]
+    assert writer.replayed == 1
+    assert not writer.stats()['spill_pending']
+
+
+def test_bad_row_dropped_without_losing_the_batch(database, writer):
+    database.bad_students.add(99)
+    writer._flush([(1, 'Shoes', 'Gate', 'now'), (99, 'Shoes', 'Gate', 'now'), (2, 'Skirt', 'Gate', 'now')])
+    assert logged(database) == [(1, 'Shoes'), (2, 'Skirt')]
+    assert writer.rejected == 1
+
+
+def test_corrupt_spill_lines_quarantined(database, writer):
+    with open(writer.spill_path, 'w') as spill_file:
+        spill_file.write(json.dumps([1, 'Shoes', 'Gate', 'now']) + '\n')
+        spill_file.write('{"cut short\n')
+        spill_file.write(json.dumps({'not': 'a row'}) + '\n')
+        spill_file.write(json.dumps([2, 'Skirt', 'Gate', 'now']))
+    writer._replay()
+    assert logged(database) == [(1, 'Shoes'), (2, 'Skirt')]
+    assert writer.corrupt == 2
+    with open(writer.spill_path + '.corrupt') as corrupt_file:
+        assert corrupt_file.read().splitlines() == ['{"cut short', '{"not": "a row"}']
+    assert not writer.stats()['spill_pending']
+
+
+def test_replay_keeps_rows_still_failing(database, writer):
+    database.up = False
+    writer._spill([(1, 'Shoes', 'Gate', 'now'), (2, 'Skirt', 'Gate', 'now')])
+    writer._replay()
+    with open(writer.spill_path) as spill_file:
+        assert len(spill_file.read().splitlines()) == 2
+    assert writer.spilled == 2
+
+
+def test_unexpected_error_spills_and_keeps_thread_alive(database, writer):
+    def broken(rows):
+        raise RuntimeError("driver bug")
+
+    writer._write = broken
+    writer.flush_size = 1
+    writer.log(1, ['Shoes'], 'Gate')
+    # The thread spills the rows, then backs off from the database for a while
+    for _ in range(100):
+        if writer._db_down_until:
+            break
+        time.sleep(0.01)
+    assert writer.spilled == 1
+    assert writer._thread.is_alive()
+
+    del writer._write
+    writer._db_down_until = 0
+    writer.log(2, ['Skirt'], 'Gate')
+    writer.shutdown()
+    assert logged(database) == [(1, 'Shoes'), (2, 'Skirt')]
+
+
+def test_logged_after_shutdown_is_spilled(database, writer):
+    writer.shutdown()
+    writer.log(1, ['Shoes'], 'Gate')
+    assert writer._thread is None
+    assert writer.spilled == 1
+    assert database.rows == []
@@ -0,0 +1,237 @@
+from typing import Dict, List, Optional
+import numpy as np
+from config import (
+    TRACK_CONFIRM_FRAMES, TRACK_IOU_THRESHOLD, TRACK_MAX_MISSED, TRACK_GROUP_OVERLAP
+)
+from rules import rule_engine
+
+
+def iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU between two (N, 4) and (M, 4) arrays of x1, y1, x2, y2 boxes"""
+    if not len(boxes_a) or not len(boxes_b):
+        return np.zeros((len(boxes_a), len(boxes_b)))
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-6)
+
+
+def group_people(detections: List[Dict], overlap: float = TRACK_GROUP_OVERLAP) -> List[Dict]:
+    """Group clothing detections into people
+
+    The model detects clothing items, not people, so items whose horizontal
+    extents overlap by at least `overlap` of the narrower box (a shirt above
+    pants above shoes) are merged into one person with the union box.
+    """
+    if not detections:
+        return []
+
+    boxes = np.array([detection['bbox'] for detection in detections], dtype=np.float32)
+    x1, x2 = boxes[:, 0], boxes[:, 2]
+    shared = np.minimum(x2[:, None], x2[None, :]) - np.maximum(x1[:, None], x1[None, :])
+    narrower = np.minimum((x2 - x1)[:, None], (x2 - x1)[None, :])
+    linked = shared >= overlap * np.maximum(narrower, 1)
+
+    # Connected components over the overlap graph
+    parent = list(range(len(detections)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in zip(*np.nonzero(np.triu(linked, 1))):
+        parent[find(i)] = find(j)
+
+    groups = {}
+    for index in range(len(detections)):
+        groups.setdefault(find(index), []).append(index)
+
+    people = []
+    for members in groups.values():
+        member_boxes = boxes[members]
+        people.append({
+            'bbox': [
+                int(member_boxes[:, 0].min()), int(member_boxes[:, 1].min()),
+                int(member_boxes[:, 2].max()), int(member_boxes[:, 3].max())
+            ],
+            'items': [detections[index]['label'] for index in members]
+        })
+    return people
+
+
+class Track:
+    """One person followed across frames, with a debounced compliance state
+
+    state is 'pending' until the person has been seen non-compliant for
+    confirm_frames consecutive frames, when it becomes 'violation' and the
+    violation is reported once. A compliant frame resets the streak. Once a
+    student is bound to the track (from an RFID scan), their recorded gender
+    is used instead of guessing it from the clothes.
+    """
+
+    def __init__(self, track_id: int, bbox: List[int], location: Optional[str] = None):
+        self.track_id = track_id
+        self.bbox = bbox
+        self.location = location
+        self.state = 'pending'
+        self.hits = 0
+        self.missed = 0
+        self.streak = 0
+        self.missing_items = None
+        self.compliance = None
+        self.reported = False
+        self.student_id = None
+        self.gender = None
+
+    def update(self, bbox: List[int], items: List[str], confirm_frames: int) -> Optional[Dict]:
+        """Apply one frame's observation, returning the compliance to report once confirmed"""
+        self.bbox = bbox
+        self.hits += 1
+        self.missed = 0
+        self.compliance = rule_engine.evaluate(items, self.gender, self.location)
+
+        if self.compliance['is_compliant']:
+            self.streak = 0
+            self.missing_items = None
+            if not self.reported:
+                self.state = 'compliant'
+            return None
+
+        self.streak += 1
+        missing = set(self.compliance['missing_items'])
+        # Only report items that stayed missing for the whole streak
+        self.missing_items = missing if self.missing_items is None else (self.missing_items & missing) or missing
+
+        if self.reported:
+            return None
+        if self.streak < confirm_frames:
+            self.state = 'pending'
+            return None
+
+        self.state = 'violation'
+        self.reported = True
+        return {**self.compliance, 'missing_items': self.ordered_missing_items()}
+
+    def ordered_missing_items(self) -> List[str]:
+        """The items missing for the whole streak, in the rules' requirement order like uploads report them"""
+        if not self.missing_items:
+            return []
+        # Always a subset of the latest frame's missing items, which are in requirement order
+        return [item for item in self.compliance['missing_items'] if item in self.missing_items]
+
+    def to_dict(self) -> Dict:
+        return {
+            'track_id': self.track_id,
+            'bbox': self.bbox,
+            'state': self.state,
+            'streak': self.streak,
+            'student_id': self.student_id,
+            'missing_items': self.ordered_missing_items()
+        }
+
+
+class ComplianceTracker:
+    """IoU tracker over the people in a camera feed
+
+    Each frame's people are matched greedily to existing tracks by IoU. A
+    track that goes unmatched for max_missed processed frames is dropped, so
+    a person who leaves and comes back later is reported again. Compliance
+    is checked with the dress code rules for the camera's location.
+    """
+
+    def __init__(self, confirm_frames: int = TRACK_CONFIRM_FRAMES,
+                 iou_threshold: float = TRACK_IOU_THRESHOLD, max_missed: int = TRACK_MAX_MISSED,
+                 location: Optional[str] = None):
+        self.location = location
+        self.confirm_frames = max(1, confirm_frames)
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.tracks = []
+        self._next_id = 1
+        self.violations = 0
+
+    def reset(self):
+        self.tracks = []
+
+    def update(self, detections: List[Dict]) -> List[Dict]:
+        """Feed one frame's detections, returning the violations confirmed on this frame
+
+        Each violation is a compliance dict for one track, with its track_id.
+        """
+        people = group_people(detections)
+        track_boxes = np.array([track.bbox for track in self.tracks], dtype=np.float32).reshape(-1, 4)
+        people_boxes = np.array([person['bbox'] for person in people], dtype=np.float32).reshape(-1, 4)
+        ious = iou_matrix(track_boxes, people_boxes)
+
+        violations = []
+        matched_tracks = set()
+        matched_people = set()
+        if ious.size:
+            # Greedy matching, best overlap first
+            for flat in np.argsort(-ious, axis=None):
+                track_index, person_index = np.unravel_index(flat, ious.shape)
+                if ious[track_index, person_index] < self.iou_threshold:
+                    break
+                if track_index in matched_tracks or person_index in matched_people:
+                    continue
+                matched_tracks.add(track_index)
+                matched_people.add(person_index)
+                self._observe(self.tracks[track_index], people[person_index], violations)
+
+        for track_index, track in enumerate(self.tracks):
+            if track_index not in matched_tracks:
+                track.missed += 1
+        self.tracks = [track for track in self.tracks if track.missed <= self.max_missed]
+
+        for person_index, person in enumerate(people):
+            if person_index not in matched_people:
+                track = Track(self._next_id, person['bbox'], self.location)
+                self._next_id += 1
+                self.tracks.append(track)
+                self._observe(track, person, violations)
+
+        self.violations += len(violations)
+        return violations
+
+    def _observe(self, track: Track, person: Dict, violations: List[Dict]):
+        confirmed = track.update(person['bbox'], person['items'], self.confirm_frames)
+        if confirmed is not None:
+            violations.append({**confirmed, 'track_id': track.track_id, 'student_id': track.student_id})
+
+    def bind(self, student_id: int, gender: Optional[str] = None) -> Optional[int]:
+        """Attribute the nearest unbound person on the latest frame to a student
+
+        The largest box is taken as the person standing at the reader. Their
+        compliance is re-evaluated with the student's gender, and a violation
+        already reported for them is not reported again. Returns the track ID,
+        or None if nobody unbound is in view yet.
+        """
+        candidates = [track for track in self.tracks if not track.missed and track.student_id is None]
+        if not candidates:
+            return None
+        track = max(candidates, key=lambda t: (t.bbox[2] - t.bbox[0]) * (t.bbox[3] - t.bbox[1]))
+        track.student_id = student_id
+        track.gender = gender
+        if not track.reported:
+            # The streak was built with a guessed gender, count again with the real one
+            track.streak = 0
+            track.missing_items = None
+        return track.track_id
+
+    def active_tracks(self) -> List[Dict]:
+        """Tracks seen on the latest frame"""
+        return [track.to_dict() for track in self.tracks if not track.missed]
+
+    def stats(self) -> Dict:
+        return {
+            'active_tracks': sum(1 for track in self.tracks if not track.missed),
+            'tracked': len(self.tracks),
+            'violations': self.violations,
+            'confirm_frames': self.confirm_frames
+        }
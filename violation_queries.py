@@ -0,0 +1,186 @@
+import base64
+import threading
+import time
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+from mysql.connector import Error
+from config import VIOLATION_STATS_CACHE_TTL
+from database import get_db_connection
+
+VIOLATION_STATUSES = ('Pending', 'Acknowledged', 'Forwarded to OSAS', 'Resolved')
+
+SELECT_VIOLATIONS = """
+SELECT violation_id, student_id, missing_item, detected_at, location, status
+FROM violations
+"""
+
+
+class DatabaseUnavailable(Exception):
+    """Raised when a query can't run because the database is down"""
+
+
+def encode_cursor(detected_at: datetime, violation_id: int) -> str:
+    """Opaque page cursor pointing just past a violation"""
+    raw = f"{detected_at.isoformat()}|{violation_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor, raising ValueError for anything it didn't produce"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        detected_at, violation_id = raw.split('|')
+        return datetime.fromisoformat(detected_at), int(violation_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def _run_query(query: str, params: List) -> List[Dict]:
+    connection = get_db_connection()
+    if not connection:
+        raise DatabaseUnavailable("Database not available")
+    try:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        cursor.close()
+        return rows
+    except Error as e:
+        print(f"Error querying violations: {e}")
+        raise DatabaseUnavailable(str(e)) from e
+    finally:
+        connection.close()
+
+def list_violations(limit: int = 50, cursor: Optional[str] = None, start: Optional[datetime] = None,
+                    end: Optional[datetime] = None, location: Optional[str] = None,
+                    status: Optional[str] = None, missing_item: Optional[str] = None,
+                    student_id: Optional[int] = None) -> Dict:
+    """Return one page of violations, newest first, with the cursor of the next page
+
+    Pages are keyed on (detected_at, violation_id) rather than OFFSET, so each
+    page is an index range scan no matter how deep into the table it is. With
+    one equality filter the matching composite index (e.g. location,
+    detected_at, violation_id) serves both the filter and the order. Rows
+    without a detected_at can't be placed on a page boundary and are left out.
+    """
+    if status is not None and status not in VIOLATION_STATUSES:
+        raise ValueError(f"Unknown status: {status}. Choose from {', '.join(VIOLATION_STATUSES)}")
+
+    # detected_at is nullable, and a NULL can be neither a cursor nor compared with one
+    conditions = ["detected_at IS NOT NULL"]
+    params = []
+    for column, value in (('location', location), ('status', status),
+                          ('missing_item', missing_item), ('student_id', student_id)):
+        if value is not None:
+            conditions.append(f"{column} = %s")
+            params.append(value)
+    if start is not None:
+        conditions.append("detected_at >= %s")
+        params.append(start)
+    if end is not None:
+        conditions.append("detected_at < %s")
+        params.append(end)
+    if cursor:
+        # Expanded form of (detected_at, violation_id) < (%s, %s), which MySQL turns into a range scan
+        cursor_at, cursor_id = decode_cursor(cursor)
+        conditions.append("(detected_at < %s OR (detected_at = %s AND violation_id < %s))")
+        params.extend([cursor_at, cursor_at, cursor_id])
+
+    query = SELECT_VIOLATIONS + "WHERE " + " AND ".join(conditions) + "\n"
+    # One extra row tells us whether there is a next page
+    query += "ORDER BY detected_at DESC, violation_id DESC\nLIMIT %s"
+    rows = _run_query(query, params + [limit + 1])
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['detected_at'], rows[-1]['violation_id'])
+    for row in rows:
+        row['detected_at'] = row['detected_at'].isoformat()
+    return {'violations': rows, 'next_cursor': next_cursor}
+
+
+class StatsCache:
+    """Small TTL cache for dashboard aggregates keyed by their query parameters"""
+
+    def __init__(self, ttl: float = VIOLATION_STATS_CACHE_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            # Drop expired entries while we hold the lock, the key space is small
+            for stale in [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]:
+                del self._entries[stale]
+            return None
+
+    def put(self, key: Tuple, value: Dict):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'ttl': self.ttl, 'hits': self.hits, 'misses': self.misses}
+
+
+stats_cache = StatsCache()
+
+
+def violation_stats(start: Optional[date] = None, end: Optional[date] = None,
+                    location: Optional[str] = None, missing_item: Optional[str] = None) -> Dict:
+    """Violation counts per day, location and item between start and end (inclusive)
+
+    Reads the violation_daily_counts rollup, which triggers keep up to date
+    on every insert, delete and update, instead of scanning violations. Rows
+    without a detected_at are counted nowhere, as in list_violations. Results are cached for
+    VIOLATION_STATS_CACHE_TTL seconds so dashboard refreshes share one query.
+    """
+    key = (start, end, location, missing_item)
+    cached = stats_cache.get(key)
+    if cached is not None:
+        return {**cached, 'cached': True}
+
+    conditions = []
+    params = []
+    for condition, value in (("day >= %s", start), ("day <= %s", end),
+                             ("location = %s", location), ("missing_item = %s", missing_item)):
+        if value is not None:
+            conditions.append(condition)
+            params.append(value)
+    query = "SELECT day, location, missing_item, violation_count FROM violation_daily_counts\n"
+    if conditions:
+        query += "WHERE " + " AND ".join(conditions)
+    rows = _run_query(query, params)
+
+    by_day = {}
+    by_location = {}
+    by_item = {}
+    for row in rows:
+        count = row['violation_count']
+        day = row['day'].isoformat()
+        by_day[day] = by_day.get(day, 0) + count
+        by_location[row['location']] = by_location.get(row['location'], 0) + count
+        by_item[row['missing_item']] = by_item.get(row['missing_item'], 0) + count
+
+    result = {
+        'total': sum(by_day.values()),
+        'by_day': [{'day': day, 'count': count} for day, count in sorted(by_day.items())],
+        'by_location': [
+            {'location': name or None, 'count': count}
+            for name, count in sorted(by_location.items(), key=lambda entry: -entry[1])
+        ],
+        'by_item': [
+            {'missing_item': name, 'count': count}
+            for name, count in sorted(by_item.items(), key=lambda entry: -entry[1])
+        ],
+        'generated_at': datetime.now().isoformat()
+    }
+    stats_cache.put(key, result)
+    return {**result, 'cached': False}
@@ -0,0 +1,258 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from mysql.connector import Error, errors
+from config import (
+    VIOLATION_FLUSH_SIZE, VIOLATION_FLUSH_INTERVAL, VIOLATION_RETRY_INTERVAL,
+    VIOLATION_MAX_BUFFER, VIOLATION_SPILL_PATH
+)
+from database import WRITER_POOL, get_db_connection
+from metrics import DB_FLUSH_SECONDS
+
+INSERT_VIOLATION = """
+INSERT INTO violations (student_id, missing_item, location, detected_at, status)
+VALUES (%s, %s, %s, %s, 'Pending')
+"""
+
+
+class ViolationWriter:
+    """Write-behind logger for violations
+
+    Violations are buffered in memory and written by a background thread
+    with one executemany per flush, once VIOLATION_FLUSH_SIZE rows are
+    buffered or VIOLATION_FLUSH_INTERVAL seconds have passed. When the
+    database can't be reached, rows are appended to a local spill file and
+    replayed once it is back, so an outage doesn't lose records. Replay is
+    at-least-once: a crash mid-replay may insert a row twice. Spill lines
+    that can't be parsed, like one cut short by a crash, are moved to a
+    .corrupt file next to the spill file instead of being replayed.
+    """
+
+    def __init__(self, flush_size: int = VIOLATION_FLUSH_SIZE,
+                 flush_interval: float = VIOLATION_FLUSH_INTERVAL,
+                 spill_path: str = VIOLATION_SPILL_PATH):
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self._buffer = []
+        self._cond = threading.Condition()
+        self._spill_lock = threading.Lock()
+        self._thread = None
+        self._running = False
+        self._closed = False
+        self._db_down_until = 0
+        self.written = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.rejected = 0
+        self.corrupt = 0
+        self.last_flush_ms = None
+
+    def start(self):
+        """Start the background flush thread"""
+        with self._cond:
+            if self._running or self._closed:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name='violation-writer', daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        """Stop the flush thread after writing (or spilling) everything buffered"""
+        with self._cond:
+            self._running = False
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def log(self, student_id: Optional[int], missing_items: List[str], location: str):
+        """Queue one violation row per missing item without touching the database"""
+        if not missing_items:
+            return
+
+        detected_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        rows = [(student_id, item, location, detected_at) for item in missing_items]
+        if self._closed:
+            # Logged while shutting down, e.g. by a camera thread, so keep the rows for the next start
+            self._spill(rows)
+            return
+
+        overflow = None
+        with self._cond:
+            self._buffer.extend(rows)
+            if len(self._buffer) > VIOLATION_MAX_BUFFER:
+                # The writer is falling behind, so keep memory bounded
+                overflow = self._buffer[:-VIOLATION_MAX_BUFFER]
+                del self._buffer[:-VIOLATION_MAX_BUFFER]
+            if len(self._buffer) >= self.flush_size:
+                self._cond.notify()
+        if overflow:
+            self._spill(overflow)
+
+        if not self._running:
+            self.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._running and len(self._buffer) < self.flush_size:
+                    self._cond.wait(self.flush_interval)
+                rows = self._buffer
+                self._buffer = []
+                running = self._running
+
+            try:
+                if rows:
+                    self._flush(rows)
+                elif self._spill_pending():
+                    self._replay()
+            except Exception as e:
+                # Keep the thread alive: anything not written is spilled and retried later
+                print(f"Error in violation writer: {e}")
+                self._db_down_until = time.time() + VIOLATION_RETRY_INTERVAL
+
+            if not running:
+                return
+
+    def _flush(self, rows: List):
+        started = time.perf_counter()
+        try:
+            written = self._write(rows)
+        except Exception:
+            self._spill(rows)
+            raise
+        if written:
+            flush_s = time.perf_counter() - started
+            self.last_flush_ms = round(flush_s * 1000, 2)
+            DB_FLUSH_SECONDS.observe(flush_s)
+            print(f"Violations logged: {len(rows)} row(s)")
+            # The database is reachable, so catch up on anything spilled earlier
+            if self._spill_pending():
+                self._replay()
+        else:
+            self._spill(rows)
+
+    def _write(self, rows: List) -> bool:
+        """Insert rows in one batch, returning False if the database is unavailable"""
+        if time.time() < self._db_down_until:
+            return False
+
+        connection = get_db_connection(WRITER_POOL)
+        if not connection:
+            self._db_down_until = time.time() + VIOLATION_RETRY_INTERVAL
+            return False
+
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.executemany(INSERT_VIOLATION, rows)
+                connection.commit()
+                self.written += len(rows)
+            except (errors.IntegrityError, errors.DataError) as e:
+                # One bad row (e.g. an unknown student_id) fails the whole batch,
+                # so retry row by row and drop only the rows that are invalid
+                connection.rollback()
+                print(f"Error logging violation batch, retrying row by row: {e}")
+                self._write_rows_individually(connection, cursor, rows)
+            cursor.close()
+            return True
+        except Error as e:
+            print(f"Error logging violations: {e}")
+            self._db_down_until = time.time() + VIOLATION_RETRY_INTERVAL
+            return False
+        finally:
+            connection.close()
+
+    def _write_rows_individually(self, connection, cursor, rows: List):
+        for row in rows:
+            try:
+                cursor.execute(INSERT_VIOLATION, row)
+                connection.commit()
+                self.written += 1
+            except (errors.IntegrityError, errors.DataError) as e:
+                connection.rollback()
+                self.rejected += 1
+                print(f"Error logging violation: {e}. Dropped row: {row}")
+
+    def _spill_pending(self) -> bool:
+        return os.path.exists(self.spill_path) or os.path.exists(self.spill_path + '.replay')
+
+    def _spill(self, rows: List, requeue: bool = False):
+        """Append rows to the durable spill file"""
+        with self._spill_lock:
+            with open(self.spill_path, 'a', encoding='utf-8') as spill_file:
+                for row in rows:
+                    spill_file.write(json.dumps(row) + '\n')
+                spill_file.flush()
+                os.fsync(spill_file.fileno())
+        if not requeue:
+            self.spilled += len(rows)
+            print(f"Database not available. Spilled {len(rows)} violation row(s) to {self.spill_path}")
+
+    def _replay(self):
+        """Write spilled rows to the database, keeping whatever still fails"""
+        if time.time() < self._db_down_until:
+            return
+
+        replay_path = self.spill_path + '.replay'
+        with self._spill_lock:
+            # A leftover replay file means an earlier replay was interrupted
+            if not os.path.exists(replay_path):
+                if not os.path.exists(self.spill_path):
+                    return
+                os.replace(self.spill_path, replay_path)
+
+        rows = []
+        corrupt = []
+        with open(replay_path, 'r', encoding='utf-8') as replay_file:
+            for line in replay_file:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    row = None
+                if not isinstance(row, list) or len(row) != 4:
+                    corrupt.append(line if line.endswith('\n') else line + '\n')
+                    continue
+                rows.append(tuple(row))
+        if corrupt:
+            self._quarantine(corrupt)
+
+        for start in range(0, len(rows), self.flush_size):
+            chunk = rows[start:start + self.flush_size]
+            if not self._write(chunk):
+                self._spill(rows[start:], requeue=True)
+                break
+            self.replayed += len(chunk)
+
+        os.remove(replay_path)
+        if self.replayed:
+            print(f"Replayed spilled violations, {self.replayed} row(s) so far")
+
+    def _quarantine(self, lines: List[str]):
+        """Set aside spill lines that can't be replayed, e.g. one cut short by a crash"""
+        corrupt_path = self.spill_path + '.corrupt'
+        with open(corrupt_path, 'a', encoding='utf-8') as corrupt_file:
+            corrupt_file.writelines(lines)
+        self.corrupt += len(lines)
+        print(f"Moved {len(lines)} unreadable spilled violation line(s) to {corrupt_path}")
+
+    def stats(self) -> Dict:
+        with self._cond:
+            buffered = len(self._buffer)
+        return {
+            'buffered': buffered,
+            'written': self.written,
+            'spilled': self.spilled,
+            'replayed': self.replayed,
+            'rejected': self.rejected,
+            'corrupt': self.corrupt,
+            'spill_pending': self._spill_pending(),
+            'last_flush_ms': self.last_flush_ms
+        }